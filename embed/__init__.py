@@ -4,9 +4,18 @@
 这个包提供了从XML文件中提取文本、生成嵌入向量并进行相似度检索的功能。
 包含四个主要模块：
 - xml_text_extractor: XML文本提取工具
+- document_parser: 单次读取的文档解析器，摘要和正文入库共用，也可读取GrobidProcessor输出的JSONL记录
+- parallel_extract: 基于进程池的并行目录提取
+- text_normalizer: 嵌入前的文本规范化，减少发送的令牌数
 - text_similarity: 文本相似度检索工具
 - text_processor: 集成模块，整合提取和检索功能
 - abstract_extractor: 摘要和标题提取与检索工具
+- embedding_store: 基于mmap的二进制嵌入向量存储
+- embedding_cache: 基于SQLite的嵌入向量缓存
+- async_embedding: 带并发上限和限流的异步嵌入向量客户端
+- incremental_ingest: 基于清单的增量入库
+- streaming_ingest: 提取、嵌入和写入并行的流式入库流水线
+- api_providers: 可切换的API提供方（含离线使用的本地替身客户端）
 """
 
 __version__ = "0.1.0"
@@ -14,14 +23,37 @@ __author__ = "AI Assistant"
 
 # 模块导出
 from .xml_text_extractor import (
+    iter_paragraphs,
     extract_paragraphs_with_metadata,
     process_directory_with_metadata
 )
 
+from .parallel_extract import (
+    ExtractionStats,
+    map_files
+)
+
+from .document_parser import (
+    ParsedDocument,
+    parse_document,
+    load_document_records,
+    load_processed_document
+)
+
 from .text_similarity import (
     load_embeddings,
     create_query_embedding,
+    create_embeddings_batch,
     search_similar_text,
+    build_embedding_matrix,
+    search_embedding_matrix,
+    search_similar_texts_batch,
+    search_embedding_matrix_batch,
+    merge_search_results,
+    EmbeddingIndex,
+    get_embedding_index,
+    get_index_cache_stats,
+    clear_index_cache,
     search_by_text,
     search_by_existing_text,
     format_search_results
@@ -29,10 +61,50 @@ from .text_similarity import (
 
 from .text_processor import (
     extract_and_create_embeddings,
+    update_fulltext_store,
     process_and_search,
     initialize_api_client
 )
 
+from .embedding_store import (
+    EmbeddingStore,
+    convert_json_to_store,
+    resolve_embeddings_file
+)
+
+from .embedding_cache import EmbeddingCache
+
+from .text_normalizer import (
+    TextNormalizer,
+    normalize_for_embedding
+)
+
+from .async_embedding import (
+    AsyncEmbeddingClient,
+    TokenBucket,
+    create_embeddings_concurrent
+)
+
+from .incremental_ingest import (
+    update_embedding_store,
+    update_embedding_stores,
+    update_document_stores,
+    compact_embedding_store
+)
+
+from .streaming_ingest import (
+    stream_embeddings,
+    stream_files_to_store
+)
+
+from .api_providers import (
+    LocalApiClient,
+    register_api_provider,
+    create_api_client
+)
+
+from .config import get_env_int
+
 # 导出摘要和标题提取功能
 from .abstract_extractor import (
     extract_title_from_file,
@@ -40,6 +112,7 @@ from .abstract_extractor import (
     extract_info_from_file,
     process_directory,
     create_embeddings_from_info,
+    update_abstract_store,
     search_by_text as search_by_abstract_text,
     process_and_search as process_and_search_abstracts,
     format_article_results
@@ -55,28 +128,86 @@ logging.basicConfig(
 # 导出的函数和类列表
 __all__ = [
     # xml_text_extractor
+    "iter_paragraphs",
     "extract_paragraphs_with_metadata",
     "process_directory_with_metadata",
     
+    # parallel_extract
+    "ExtractionStats",
+    "map_files",
+    
+    # document_parser
+    "ParsedDocument",
+    "parse_document",
+    "load_document_records",
+    "load_processed_document",
+    
     # text_similarity
     "load_embeddings",
     "create_query_embedding",
+    "create_embeddings_batch",
     "search_similar_text",
+    "build_embedding_matrix",
+    "search_embedding_matrix",
+    "search_similar_texts_batch",
+    "search_embedding_matrix_batch",
+    "merge_search_results",
+    "EmbeddingIndex",
+    "get_embedding_index",
+    "get_index_cache_stats",
+    "clear_index_cache",
     "search_by_text",
     "search_by_existing_text",
     "format_search_results",
     
     # text_processor
     "extract_and_create_embeddings",
+    "update_fulltext_store",
     "process_and_search",
     "initialize_api_client",
     
+    # embedding_store
+    "EmbeddingStore",
+    "convert_json_to_store",
+    "resolve_embeddings_file",
+    
+    # embedding_cache
+    "EmbeddingCache",
+    
+    # text_normalizer
+    "TextNormalizer",
+    "normalize_for_embedding",
+    
+    # async_embedding
+    "AsyncEmbeddingClient",
+    "TokenBucket",
+    "create_embeddings_concurrent",
+    
+    # incremental_ingest
+    "update_embedding_store",
+    "update_embedding_stores",
+    "update_document_stores",
+    "compact_embedding_store",
+    
+    # streaming_ingest
+    "stream_embeddings",
+    "stream_files_to_store",
+    
+    # api_providers
+    "LocalApiClient",
+    "register_api_provider",
+    "create_api_client",
+    
+    # config
+    "get_env_int",
+    
     # abstract_extractor
     "extract_title_from_file",
     "extract_abstract_from_file",
     "extract_info_from_file",
     "process_directory",
     "create_embeddings_from_info",
+    "update_abstract_store",
     "search_by_abstract_text",
     "process_and_search_abstracts",
     "format_article_results"
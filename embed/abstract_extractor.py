@@ -4,7 +4,6 @@
 """
 
 import os
-import re
 import glob
 import json
 import argparse
@@ -20,15 +19,27 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 try:
     from embed.text_similarity import (
         load_embeddings, normalize_vector, cosine_similarity, 
-        create_query_embedding, search_similar_text, format_search_results
+        create_query_embedding, search_similar_text, format_search_results,
+        get_embedding_index
     )
+    from embed.async_embedding import create_embeddings_concurrent
+    from embed.text_normalizer import get_text_normalizer
+    from embed.incremental_ingest import update_embedding_store
+    from embed.document_parser import parse_document, parse_title, parse_abstract, info_to_record
+    from embed.parallel_extract import extract_files_parallel
 except ImportError:
     # 当作为模块导入时尝试相对导入
     try:
         from .text_similarity import (
             load_embeddings, normalize_vector, cosine_similarity, 
-            create_query_embedding, search_similar_text, format_search_results
+            create_query_embedding, search_similar_text, format_search_results,
+            get_embedding_index
         )
+        from .async_embedding import create_embeddings_concurrent
+        from .text_normalizer import get_text_normalizer
+        from .incremental_ingest import update_embedding_store
+        from .document_parser import parse_document, parse_title, parse_abstract, info_to_record
+        from .parallel_extract import extract_files_parallel
     except ImportError as e:
         print(f"导入错误: {e}")
         print("请确保在正确的目录中运行此脚本，或将embed目录添加到Python路径")
@@ -50,12 +61,10 @@ def extract_title_from_file(file_path: str) -> str:
         with open(file_path, 'r', encoding='utf-8') as file:
             content = file.read()
         
-        # 使用正则表达式查找<title level="a" type="main">标签中的内容
-        title_pattern = re.compile(r'<title\s+level="a"\s+type="main">(.*?)</title>', re.DOTALL)
-        title_match = title_pattern.search(content)
+        # 查找<title level="a" type="main">标签中的内容
+        title = parse_title(content)
         
-        if title_match:
-            title = title_match.group(1).strip()
+        if title:
             print(f"从文件 {file_path} 中提取了标题: {title[:50]}...")
             return title
         else:
@@ -82,18 +91,10 @@ def extract_abstract_from_file(file_path: str) -> str:
         with open(file_path, 'r', encoding='utf-8') as file:
             content = file.read()
         
-        # 使用正则表达式查找<abstract>标签中的内容
-        abstract_pattern = re.compile(r'<abstract>(.*?)</abstract>', re.DOTALL)
-        abstract_match = abstract_pattern.search(content)
+        # 查找<abstract>标签中的内容，并移除图表引用 (type="figure" 的 ref 标签)
+        abstract = parse_abstract(content)
         
-        if abstract_match:
-            # 获取原始摘要文本
-            abstract = abstract_match.group(1).strip()
-            
-            # 移除图表引用 (type="figure" 的 ref 标签)
-            figure_ref_pattern = re.compile(r'<ref\s+type="figure".*?>.*?</ref>', re.DOTALL)
-            abstract = figure_ref_pattern.sub('', abstract)
-            
+        if abstract:
             # 打印调试信息
             print(f"从文件 {file_path} 中提取了摘要: {abstract[:50]}...")
             
@@ -118,34 +119,10 @@ def extract_info_from_file(file_path: str) -> Dict:
         包含标题、摘要和合并信息的字典
     """
     try:
-        title = extract_title_from_file(file_path)
-        abstract = extract_abstract_from_file(file_path)
-        
-        # 从文件名中提取元数据
-        file_name = os.path.basename(file_path)
-        metadata = {}
-        if " - " in file_name:
-            parts = file_name.split(" - ")
-            if len(parts) >= 3:
-                metadata["journal"] = parts[0].strip()
-                metadata["year"] = parts[1].strip()
-                metadata["author"] = parts[2].split(" ")[0].strip()
-        
-        # 合并标题和摘要
-        combined_info = ""
-        if title:
-            combined_info += f"标题: {title}\n"
-        if abstract:
-            combined_info += f"摘要: {abstract}"
-        
-        return {
-            "title": title,
-            "abstract": abstract,
-            "combined_info": combined_info.strip(),
-            "file_path": file_path,
-            "file_name": file_name,
-            "metadata": metadata
-        }
+        # 一次读取同时解析标题和摘要
+        info = parse_document(file_path).to_info()
+        print(f"从文件 {file_path} 中提取了标题: {info['title'][:50]}...")
+        return info
         
     except Exception as e:
         print(f"提取文件信息时出错 {file_path}: {e}")
@@ -159,13 +136,14 @@ def extract_info_from_file(file_path: str) -> Dict:
         }
 
 
-def process_directory(directory: str, file_pattern: str = "*.xml") -> List[Dict]:
+def process_directory(directory: str, file_pattern: str = "*.xml", workers: int = 1) -> List[Dict]:
     """
     处理目录中的所有XML文件
     
     Args:
         directory: 包含XML文件的目录
         file_pattern: 匹配XML文件的glob模式
+        workers: 并行提取的进程数，1表示串行，None或0表示读取 EXTRACT_WORKERS 环境变量或使用CPU核数
         
     Returns:
         包含文件信息的字典列表
@@ -174,11 +152,15 @@ def process_directory(directory: str, file_pattern: str = "*.xml") -> List[Dict]
         raise ValueError("未指定目录")
     
     result = []
-    file_paths = glob.glob(os.path.join(directory, file_pattern))
+    file_paths = sorted(glob.glob(os.path.join(directory, file_pattern)))
     print(f"在目录 {directory} 中找到 {len(file_paths)} 个匹配文件")
     
-    for file_path in file_paths:
-        file_info = extract_info_from_file(file_path)
+    if workers != 1:
+        file_infos = [info for _, info in extract_files_parallel(extract_info_from_file, file_paths, workers)]
+    else:
+        file_infos = (extract_info_from_file(file_path) for file_path in file_paths)
+    
+    for file_info in file_infos:
         if file_info["combined_info"]:  # 只添加有内容的文件信息
             result.append(file_info)
         
@@ -204,7 +186,9 @@ def create_embeddings_from_info(
     output_file: str,
     api_client=None,
     model: str = "doubao-embedding-text-240715",
-    batch_size: int = 10
+    batch_size: int = 10,
+    cache=None,
+    concurrency: int = None
 ) -> bool:
     """
     为文章简略信息创建嵌入向量
@@ -215,6 +199,8 @@ def create_embeddings_from_info(
         api_client: API客户端实例
         model: 嵌入模型名称
         batch_size: 批量处理大小
+        cache: 可选的 EmbeddingCache，已缓存的文本不再调用API
+        concurrency: 同时进行的嵌入请求数，默认读取 EMBEDDING_CONCURRENCY 环境变量
         
     Returns:
         处理是否成功
@@ -231,38 +217,29 @@ def create_embeddings_from_info(
     embeddings_data = []
     errors_count = 0
     
-    for i in range(0, len(info_list), batch_size):
-        batch = info_list[i:i+batch_size]
-        print(f"处理批次 {i//batch_size + 1}/{(len(info_list)-1)//batch_size + 1}...")
-        
-        for item in batch:
-            try:
-                text = item["combined_info"]
-                file_name = item.get("file_name", "未知文件")
-                print(f"处理文档: {file_name[:50]}...")
-                
-                # 生成嵌入向量
-                embedding = create_query_embedding(text, api_client, model)
-                
-                if embedding:
-                    embeddings_data.append({
-                        "text": text,
-                        "embedding": embedding,
-                        "title": item.get("title", ""),
-                        "abstract": item.get("abstract", ""),
-                        "file_path": item.get("file_path", ""),
-                        "file_name": file_name,
-                        "metadata": item.get("metadata", {})
-                    })
-                    print(f"✓ 成功创建嵌入向量 - {file_name[:50]}")
-                else:
-                    print(f"✗ 警告: 无法为文档生成嵌入向量: {file_name}")
-                    errors_count += 1
-            except Exception as e:
-                print(f"✗ 处理文档时出错 ({item.get('file_name', '未知')}): {str(e)}")
+    # 各批次并发请求，结果按文档顺序返回；发送规范化后的文本，记录中保存原文
+    embeddings = create_embeddings_concurrent(
+        get_text_normalizer().normalize_many([item["combined_info"] for item in info_list]),
+        api_client, model, batch_size,
+        concurrency=concurrency, cache=cache
+    )
+    
+    for item, embedding in zip(info_list, embeddings):
+        try:
+            file_name = item.get("file_name", "未知文件")
+            print(f"处理文档: {file_name[:50]}...")
+            
+            if embedding:
+                embeddings_data.append(dict(info_to_record(item), embedding=embedding))
+                print(f"✓ 成功创建嵌入向量 - {file_name[:50]}")
+            else:
+                print(f"✗ 警告: 无法为文档生成嵌入向量: {file_name}")
                 errors_count += 1
-                # 继续处理下一篇文档
-                continue
+        except Exception as e:
+            print(f"✗ 处理文档时出错 ({item.get('file_name', '未知')}): {str(e)}")
+            errors_count += 1
+            # 继续处理下一篇文档
+            continue
     
     # 保存嵌入向量数据
     if embeddings_data:
@@ -306,8 +283,8 @@ def search_by_text(
         print("错误: 未提供API客户端")
         return []
     
-    # 加载嵌入向量数据
-    embeddings_data = load_embeddings(embeddings_file)
+    # 获取共享的嵌入向量索引（文件未变化时不会重新加载）
+    index = get_embedding_index(embeddings_file)
     
     # 创建查询文本的嵌入向量
     query_vector = create_query_embedding(query_text, api_client, model)
@@ -317,9 +294,7 @@ def search_by_text(
         return []
     
     # 搜索相似文章
-    similar_texts = search_similar_text(
-        query_vector, embeddings_data, top_k, threshold
-    )
+    similar_texts = index.search(query_vector, top_k, threshold)
     
     return similar_texts
 
@@ -567,6 +542,13 @@ def main():
         help='相似度阈值（默认：0.5）'
     )
     
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=1,
+        help='并行提取的进程数，0表示使用CPU核数（默认：1，串行）'
+    )
+    
     # 解析参数
     try:
         args = parser.parse_args()
@@ -628,7 +610,7 @@ def main():
     if os.path.isdir(args.input):
         # 处理目录
         print(f"正在处理目录: {args.input}")
-        info_list = process_directory(args.input, args.pattern)
+        info_list = process_directory(args.input, args.pattern, args.workers)
         if not info_list:
             print("错误: 在目录中未找到有效文件或无法提取有效信息")
             sys.exit(1)
@@ -949,7 +931,9 @@ def extract_and_create_embeddings(
     api_client=None,
     model: str = "doubao-embedding-text-240715",
     file_pattern: str = "*.xml",
-    batch_size: int = 10
+    batch_size: int = 10,
+    cache=None,
+    concurrency: int = None
 ) -> bool:
     """
     从XML文件中提取文本并生成嵌入向量的整合函数
@@ -961,6 +945,8 @@ def extract_and_create_embeddings(
         model: 嵌入模型名称
         file_pattern: 匹配XML文件的模式
         batch_size: 批量处理大小
+        cache: 可选的 EmbeddingCache，已缓存的文本不再调用API
+        concurrency: 同时进行的嵌入请求数，默认读取 EMBEDDING_CONCURRENCY 环境变量
         
     Returns:
         处理是否成功
@@ -989,11 +975,57 @@ def extract_and_create_embeddings(
     
     # 生成嵌入向量
     success = create_embeddings_from_info(
-        info_list, output_file, api_client, model, batch_size
+        info_list, output_file, api_client, model, batch_size, cache, concurrency
     )
     
     return success
 
 
+def update_abstract_store(
+    input_dir: str,
+    store_file: str,
+    api_client=None,
+    model: str = "doubao-embedding-text-240715",
+    file_pattern: str = "*.xml",
+    batch_size: int = 10,
+    cache=None,
+    concurrency: int = None
+) -> bool:
+    """
+    增量更新摘要嵌入向量存储，只处理新增或修改过的文件
+    
+    Args:
+        input_dir: 包含XML文件的目录
+        store_file: 存储路径（.npy）
+        api_client: API客户端实例
+        model: 嵌入模型名称
+        file_pattern: 匹配XML文件的模式
+        batch_size: 批量处理大小
+        cache: 可选的 EmbeddingCache
+        concurrency: 同时进行的嵌入请求数
+        
+    Returns:
+        处理是否成功
+    """
+    if not api_client:
+        print("错误: 未提供API客户端，无法生成嵌入向量")
+        return False
+    
+    if not os.path.isdir(input_dir):
+        print(f"错误: 目录不存在 {input_dir}")
+        return False
+    
+    try:
+        update_embedding_store(
+            input_dir, store_file, lambda path: parse_document(path).abstract_records(), api_client, model,
+            file_pattern, batch_size, cache, concurrency
+        )
+    except Exception as e:
+        print(f"增量更新摘要嵌入向量时出错: {str(e)}")
+        return False
+    
+    return True
+
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
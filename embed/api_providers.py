@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+API提供方：initialize_api_client 根据环境变量 API_PROVIDER 选择客户端实现
+
+- ark（默认）：火山方舟 Ark 客户端
+- local：本地替身客户端，用确定性的哈希向量化生成嵌入向量，
+  对话接口返回固定格式的内容，用于离线压测和基准测试
+
+本地客户端的行为可通过环境变量调整：
+- LOCAL_EMBEDDING_DIM: 嵌入向量维度（默认256）
+- LOCAL_API_LATENCY: 每次请求的模拟延迟，单位秒（默认0）
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+from types import SimpleNamespace
+from typing import List, Dict, Callable, Optional
+import numpy as np
+
+# 确保embed包可以被导入
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+DEFAULT_PROVIDER = "ark"
+DEFAULT_LOCAL_DIMENSION = 256
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u3400-\u9fff]")
+
+_api_providers: Dict[str, Callable] = {}
+
+
+def register_api_provider(name: str, factory: Callable):
+    """
+    注册API提供方
+
+    Args:
+        name: 提供方名称（API_PROVIDER 环境变量的取值）
+        factory: 无参数的工厂函数，返回带 embeddings 和 chat 接口的客户端
+    """
+    _api_providers[name.lower()] = factory
+
+
+def get_api_provider_name() -> str:
+    """
+    获取当前选择的API提供方名称
+
+    Returns:
+        API_PROVIDER 环境变量的值（小写），未设置时为 "ark"
+    """
+    return (os.environ.get("API_PROVIDER") or DEFAULT_PROVIDER).strip().lower()
+
+
+def create_api_client(provider: Optional[str] = None):
+    """
+    使用已注册的提供方创建客户端
+
+    Args:
+        provider: 提供方名称，默认使用 get_api_provider_name()
+
+    Returns:
+        客户端实例
+    """
+    provider = (provider or get_api_provider_name()).lower()
+    if provider not in _api_providers:
+        raise ValueError(f"未知的API提供方: {provider}，可选: {', '.join(sorted(_api_providers))}")
+    return _api_providers[provider]()
+
+
+def hash_embedding(text: str, dimension: int = DEFAULT_LOCAL_DIMENSION) -> List[float]:
+    """
+    确定性的哈希向量化：英文按单词、中文按单字和相邻双字计入特征
+
+    Args:
+        text: 文本
+        dimension: 向量维度
+
+    Returns:
+        单位长度的嵌入向量
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    features = tokens + [a + b for a, b in zip(tokens, tokens[1:])]
+
+    vector = np.zeros(dimension, dtype=np.float64)
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dimension] += 1.0 if (value >> 63) & 1 else -1.0
+
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+    else:
+        vector /= norm
+    return vector.tolist()
+
+
+class _LocalEmbeddings:
+    """embeddings.create 接口的本地实现"""
+
+    def __init__(self, client: "LocalApiClient"):
+        self._client = client
+
+    def create(self, model: str, input, encoding_format: str = "float", **kwargs):
+        self._client._simulate_latency()
+        texts = [input] if isinstance(input, str) else list(input)
+
+        data = [
+            SimpleNamespace(object="embedding", index=i,
+                            embedding=hash_embedding(text, self._client.dimension))
+            for i, text in enumerate(texts)
+        ]
+        tokens = sum(len(_TOKEN_PATTERN.findall(text.lower())) for text in texts)
+        return SimpleNamespace(
+            object="list", model=model, data=data,
+            usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens)
+        )
+
+
+class _LocalChatCompletions:
+    """chat.completions.create 接口的本地实现"""
+
+    def __init__(self, client: "LocalApiClient"):
+        self._client = client
+
+    def create(self, model: str, messages: List[Dict], **kwargs):
+        self._client._simulate_latency()
+        prompt = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") == "user")
+
+        if '"blocks"' in prompt:
+            content = self._outline_response(prompt)
+        elif '"keywords"' in prompt:
+            content = self._keywords_response(prompt)
+        else:
+            content = self._review_response(prompt)
+
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=len(prompt), completion_tokens=len(content),
+                                  total_tokens=len(prompt) + len(content))
+        )
+
+    @staticmethod
+    def _top_words(text: str) -> List[str]:
+        """出现频率最高的英文单词，最多10个"""
+        counts = {}
+        for word in re.findall(r"[A-Za-z][A-Za-z-]{3,}", text):
+            counts[word.lower()] = counts.get(word.lower(), 0) + 1
+        return sorted(counts, key=lambda w: (-counts[w], w))[:10] or ["review"]
+
+    @classmethod
+    def _keywords_response(cls, prompt: str) -> str:
+        """关键词生成：取大纲部分出现频率最高的英文单词"""
+        match = re.search(r"<outline>(.*?)</outline>", prompt, re.DOTALL)
+        source = match.group(1) if match else prompt
+        keywords = cls._top_words(source)
+
+        return "<think>本地模拟响应</think>\n" + json.dumps({"keywords": keywords}, ensure_ascii=False)
+
+    @classmethod
+    def _outline_response(cls, prompt: str) -> str:
+        """大纲分解：标题行（#、"1."、"一、" 等开头）开始一个板块，其后各行为板块内容；
+        没有标题行时每个非空行为一个板块"""
+        match = re.search(r"<outline>(.*?)</outline>", prompt, re.DOTALL)
+        lines = [line.strip() for line in (match.group(1) if match else prompt).splitlines() if line.strip()]
+
+        heading = re.compile(r"^(?:#+\s*|\d+(?:\.\d+)*[.、)]\s*|[一二三四五六七八九十]+[、.]\s*)")
+        has_headings = any(heading.match(line) for line in lines)
+        blocks = []
+        for line in lines:
+            if heading.match(line) or not has_headings or not blocks:
+                blocks.append({"title": heading.sub("", line) or line, "content": ""})
+            else:
+                blocks[-1]["content"] = (blocks[-1]["content"] + "\n" + line).strip()
+
+        for block in blocks:
+            block["content"] = block["content"] or block["title"]
+            block["keywords"] = cls._top_words(block["title"] + "\n" + block["content"])
+
+        return "<think>本地模拟响应</think>\n" + json.dumps({"blocks": blocks}, ensure_ascii=False)
+
+    @staticmethod
+    def _review_response(prompt: str) -> str:
+        """综述生成：返回包含标题的固定段落"""
+        match = re.search(r'关于"(.*?)"的综述', prompt)
+        title = match.group(1) if match else "该主题"
+        paragraph = f"本段为关于{title}的本地模拟综述内容，用于离线测试流水线的吞吐和格式。"
+        return "\n\n".join([paragraph] * 3)
+
+
+class LocalApiClient:
+    """
+    与Ark客户端接口兼容的本地替身客户端
+    """
+
+    def __init__(self, dimension: int = DEFAULT_LOCAL_DIMENSION, latency: float = 0.0):
+        """
+        初始化客户端
+
+        Args:
+            dimension: 嵌入向量维度
+            latency: 每次请求的模拟延迟（秒）
+        """
+        self.dimension = dimension
+        self.latency = latency
+        self.embeddings = _LocalEmbeddings(self)
+        self.chat = SimpleNamespace(completions=_LocalChatCompletions(self))
+
+    def _simulate_latency(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+
+def create_local_client() -> LocalApiClient:
+    """
+    按环境变量配置创建本地客户端
+
+    Returns:
+        LocalApiClient 实例
+    """
+    try:
+        dimension = int(os.environ.get("LOCAL_EMBEDDING_DIM", DEFAULT_LOCAL_DIMENSION))
+        latency = float(os.environ.get("LOCAL_API_LATENCY", "0"))
+    except ValueError:
+        print("警告: LOCAL_EMBEDDING_DIM 或 LOCAL_API_LATENCY 环境变量无效，使用默认值")
+        dimension, latency = DEFAULT_LOCAL_DIMENSION, 0.0
+
+    print(f"使用本地API客户端（维度 {dimension}，模拟延迟 {latency}秒）")
+    return LocalApiClient(dimension, latency)
+
+
+register_api_provider("local", create_local_client)
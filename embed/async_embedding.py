@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+异步嵌入向量客户端：在并发上限和每分钟请求数/令牌数限制内并行调用嵌入API
+
+Ark客户端本身是同步的，每个批次请求在线程池中执行，由asyncio负责调度：
+信号量限制同时进行的请求数，令牌桶限制每分钟的请求数和令牌数，
+结果按输入顺序重新组装。
+"""
+
+import os
+import sys
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+# 确保embed包可以被导入
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+try:
+    from embed.text_similarity import create_embeddings_batch
+    from embed.config import get_env_int
+except ImportError:
+    from .text_similarity import create_embeddings_batch
+    from .config import get_env_int
+
+DEFAULT_CONCURRENCY = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估计文本的令牌数：中日韩字符各计1个，其余字符每4个计1个
+
+    Args:
+        text: 文本
+
+    Returns:
+        估计的令牌数
+    """
+    cjk = sum(1 for ch in text if '\u3000' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af')
+    return max(1, cjk + (len(text) - cjk + 3) // 4)
+
+
+class TokenBucket:
+    """
+    令牌桶限流器：容量为每分钟配额，按恒定速率补充
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        初始化令牌桶
+
+        Args:
+            per_minute: 每分钟补充的令牌数
+            capacity: 桶容量（允许的突发量），默认等于每分钟配额
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._thread_lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, amount: float = 1):
+        """
+        取出指定数量的令牌，不足时阻塞等待补充；在发送请求的工作线程中调用
+
+        Args:
+            amount: 令牌数量（超过容量时按容量计算）
+        """
+        amount = min(amount, self.capacity)
+        with self._thread_lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                time.sleep((amount - self.tokens) / self.rate)
+
+
+class AsyncEmbeddingClient:
+    """
+    基于 initialize_api_client 返回的Ark客户端的异步嵌入向量客户端
+    """
+
+    def __init__(
+        self,
+        api_client,
+        model: str = "doubao-embedding-text-240715",
+        batch_size: int = 10,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        cache=None
+    ):
+        """
+        初始化客户端
+
+        Args:
+            api_client: API客户端实例
+            model: 嵌入模型名称
+            batch_size: 每次请求的文本数量
+            concurrency: 同时进行的请求数上限
+            requests_per_minute: 每分钟请求数上限，None表示不限制
+            tokens_per_minute: 每分钟令牌数上限，None表示不限制
+            cache: 可选的 EmbeddingCache，命中的文本不再调用API
+        """
+        self.api_client = api_client
+        self.model = model
+        self.batch_size = max(1, batch_size or 1)
+        self.concurrency = max(1, concurrency or 1)
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.cache = cache
+
+    def throttle(self, texts: List[str]):
+        """
+        发送一次请求前按请求数和令牌数限流，在执行请求的工作线程中调用
+
+        Args:
+            texts: 本次请求的文本
+        """
+        if self.request_bucket is not None:
+            self.request_bucket.wait(1)
+        if self.token_bucket is not None:
+            self.token_bucket.wait(sum(estimate_tokens(t) for t in texts))
+
+    async def embed(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        并发生成嵌入向量
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与 texts 一一对应的嵌入向量列表，生成失败的位置为None
+        """
+        results = [None] * len(texts)
+
+        # 空文本不发送请求
+        pending = [i for i, text in enumerate(texts) if text and text.strip()]
+
+        if self.cache is not None and pending:
+            cached = self.cache.get_many([texts[i] for i in pending], self.model)
+            for i, vector in zip(pending, cached):
+                results[i] = vector
+            hits = len(pending)
+            pending = [i for i in pending if results[i] is None]
+            hits -= len(pending)
+            if hits:
+                print(f"嵌入向量缓存命中 {hits} 条，需请求 {len(pending)} 条")
+
+        if not pending:
+            return results
+
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+        completed = 0
+
+        async def run_batch(indices: List[int]):
+            nonlocal completed
+            batch_texts = [texts[i] for i in indices]
+
+            async with semaphore:
+                # 限流在工作线程中进行，整批失败后的逐条重试同样计入配额
+                vectors = await loop.run_in_executor(
+                    executor, functools.partial(
+                        create_embeddings_batch, batch_texts, self.api_client, self.model,
+                        len(batch_texts), throttle=self.throttle
+                    )
+                )
+
+            # 按原始下标写回，保证结果顺序与输入一致
+            for i, vector in zip(indices, vectors):
+                results[i] = vector
+
+            completed += 1
+            print(f"完成批次 {completed}/{len(batches)}")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            await asyncio.gather(*(run_batch(indices) for indices in batches))
+
+        if self.cache is not None:
+            self.cache.put_many([texts[i] for i in pending], [results[i] for i in pending], self.model)
+
+        return results
+
+
+def create_embeddings_concurrent(
+    texts: Sequence[str],
+    api_client=None,
+    model: str = "doubao-embedding-text-240715",
+    batch_size: int = 10,
+    concurrency: Optional[int] = None,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    cache=None
+) -> List[Optional[List[float]]]:
+    """
+    AsyncEmbeddingClient 的同步封装
+
+    未指定的并发和限流参数依次从环境变量 EMBEDDING_CONCURRENCY、
+    EMBEDDING_RPM、EMBEDDING_TPM 读取。
+
+    Args:
+        texts: 文本列表
+        api_client: API客户端实例
+        model: 嵌入模型名称
+        batch_size: 每次请求的文本数量
+        concurrency: 同时进行的请求数上限
+        requests_per_minute: 每分钟请求数上限
+        tokens_per_minute: 每分钟令牌数上限
+        cache: 可选的 EmbeddingCache
+
+    Returns:
+        与 texts 一一对应的嵌入向量列表，生成失败的位置为None
+    """
+    if not api_client:
+        print("错误: 未提供API客户端")
+        return [None] * len(texts)
+
+    client = AsyncEmbeddingClient(
+        api_client,
+        model=model,
+        batch_size=batch_size,
+        concurrency=concurrency or get_env_int("EMBEDDING_CONCURRENCY", DEFAULT_CONCURRENCY),
+        requests_per_minute=requests_per_minute or get_env_int("EMBEDDING_RPM", None),
+        tokens_per_minute=tokens_per_minute or get_env_int("EMBEDDING_TPM", None),
+        cache=cache,
+    )
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(client.embed(texts))
+
+    # 已处于事件循环中（例如在异步框架内调用）时，在独立线程中运行
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, client.embed(texts)).result()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+配置读取：从环境变量读取各模块共用的数值参数
+"""
+
+import os
+from typing import Optional
+
+
+def get_env_int(name: str, default: Optional[int]) -> Optional[int]:
+    """
+    读取整数环境变量
+
+    Args:
+        name: 环境变量名
+        default: 未设置或无效时的默认值
+
+    Returns:
+        环境变量的整数值，未设置或无效时为 default
+    """
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"警告: {name}环境变量无效，使用默认值 {default}")
+        return default
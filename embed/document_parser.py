@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+文档解析器：一次读取处理后的XML文件，同时得到标题、摘要、章节段落和文件名元数据
+
+摘要入库和正文入库共用同一个解析结果，每个文件只需读取和扫描一次。
+GrobidProcessor 输出的JSONL记录文件（.jsonl）已包含同样的内容，直接读取，无需解析。
+"""
+
+import os
+import re
+import sys
+import json
+from typing import List, Dict, Optional
+
+# 确保embed包可以被导入
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+try:
+    from embed.xml_text_extractor import iter_paragraphs_in_text, parse_file_name_metadata
+except ImportError:
+    from .xml_text_extractor import iter_paragraphs_in_text, parse_file_name_metadata
+
+TITLE_PATTERN = re.compile(r'<title\s+level="a"\s+type="main">(.*?)</title>', re.DOTALL)
+ABSTRACT_PATTERN = re.compile(r'<abstract>(.*?)</abstract>', re.DOTALL)
+FIGURE_REF_PATTERN = re.compile(r'<ref\s+type="figure".*?>.*?</ref>', re.DOTALL)
+
+
+def parse_title(content: str) -> str:
+    """
+    从XML文本中提取 <title level="a" type="main"> 标题
+
+    Args:
+        content: XML文本
+
+    Returns:
+        标题文本，未找到时为空字符串
+    """
+    match = TITLE_PATTERN.search(content)
+    return match.group(1).strip() if match else ""
+
+
+def parse_abstract(content: str) -> str:
+    """
+    从XML文本中提取摘要，去除 type="figure" 的图表引用
+
+    Args:
+        content: XML文本
+
+    Returns:
+        摘要文本，未找到时为空字符串
+    """
+    match = ABSTRACT_PATTERN.search(content)
+    if not match:
+        return ""
+    return FIGURE_REF_PATTERN.sub('', match.group(1).strip())
+
+
+def info_to_record(info: Dict) -> Dict:
+    """
+    将文章简略信息转换为摘要嵌入向量记录（不含嵌入向量）
+
+    Args:
+        info: extract_info_from_file 或 ParsedDocument.to_info 返回的字典
+
+    Returns:
+        记录字典
+    """
+    return {
+        "text": info["combined_info"],
+        "title": info.get("title", ""),
+        "abstract": info.get("abstract", ""),
+        "file_path": info.get("file_path", ""),
+        "file_name": info.get("file_name", "未知文件"),
+        "metadata": info.get("metadata", {})
+    }
+
+
+class ParsedDocument:
+    """
+    处理后的XML文件的结构化表示
+    """
+
+    def __init__(self, file_path: str, title: str, abstract: str, paragraphs: List[Dict],
+                 file_name: Optional[str] = None, metadata: Optional[Dict] = None):
+        """
+        Args:
+            file_path: XML文件路径
+            title: 标题
+            abstract: 摘要（已去除图表引用）
+            paragraphs: 段落字典列表（position、section、content）
+            file_name: 文件名，默认取 file_path 的文件名
+            metadata: 文件元数据，默认从文件名解析
+        """
+        self.file_path = file_path
+        self.file_name = file_name or os.path.basename(file_path)
+        self.title = title
+        self.abstract = abstract
+        self.paragraphs = paragraphs
+        self.metadata = metadata if metadata is not None else parse_file_name_metadata(self.file_name)
+
+    @property
+    def sections(self) -> List[str]:
+        """按出现顺序排列的章节标题"""
+        return list(dict.fromkeys(p["section"] for p in self.paragraphs if p["section"]))
+
+    @property
+    def combined_info(self) -> str:
+        """标题和摘要合并而成的文章简略信息"""
+        combined_info = ""
+        if self.title:
+            combined_info += f"标题: {self.title}\n"
+        if self.abstract:
+            combined_info += f"摘要: {self.abstract}"
+        return combined_info.strip()
+
+    def to_info(self) -> Dict:
+        """
+        转换为 abstract_extractor.extract_info_from_file 的返回格式
+
+        Returns:
+            文章简略信息字典
+        """
+        # 摘要记录的元数据历来不包含从文件名解析的标题
+        metadata = {k: v for k, v in self.metadata.items() if k != "title"}
+        return {
+            "title": self.title,
+            "abstract": self.abstract,
+            "combined_info": self.combined_info,
+            "file_path": self.file_path,
+            "file_name": self.file_name,
+            "metadata": metadata
+        }
+
+    def to_paragraph_items(self) -> List[Dict]:
+        """
+        转换为 xml_text_extractor.extract_paragraphs_with_metadata 的返回格式
+
+        Returns:
+            段落字典列表
+        """
+        return [
+            {
+                "paragraph_id": p["position"],
+                "section": p["section"],
+                "content": p["content"],
+                "file_path": self.file_path,
+                "file_name": self.file_name,
+                "metadata": self.metadata
+            }
+            for p in self.paragraphs
+        ]
+
+    def abstract_records(self) -> List[Dict]:
+        """摘要嵌入向量记录（没有标题和摘要时为空）"""
+        return [info_to_record(self.to_info())] if self.combined_info else []
+
+    def paragraph_records(self) -> List[Dict]:
+        """正文嵌入向量记录"""
+        return [{"text": p["content"], "metadata": self.metadata} for p in self.paragraphs]
+
+
+def parse_document(file_path: str) -> ParsedDocument:
+    """
+    读取并解析处理后的XML文件
+
+    Args:
+        file_path: XML文件路径
+
+    Returns:
+        ParsedDocument 实例
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+
+    return ParsedDocument(
+        file_path,
+        parse_title(content),
+        parse_abstract(content),
+        list(iter_paragraphs_in_text(content))
+    )
+
+
+def load_document_records(file_path: str) -> ParsedDocument:
+    """
+    读取 GrobidProcessor 输出的JSONL记录文件
+
+    第一行为文档记录（标题、摘要、文件名和元数据），其后每行为一个段落记录。
+
+    Args:
+        file_path: JSONL文件路径
+
+    Returns:
+        ParsedDocument 实例，file_name 和 metadata 取自记录（即处理后的XML文件名）
+    """
+    document = {}
+    paragraphs = []
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("type") == "document":
+                document = record
+            else:
+                paragraphs.append({
+                    "position": record["paragraph_id"],
+                    "section": record.get("section", ""),
+                    "content": record["content"]
+                })
+
+    return ParsedDocument(
+        file_path,
+        document.get("title", ""),
+        document.get("abstract", ""),
+        paragraphs,
+        file_name=document.get("file_name"),
+        metadata=document.get("metadata")
+    )
+
+
+def load_processed_document(file_path: str) -> ParsedDocument:
+    """
+    读取处理后的文件：.jsonl 为记录文件，其他按XML解析
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        ParsedDocument 实例
+    """
+    if file_path.endswith(".jsonl"):
+        return load_document_records(file_path)
+    return parse_document(file_path)
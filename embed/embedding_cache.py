@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+嵌入向量缓存：按 (模型, 规范化文本) 的哈希将嵌入向量持久化到本地SQLite文件
+
+重新处理基本未变化的文献集合时，已经生成过的段落和摘要直接从缓存读取，
+只有新增或修改过的文本才会调用嵌入API。缓存条目数有上限，超出时按最近
+访问时间淘汰（LRU）。
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+import unicodedata
+from typing import List, Dict, Optional, Sequence
+import numpy as np
+
+# 确保embed包可以被导入
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+DEFAULT_MAX_ENTRIES = 200000
+
+
+def normalize_cache_text(text: str) -> str:
+    """
+    规范化文本，使仅有空白或Unicode表示差异的文本命中同一缓存条目
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        规范化后的文本
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_cache_key(text: str, model: str) -> str:
+    """
+    计算缓存键：模型名称与规范化文本的sha256
+
+    Args:
+        text: 原始文本
+        model: 嵌入模型名称
+
+    Returns:
+        十六进制哈希字符串
+    """
+    payload = model + "\0" + normalize_cache_text(text)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    基于SQLite的嵌入向量缓存
+
+    向量以float32二进制存储。实例可在多个线程之间共享。
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        打开（或创建）缓存文件
+
+        Args:
+            path: SQLite文件路径
+            max_entries: 最大缓存条目数，超出时淘汰最久未访问的条目
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, "
+            "model TEXT NOT NULL, "
+            "dimension INTEGER NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+
+    def get_many(self, texts: Sequence[str], model: str) -> List[Optional[List[float]]]:
+        """
+        批量查询缓存
+
+        Args:
+            texts: 文本列表
+            model: 嵌入模型名称
+
+        Returns:
+            与 texts 一一对应的嵌入向量列表，未命中的位置为None
+        """
+        keys = [make_cache_key(text, model) for text in texts]
+        found = {}
+
+        with self._lock:
+            # SQLite对单条语句的参数数量有限制，分块查询
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="<f4").tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for vector in results if vector is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """
+        查询单条文本的缓存
+
+        Args:
+            text: 文本
+            model: 嵌入模型名称
+
+        Returns:
+            嵌入向量，未命中时返回None
+        """
+        return self.get_many([text], model)[0]
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Optional[List[float]]], model: str):
+        """
+        批量写入缓存，并在超出上限时淘汰最久未访问的条目
+
+        Args:
+            texts: 文本列表
+            vectors: 与 texts 对应的嵌入向量，为None的条目会被跳过
+            model: 嵌入模型名称
+        """
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            if vector is None or len(vector) == 0:
+                continue
+            array = np.asarray(vector, dtype="<f4")
+            rows.append((make_cache_key(text, model), model, len(array), array.tobytes(), now))
+
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimension, vector, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def put(self, text: str, vector: List[float], model: str):
+        """
+        写入单条文本的缓存
+
+        Args:
+            text: 文本
+            vector: 嵌入向量
+            model: 嵌入模型名称
+        """
+        self.put_many([text], [vector], model)
+
+    def _evict(self):
+        """淘汰超出上限的最久未访问条目（调用方需持有锁）"""
+        if not self.max_entries or self.max_entries <= 0:
+            return
+
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_stats(self) -> Dict:
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含 hits、misses、hit_rate、entries 的字典
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def clear(self):
+        """清空缓存并重置统计"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def main():
+    """
+    命令行界面
+    """
+    parser = argparse.ArgumentParser(description='嵌入向量缓存工具')
+    subparsers = parser.add_subparsers(dest='command', help='命令')
+
+    info_parser = subparsers.add_parser('info', help='查看缓存信息')
+    info_parser.add_argument('--cache', '-c', required=True, help='缓存文件路径')
+
+    clear_parser = subparsers.add_parser('clear', help='清空缓存')
+    clear_parser.add_argument('--cache', '-c', required=True, help='缓存文件路径')
+
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        cache = EmbeddingCache(args.cache)
+        rows = cache._conn.execute(
+            "SELECT model, COUNT(*), SUM(LENGTH(vector)) FROM embeddings GROUP BY model"
+        ).fetchall()
+        print(f"缓存: {cache.path}")
+        print(f"条目数: {len(cache)} / {cache.max_entries}")
+        for model, count, size in rows:
+            print(f"  {model}: {count} 条, {size / 1024 / 1024:.1f} MB")
+        cache.close()
+
+    elif args.command == 'clear':
+        cache = EmbeddingCache(args.cache)
+        cache.clear()
+        print(f"已清空缓存: {cache.path}")
+        cache.close()
+
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
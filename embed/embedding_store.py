@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+二进制嵌入向量存储：以内存映射的float32矩阵替代JSON嵌入向量文件
+
+一个存储由三个文件组成（以 abstract_embeddings 为例）：
+- abstract_embeddings.npy            float32 (N, D) 单位向量矩阵
+- abstract_embeddings.records.jsonl  每行一条记录（text、metadata等，不含嵌入向量）
+- abstract_embeddings.offsets.npy    uint64 (N+1,) 每条记录在jsonl中的字节偏移
+
+增量更新时被删除的记录不会立即从文件中移除，而是记录在可选的
+abstract_embeddings.deleted.npy（bool (N,)）中，检索时跳过。
+
+两个 .npy 文件使用固定长度的文件头，追加记录时只需原地改写形状，
+读取端通过 mmap 打开，加载时间和内存只与查询实际访问的数据有关。
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+import numpy as np
+
+# 确保embed包可以被导入
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+STORE_SUFFIX = ".npy"
+RECORDS_SUFFIX = ".records.jsonl"
+OFFSETS_SUFFIX = ".offsets.npy"
+DELETED_SUFFIX = ".deleted.npy"
+
+# 固定长度的npy文件头，保证追加记录后形状字段仍能原地写回
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_NPY_HEADER_SIZE = 128
+
+
+def is_embedding_store(path: str) -> bool:
+    """
+    判断路径是否指向二进制嵌入向量存储
+
+    Args:
+        path: 嵌入向量文件路径
+
+    Returns:
+        是否为二进制存储
+    """
+    return bool(path) and path.endswith(STORE_SUFFIX)
+
+
+def get_store_paths(path: str) -> Tuple[str, str, str]:
+    """
+    根据存储路径或对应的JSON路径获取存储的三个文件路径
+
+    Args:
+        path: 存储路径（.npy）或原JSON文件路径
+
+    Returns:
+        (向量矩阵路径, 记录文件路径, 偏移文件路径)
+    """
+    base = os.path.splitext(path)[0]
+    return base + STORE_SUFFIX, base + RECORDS_SUFFIX, base + OFFSETS_SUFFIX
+
+
+def get_deleted_path(path: str) -> str:
+    """
+    获取存储的删除标记文件路径
+
+    Args:
+        path: 存储路径（.npy）或原JSON文件路径
+
+    Returns:
+        删除标记文件路径
+    """
+    return os.path.splitext(path)[0] + DELETED_SUFFIX
+
+
+def resolve_embeddings_file(path: str) -> str:
+    """
+    优先选择与JSON文件对应且不比它旧的二进制存储
+
+    Args:
+        path: 嵌入向量文件路径（JSON或存储）
+
+    Returns:
+        实际应读取的文件路径
+    """
+    if is_embedding_store(path):
+        return path
+
+    store_path = get_store_paths(path)[0]
+    if not os.path.exists(store_path):
+        return path
+
+    if not os.path.exists(path) or os.path.getmtime(store_path) >= os.path.getmtime(path):
+        return store_path
+
+    return path
+
+
+def _write_npy_header(f, descr: str, shape: Tuple[int, ...]):
+    """写入固定长度的npy文件头"""
+    if len(shape) == 1:
+        shape_text = f"({shape[0]},)"
+    else:
+        shape_text = "(" + ", ".join(str(n) for n in shape) + ")"
+
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': {shape_text}, }}"
+    header_len = _NPY_HEADER_SIZE - len(_NPY_MAGIC) - 2
+    header = header.ljust(header_len - 1) + "\n"
+
+    f.seek(0)
+    f.write(_NPY_MAGIC)
+    f.write(header_len.to_bytes(2, "little"))
+    f.write(header.encode("latin1"))
+
+
+def _read_npy_shape(path: str) -> Tuple[int, ...]:
+    """读取npy文件的形状，不加载数据"""
+    with open(path, "rb") as f:
+        np.lib.format.read_magic(f)
+        shape, _, _ = np.lib.format.read_array_header_1_0(f)
+    return shape
+
+
+def _read_offset(path: str, index: int) -> int:
+    """读取偏移文件中的单个值，不建立mmap"""
+    with open(path, "rb") as f:
+        f.seek(_NPY_HEADER_SIZE + index * 8)
+        return int.from_bytes(f.read(8), "little")
+
+
+def _open_npy(path: str, dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    """以只读mmap方式打开npy文件，空数组直接返回零长度数组"""
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.load(path, mmap_mode="r")
+
+
+class EmbeddingStore:
+    """
+    二进制嵌入向量存储的只读视图
+
+    行为与 load_embeddings 返回的字典列表一致：支持 len()、下标访问和迭代，
+    每条记录为字典，其中 "embedding" 是矩阵中对应行的（归一化）向量。
+    """
+
+    def __init__(self, path: str):
+        """
+        打开存储
+
+        Args:
+            path: 存储路径（.npy）
+        """
+        self.path, self.records_path, self.offsets_path = get_store_paths(path)
+
+        for file_path in (self.path, self.records_path, self.offsets_path):
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"嵌入向量存储文件不存在: {file_path}")
+
+        matrix_shape = _read_npy_shape(self.path)
+        offsets_shape = _read_npy_shape(self.offsets_path)
+
+        # 追加过程中矩阵和偏移可能短暂不一致，以两者中较小者为准
+        self._count = max(0, min(matrix_shape[0], offsets_shape[0] - 1))
+        self.dimension = matrix_shape[1]
+
+        self._matrix = _open_npy(self.path, np.float32, matrix_shape)
+        self._offsets = _open_npy(self.offsets_path, np.uint64, offsets_shape)
+        self._records_file = None
+        # 多个线程共享同一个存储（例如缓存的检索索引），打开文件和 seek+read 需要加锁
+        self._records_lock = threading.Lock()
+
+        # 删除标记：长度不足的部分视为未删除
+        self.deleted = None
+        deleted_path = get_deleted_path(self.path)
+        if os.path.exists(deleted_path):
+            mask = np.load(deleted_path).astype(bool)[:self._count]
+            if mask.any():
+                self.deleted = np.zeros(self._count, dtype=bool)
+                self.deleted[:len(mask)] = mask
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """单位向量矩阵（mmap，只读），包含已删除的行"""
+        return self._matrix[:self._count]
+
+    @property
+    def live_indices(self) -> np.ndarray:
+        """未被删除的记录下标"""
+        if self.deleted is None:
+            return np.arange(self._count, dtype=np.int64)
+        return np.flatnonzero(~self.deleted).astype(np.int64)
+
+    @property
+    def deleted_count(self) -> int:
+        """已删除的记录数量"""
+        return 0 if self.deleted is None else int(self.deleted.sum())
+
+    def get_record(self, index: int) -> Dict:
+        """
+        读取一条记录（不含嵌入向量）
+
+        Args:
+            index: 记录下标
+
+        Returns:
+            记录字典
+        """
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError(f"记录下标越界: {index}")
+
+        start = int(self._offsets[index])
+        end = int(self._offsets[index + 1])
+        with self._records_lock:
+            if self._records_file is None:
+                self._records_file = open(self.records_path, "rb")
+            self._records_file.seek(start)
+            data = self._records_file.read(end - start)
+        return json.loads(data.decode("utf-8"))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Dict:
+        record = self.get_record(index)
+        record["embedding"] = self._matrix[index if index >= 0 else index + self._count]
+        return record
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self):
+        """关闭记录文件句柄"""
+        with self._records_lock:
+            if self._records_file is not None:
+                self._records_file.close()
+                self._records_file = None
+
+
+def append_to_embedding_store(records: Iterable[Dict], path: str) -> int:
+    """
+    向存储追加记录（存储不存在时创建）
+
+    Args:
+        records: 包含 "embedding" 字段的记录
+        path: 存储路径（.npy）或对应的JSON路径
+
+    Returns:
+        追加的记录数量
+    """
+    matrix_path, records_path, offsets_path = get_store_paths(path)
+
+    vectors = []
+    lines = []
+    for record in records:
+        embedding = record.get("embedding")
+        if isinstance(embedding, dict):
+            embedding = embedding.get("vector", embedding.get("embedding"))
+        if embedding is None or len(embedding) == 0:
+            continue
+
+        vectors.append(np.asarray(embedding, dtype=np.float32))
+        payload = {k: v for k, v in record.items() if k != "embedding"}
+        lines.append((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    if not vectors:
+        return 0
+
+    matrix = np.vstack(vectors)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    if os.path.exists(matrix_path):
+        matrix_rows, dimension = _read_npy_shape(matrix_path)
+        count = max(0, min(matrix_rows, _read_npy_shape(offsets_path)[0] - 1))
+        # 以偏移文件为准，忽略上次中断写入留下的不完整数据
+        records_size = _read_offset(offsets_path, count)
+        if dimension != matrix.shape[1]:
+            raise ValueError(f"嵌入向量维度 {matrix.shape[1]} 与存储维度 {dimension} 不一致")
+    else:
+        count, dimension = 0, matrix.shape[1]
+        with open(matrix_path, "wb") as f:
+            _write_npy_header(f, "<f4", (0, dimension))
+        with open(offsets_path, "wb") as f:
+            _write_npy_header(f, "<u8", (1,))
+            f.write(np.zeros(1, dtype="<u8").tobytes())
+        open(records_path, "wb").close()
+        records_size = 0
+
+    # 先写记录和向量，最后更新文件头，读取端不会看到不完整的行
+    offsets = []
+    with open(records_path, "r+b") as f:
+        f.seek(records_size)
+        for line in lines:
+            f.write(line)
+            records_size += len(line)
+            offsets.append(records_size)
+
+    with open(matrix_path, "r+b") as f:
+        f.seek(_NPY_HEADER_SIZE + count * dimension * 4)
+        f.write(matrix.astype("<f4").tobytes())
+        _write_npy_header(f, "<f4", (count + len(vectors), dimension))
+
+    with open(offsets_path, "r+b") as f:
+        f.seek(_NPY_HEADER_SIZE + (count + 1) * 8)
+        f.write(np.asarray(offsets, dtype="<u8").tobytes())
+        _write_npy_header(f, "<u8", (count + len(vectors) + 1,))
+
+    return len(vectors)
+
+
+def get_store_size(path: str) -> int:
+    """
+    获取存储中的记录数量（包含已删除的记录），不建立mmap
+
+    Args:
+        path: 存储路径（.npy）或对应的JSON路径
+
+    Returns:
+        记录数量，存储不存在时为0
+    """
+    matrix_path, _, offsets_path = get_store_paths(path)
+    if not os.path.exists(matrix_path) or not os.path.exists(offsets_path):
+        return 0
+    return max(0, min(_read_npy_shape(matrix_path)[0], _read_npy_shape(offsets_path)[0] - 1))
+
+
+def tombstone_records(path: str, indices: Iterable[int]) -> int:
+    """
+    将记录标记为已删除，记录本身保留在文件中直到下次压缩
+
+    Args:
+        path: 存储路径（.npy）或对应的JSON路径
+        indices: 要删除的记录下标
+
+    Returns:
+        新标记的记录数量
+    """
+    matrix_path = get_store_paths(path)[0]
+    deleted_path = get_deleted_path(path)
+    count = get_store_size(path)
+
+    mask = np.zeros(count, dtype=bool)
+    if os.path.exists(deleted_path):
+        existing = np.load(deleted_path).astype(bool)[:count]
+        mask[:len(existing)] = existing
+
+    indices = np.asarray([i for i in indices if 0 <= i < count], dtype=np.int64)
+    newly_deleted = int((~mask[indices]).sum()) if len(indices) else 0
+    if not newly_deleted:
+        return 0
+
+    mask[indices] = True
+
+    # 先写临时文件再替换，避免读取端看到写了一半的标记
+    temp_path = deleted_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        np.save(f, mask)
+    os.replace(temp_path, deleted_path)
+
+    # 更新矩阵文件的修改时间，使按mtime缓存的索引重新加载
+    os.utime(matrix_path, None)
+
+    return newly_deleted
+
+
+def write_embedding_store(records: Iterable[Dict], path: str) -> int:
+    """
+    将记录写入新的存储（覆盖已有存储）
+
+    Args:
+        records: 包含 "embedding" 字段的记录
+        path: 存储路径（.npy）或对应的JSON路径
+
+    Returns:
+        写入的记录数量
+    """
+    for file_path in get_store_paths(path) + (get_deleted_path(path),):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+    return append_to_embedding_store(records, path)
+
+
+def convert_json_to_store(json_file: str, store_file: Optional[str] = None) -> str:
+    """
+    将JSON嵌入向量文件转换为二进制存储
+
+    Args:
+        json_file: JSON嵌入向量文件路径
+        store_file: 存储路径，默认与JSON同名的 .npy 文件
+
+    Returns:
+        存储路径
+    """
+    if not os.path.exists(json_file):
+        raise FileNotFoundError(f"嵌入向量文件不存在: {json_file}")
+
+    store_file = store_file or get_store_paths(json_file)[0]
+
+    with open(json_file, 'r', encoding='utf-8') as f:
+        embeddings_data = json.load(f)
+
+    count = write_embedding_store(embeddings_data, store_file)
+    print(f"已将 {count}/{len(embeddings_data)} 条记录从 {json_file} 转换为 {store_file}")
+
+    return store_file
+
+
+def main():
+    """
+    命令行界面
+    """
+    parser = argparse.ArgumentParser(description='嵌入向量二进制存储工具')
+    subparsers = parser.add_subparsers(dest='command', help='命令')
+
+    convert_parser = subparsers.add_parser('convert', help='将JSON嵌入向量文件转换为二进制存储')
+    convert_parser.add_argument('--input', '-i', required=True, nargs='+', help='JSON嵌入向量文件路径')
+    convert_parser.add_argument('--output', '-o', help='存储路径（仅转换单个文件时可用）')
+
+    info_parser = subparsers.add_parser('info', help='查看存储信息')
+    info_parser.add_argument('--store', '-s', required=True, help='存储路径（.npy）')
+
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        if args.output and len(args.input) > 1:
+            print("错误: 转换多个文件时不能指定 --output")
+            return
+        for json_file in args.input:
+            convert_json_to_store(json_file, args.output)
+
+    elif args.command == 'info':
+        store = EmbeddingStore(args.store)
+        print(f"存储: {store.path}")
+        print(f"记录数: {len(store)}")
+        print(f"已删除: {store.deleted_count}")
+        print(f"向量维度: {store.dimension}")
+        store.close()
+
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
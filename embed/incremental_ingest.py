@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+增量入库：根据清单（manifest）只处理新增或修改过的XML文件
+
+清单与存储放在一起（例如 abstract_embeddings.manifest.json），以文档名（去掉扩展名
+的相对路径）为键，记录每个已处理文件的内容哈希以及它在存储中占用的记录区间。
+同一文档有多种格式的文件时（例如 .jsonl 和 .xml），按模式的优先顺序选用一个。
+重新运行时：
+- 内容未变的文件直接跳过
+- 新增的文件提取、生成嵌入向量后追加到存储
+- 修改过的文件先将旧记录标记为删除，再追加新记录
+- 已删除的文件将其记录标记为删除
+删除标记累积超过一定比例后，存储会被压缩重写。
+"""
+
+import os
+import sys
+import glob
+import json
+import hashlib
+from typing import List, Dict, Callable, Optional, Any, Sequence, Union
+import numpy as np
+
+# 确保embed包可以被导入
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+try:
+    from embed.embedding_store import (
+        EmbeddingStore, get_store_paths, get_deleted_path, get_store_size,
+        append_to_embedding_store, write_embedding_store, tombstone_records
+    )
+    from embed.streaming_ingest import stream_embeddings
+    from embed.document_parser import load_processed_document
+    from embed.text_normalizer import get_text_normalizer
+except ImportError:
+    from .embedding_store import (
+        EmbeddingStore, get_store_paths, get_deleted_path, get_store_size,
+        append_to_embedding_store, write_embedding_store, tombstone_records
+    )
+    from .streaming_ingest import stream_embeddings
+    from .document_parser import load_processed_document
+    from .text_normalizer import get_text_normalizer
+
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 2
+
+# 处理后的文档：优先读取 GrobidProcessor 输出的JSONL记录，没有时解析XML
+DOCUMENT_PATTERNS = ("*.jsonl", "*.xml")
+
+# 删除记录占比超过该值时压缩存储
+COMPACT_RATIO = 0.3
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    计算文件内容的sha256
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_document_key(rel_path: str) -> str:
+    """
+    文件在清单中的键：去掉扩展名的相对路径，同一文档的 .xml 和 .jsonl 键相同
+
+    Args:
+        rel_path: 相对于输入目录的文件路径
+
+    Returns:
+        文档键
+    """
+    return os.path.splitext(rel_path)[0]
+
+
+def find_document_files(input_dir: str, file_pattern: Union[str, Sequence[str]]) -> Dict[str, str]:
+    """
+    查找输入目录中的文档文件，每个文档只选一个文件
+
+    Args:
+        input_dir: 输入目录
+        file_pattern: glob模式，或按优先顺序排列的多个模式；同一文档匹配多个模式时
+            选用排在前面的模式匹配的文件
+
+    Returns:
+        文档键到文件路径的映射
+    """
+    patterns = [file_pattern] if isinstance(file_pattern, str) else list(file_pattern)
+    current = {}
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(input_dir, pattern))):
+            current.setdefault(get_document_key(os.path.relpath(path, input_dir)), path)
+    return current
+
+
+def get_manifest_path(path: str) -> str:
+    """
+    获取存储对应的清单文件路径
+
+    Args:
+        path: 存储路径（.npy）或对应的JSON路径
+
+    Returns:
+        清单文件路径
+    """
+    return os.path.splitext(path)[0] + MANIFEST_SUFFIX
+
+
+def load_manifest(path: str) -> Optional[Dict]:
+    """
+    读取清单
+
+    Args:
+        path: 存储路径（.npy）或对应的JSON路径
+
+    Returns:
+        清单字典，不存在或无法解析时返回None
+    """
+    manifest_path = get_manifest_path(path)
+    if not os.path.exists(manifest_path):
+        return None
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"警告: 无法读取清单 {manifest_path}: {e}")
+        return None
+
+    # 第1版以带扩展名的相对路径为键，改用文档键后记录区间不变
+    if manifest.get("version") == 1:
+        manifest["files"] = {get_document_key(rel): entry for rel, entry in manifest["files"].items()}
+        manifest["version"] = MANIFEST_VERSION
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(manifest: Dict, path: str):
+    """
+    保存清单（先写临时文件再替换）
+
+    Args:
+        manifest: 清单字典
+        path: 存储路径（.npy）或对应的JSON路径
+    """
+    manifest_path = get_manifest_path(path)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, manifest_path)
+
+
+def compact_embedding_store(path: str, manifest: Dict) -> int:
+    """
+    重写存储以移除已删除的记录，并同步更新清单中的记录区间
+
+    Args:
+        path: 存储路径（.npy）
+        manifest: 清单字典（原地修改）
+
+    Returns:
+        移除的记录数量
+    """
+    store = EmbeddingStore(path)
+    removed = store.deleted_count
+    if not removed:
+        store.close()
+        return 0
+
+    live_indices = store.live_indices
+
+    # 先写到临时存储，完成后再替换原文件
+    temp_path = os.path.splitext(path)[0] + ".compact" + os.path.splitext(path)[1]
+    write_embedding_store((store[int(i)] for i in live_indices), temp_path)
+    store.close()
+    del store
+
+    for src, dst in zip(get_store_paths(temp_path), get_store_paths(path)):
+        os.replace(src, dst)
+    if os.path.exists(get_deleted_path(path)):
+        os.remove(get_deleted_path(path))
+
+    # 记录保持原有顺序，新起点即原起点之前未删除的记录数
+    for entry in manifest["files"].values():
+        entry["start"] = int(np.searchsorted(live_indices, entry["start"]))
+
+    manifest["size"] = get_store_size(path)
+    return removed
+
+
+def _prepare_store(store_file: str, model: str, normalizer: str,
+                   current: Dict[str, str], hashes: Dict[str, str]) -> Dict:
+    """
+    对比清单与当前文件，标记已删除和已修改文件的旧记录
+
+    Returns:
+        包含 manifest、pending（待处理文件）和 stats 的状态字典
+    """
+    manifest = load_manifest(store_file)
+    store_size = get_store_size(store_file)
+
+    # 清单缺失、模型或文本规范化配置变化、存储比清单记录的更短时，整体重建
+    if (manifest is None or manifest.get("model") != model
+            or manifest.get("normalizer") != normalizer
+            or store_size < manifest.get("size", 0)):
+        if store_size:
+            print(f"清单与存储不匹配，重建存储: {store_file}")
+        write_embedding_store([], store_file)
+        manifest = {"version": MANIFEST_VERSION, "model": model, "normalizer": normalizer,
+                    "size": 0, "files": {}}
+        store_size = 0
+
+    entries = manifest["files"]
+    stats = {"added": 0, "changed": 0, "deleted": 0, "unchanged": 0,
+             "records_added": 0, "records_deleted": 0, "records_failed": 0}
+
+    # 上次运行在保存清单前中断时，存储末尾会有清单未记录的记录
+    tombstones = list(range(manifest.get("size", 0), store_size))
+
+    pending = set()
+    for rel in sorted(entries):
+        if rel not in current:
+            entry = entries.pop(rel)
+            tombstones.extend(range(entry["start"], entry["start"] + entry["count"]))
+            stats["deleted"] += 1
+
+    for rel in sorted(current):
+        entry = entries.get(rel)
+        if entry is None:
+            stats["added"] += 1
+            pending.add(rel)
+        elif entry["sha256"] != hashes[rel]:
+            tombstones.extend(range(entry["start"], entry["start"] + entry["count"]))
+            stats["changed"] += 1
+            pending.add(rel)
+        else:
+            stats["unchanged"] += 1
+
+    print(f"增量更新 {store_file}: 新增 {stats['added']}，修改 {stats['changed']}，"
+          f"删除 {stats['deleted']}，未变化 {stats['unchanged']} 个文件")
+
+    stats["records_deleted"] = tombstone_records(store_file, tombstones)
+
+    return {"manifest": manifest, "pending": pending, "stats": stats}
+
+
+def _finish_store(store_file: str, state: Dict):
+    """必要时压缩存储，然后保存清单"""
+    manifest = state["manifest"]
+    stats = state["stats"]
+    manifest["size"] = get_store_size(store_file)
+
+    if manifest["size"] and os.path.exists(get_deleted_path(store_file)):
+        store = EmbeddingStore(store_file)
+        deleted_ratio = store.deleted_count / manifest["size"]
+        store.close()
+        if deleted_ratio > COMPACT_RATIO:
+            removed = compact_embedding_store(store_file, manifest)
+            print(f"已压缩存储，移除了 {removed} 条已删除记录")
+
+    save_manifest(manifest, store_file)
+
+    print(f"{os.path.basename(store_file)}: 新增 {stats['records_added']} 条记录，"
+          f"删除 {stats['records_deleted']} 条记录，存储共 {manifest['size']} 条记录")
+
+
+def update_embedding_stores(
+    input_dir: str,
+    targets: Dict[str, Callable[[Any], List[Dict]]],
+    api_client=None,
+    model: str = "doubao-embedding-text-240715",
+    file_pattern: Union[str, Sequence[str]] = "*.xml",
+    batch_size: int = 10,
+    cache=None,
+    concurrency: int = None,
+    load_document: Optional[Callable[[str], Any]] = None,
+    normalizer=None
+) -> Dict[str, Dict]:
+    """
+    按清单增量更新一个或多个嵌入向量存储，每个待处理文件只读取一次
+
+    Args:
+        input_dir: 包含XML文件的目录
+        targets: 存储路径到记录提取函数的映射；提取函数接收 load_document 的返回值
+            （未提供 load_document 时为文件路径），返回包含 "text" 字段的记录列表
+        api_client: API客户端实例
+        model: 嵌入模型名称
+        file_pattern: 匹配XML文件的模式，或按优先顺序排列的多个模式（见 find_document_files）
+        batch_size: 每次请求的文本数量
+        cache: 可选的 EmbeddingCache
+        concurrency: 同时进行的嵌入请求数
+        load_document: 可选的文件解析函数，解析结果由所有存储共用
+        normalizer: 发送前规范化文本的 TextNormalizer，默认使用 get_text_normalizer()
+
+    Returns:
+        存储路径（.npy）到统计信息字典的映射（added、changed、deleted、unchanged、
+        records_added、records_deleted、records_failed：嵌入向量生成失败未写入的记录数）
+    """
+    targets = {get_store_paths(store_file)[0]: extract for store_file, extract in targets.items()}
+
+    current = find_document_files(input_dir, file_pattern)
+    hashes = {rel: file_sha256(p) for rel, p in current.items()}
+
+    normalizer = normalizer or get_text_normalizer()
+    states = {
+        store_file: _prepare_store(store_file, model, normalizer.signature, current, hashes)
+        for store_file in targets
+    }
+    pending = sorted(set().union(*(state["pending"] for state in states.values())))
+
+    def units():
+        for rel in pending:
+            document = load_document(current[rel]) if load_document else current[rel]
+            for store_file, extract_records in targets.items():
+                if rel in states[store_file]["pending"]:
+                    yield (store_file, rel), extract_records(document)
+
+    # 逐个文件流式提取和生成嵌入向量，完成一个文件就追加一个文件
+    for (store_file, rel), records, vectors in stream_embeddings(
+        units(), api_client, model, batch_size, workers=concurrency, cache=cache,
+        normalizer=normalizer
+    ):
+        state = states[store_file]
+        start = get_store_size(store_file)
+        count = append_to_embedding_store(
+            [dict(record, embedding=vector) for record, vector in zip(records, vectors) if vector],
+            store_file
+        )
+        state["stats"]["records_added"] += count
+        state["stats"]["records_failed"] += len(records) - count
+
+        # 有记录生成失败时不记录哈希，下次运行会重新处理该文件
+        state["manifest"]["files"][rel] = {
+            "sha256": hashes[rel] if count == len(records) else None,
+            "start": start,
+            "count": count,
+        }
+
+    for store_file, state in states.items():
+        _finish_store(store_file, state)
+
+    return {store_file: state["stats"] for store_file, state in states.items()}
+
+
+def update_embedding_store(
+    input_dir: str,
+    store_file: str,
+    extract_records: Callable[[str], List[Dict]],
+    api_client=None,
+    model: str = "doubao-embedding-text-240715",
+    file_pattern: str = "*.xml",
+    batch_size: int = 10,
+    cache=None,
+    concurrency: int = None
+) -> Dict:
+    """
+    按清单增量更新单个嵌入向量存储
+
+    Args:
+        input_dir: 包含XML文件的目录
+        store_file: 存储路径（.npy）或对应的JSON路径
+        extract_records: 从单个文件提取记录的函数，每条记录包含 "text" 字段
+        api_client: API客户端实例
+        model: 嵌入模型名称
+        file_pattern: 匹配XML文件的模式
+        batch_size: 每次请求的文本数量
+        cache: 可选的 EmbeddingCache
+        concurrency: 同时进行的嵌入请求数
+
+    Returns:
+        统计信息字典（added、changed、deleted、unchanged、records_added、records_deleted、
+        records_failed）
+    """
+    results = update_embedding_stores(
+        input_dir, {store_file: extract_records}, api_client, model,
+        file_pattern, batch_size, cache, concurrency
+    )
+    return results[get_store_paths(store_file)[0]]
+
+
+def update_document_stores(
+    input_dir: str,
+    abstract_store: str,
+    fulltext_store: str,
+    api_client=None,
+    model: str = "doubao-embedding-text-240715",
+    file_pattern: Union[str, Sequence[str]] = DOCUMENT_PATTERNS,
+    batch_size: int = 10,
+    cache=None,
+    concurrency: int = None
+) -> Dict[str, Dict]:
+    """
+    同时增量更新摘要存储和正文存储，每个待处理文件只解析一次
+
+    默认逐个文档选择来源：有 GrobidProcessor 输出的JSONL记录（<文档名>.jsonl）时
+    直接读取记录，否则解析 <文档名>.xml。
+
+    Args:
+        input_dir: 包含XML或JSONL记录文件的目录
+        abstract_store: 摘要存储路径（.npy）
+        fulltext_store: 正文存储路径（.npy）
+        api_client: API客户端实例
+        model: 嵌入模型名称
+        file_pattern: 匹配文件的模式，或按优先顺序排列的多个模式
+        batch_size: 每次请求的文本数量
+        cache: 可选的 EmbeddingCache
+        concurrency: 同时进行的嵌入请求数
+
+    Returns:
+        存储路径（.npy）到统计信息字典的映射
+    """
+    targets = {
+        abstract_store: lambda document: document.abstract_records(),
+        fulltext_store: lambda document: document.paragraph_records(),
+    }
+    return update_embedding_stores(
+        input_dir, targets, api_client, model, file_pattern,
+        batch_size, cache, concurrency, load_document=load_processed_document
+    )
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+并行提取：用进程池将目录中的文件分给多个工作进程解析
+
+- 结果按输入文件顺序流式返回，与串行处理的顺序一致
+- 同时提交的任务数有上限，结果不会在内存中无限堆积
+- 统计每个工作进程处理的文件数、记录数和耗时，结束后打印吞吐量
+
+工作进程数默认读取 EXTRACT_WORKERS 环境变量，未设置时使用CPU核数。
+"""
+
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Callable, Iterable, Iterator, Tuple, Any, Optional
+
+# 确保embed包可以被导入
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+
+def get_extract_workers(workers: Optional[int] = None) -> int:
+    """
+    确定工作进程数
+
+    Args:
+        workers: 指定的进程数，None或0表示读取 EXTRACT_WORKERS 环境变量，
+            未设置时使用CPU核数
+
+    Returns:
+        工作进程数（至少为1）
+    """
+    if not workers:
+        value = os.environ.get("EXTRACT_WORKERS")
+        try:
+            workers = int(value) if value else 0
+        except ValueError:
+            print("警告: EXTRACT_WORKERS环境变量无效，使用CPU核数")
+            workers = 0
+    return max(1, workers or os.cpu_count() or 1)
+
+
+def _count_items(result: Any) -> int:
+    """结果为列表时计其长度，否则计为1条"""
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return 0 if result is None else 1
+
+
+def _run_task(func: Callable[[str], Any], file_path: str) -> Tuple[int, float, Any]:
+    """在工作进程中执行提取函数，返回 (进程ID, 耗时, 结果)"""
+    started = time.perf_counter()
+    result = func(file_path)
+    return os.getpid(), time.perf_counter() - started, result
+
+
+class ExtractionStats:
+    """
+    按工作进程汇总的提取统计
+    """
+
+    def __init__(self):
+        self.workers: Dict[int, Dict[str, float]] = {}
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def record(self, worker: int, seconds: float, items: int):
+        """
+        记录一个文件的处理结果
+
+        Args:
+            worker: 工作进程ID
+            seconds: 处理耗时（秒）
+            items: 提取的记录数
+        """
+        stats = self.workers.setdefault(worker, {"files": 0, "items": 0, "seconds": 0.0})
+        stats["files"] += 1
+        stats["items"] += items
+        stats["seconds"] += seconds
+
+    def finish(self):
+        """记录总耗时"""
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def files(self) -> int:
+        return sum(int(s["files"]) for s in self.workers.values())
+
+    @property
+    def items(self) -> int:
+        return sum(int(s["items"]) for s in self.workers.values())
+
+    def format_report(self) -> str:
+        """
+        格式化统计信息
+
+        Returns:
+            每个工作进程一行的吞吐量报告
+        """
+        lines = [f"共处理 {self.files} 个文件，{self.items} 条记录，耗时 {self.elapsed:.2f}秒"]
+        if self.elapsed > 0:
+            lines[0] += f"（{self.files / self.elapsed:.1f} 文件/秒）"
+
+        for i, (worker, stats) in enumerate(sorted(self.workers.items()), 1):
+            rate = stats["files"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+            lines.append(
+                f"  工作进程 {i} (PID {worker}): {int(stats['files'])} 个文件，"
+                f"{int(stats['items'])} 条记录，耗时 {stats['seconds']:.2f}秒，{rate:.1f} 文件/秒"
+            )
+        return "\n".join(lines)
+
+
+def map_files(
+    func: Callable[[str], Any],
+    file_paths: Iterable[str],
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    stats: Optional[ExtractionStats] = None
+) -> Iterator[Tuple[str, Any]]:
+    """
+    在进程池中对每个文件执行提取函数，按输入顺序流式返回结果
+
+    Args:
+        func: 模块级的提取函数（需可被pickle），参数为文件路径
+        file_paths: 文件路径列表
+        workers: 工作进程数，见 get_extract_workers；为1时在当前进程中串行执行
+        max_pending: 同时提交的任务数上限，默认为工作进程数的4倍
+        stats: 可选的 ExtractionStats，用于收集每个工作进程的统计
+
+    Returns:
+        (文件路径, 提取结果) 的迭代器
+    """
+    workers = get_extract_workers(workers)
+
+    if workers == 1:
+        for file_path in file_paths:
+            worker, seconds, result = _run_task(func, file_path)
+            if stats is not None:
+                stats.record(worker, seconds, _count_items(result))
+            yield file_path, result
+        return
+
+    max_pending = max(workers, max_pending or workers * 4)
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for file_path in file_paths:
+                pending.append((file_path, executor.submit(_run_task, func, file_path)))
+
+                # 队首任务完成后才继续提交，保证按顺序产出且在途任务有上限
+                while len(pending) >= max_pending:
+                    yield _collect(pending.popleft(), stats)
+
+            while pending:
+                yield _collect(pending.popleft(), stats)
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def _collect(task: Tuple[str, Any], stats: Optional[ExtractionStats]) -> Tuple[str, Any]:
+    """等待任务完成并记录统计"""
+    file_path, future = task
+    worker, seconds, result = future.result()
+    if stats is not None:
+        stats.record(worker, seconds, _count_items(result))
+    return file_path, result
+
+
+def extract_files_parallel(
+    func: Callable[[str], Any],
+    file_paths: List[str],
+    workers: Optional[int] = None
+) -> List[Tuple[str, Any]]:
+    """
+    map_files 的便捷封装：收集全部结果并打印每个工作进程的吞吐量
+
+    Args:
+        func: 模块级的提取函数，参数为文件路径
+        file_paths: 文件路径列表
+        workers: 工作进程数
+
+    Returns:
+        按输入顺序排列的 (文件路径, 提取结果) 列表
+    """
+    stats = ExtractionStats()
+    results = list(map_files(func, file_paths, workers, stats=stats))
+    stats.finish()
+    print(stats.format_report())
+    return results
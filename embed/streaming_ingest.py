@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+流式入库：XML提取、嵌入向量生成和写入存储以生产者/消费者流水线方式并行进行
+
+- 生产者线程逐个文件提取记录，放入有界队列
+- 多个工作线程从队列中取出文件的记录并请求嵌入向量；队列中已排队的多个小文件
+  合并到同一批请求中（例如每个文件只有一条记录的摘要存储）
+- 调用方（写入端）按文件顺序取得结果并追加到存储
+
+同时在途的文件数有上限，因此内存占用与语料规模无关；每个文件写入存储后
+即可被检索，不必等待整个目录处理完成。
+"""
+
+import os
+import sys
+import glob
+import queue
+import time
+import threading
+from typing import List, Dict, Iterable, Iterator, Tuple, Any, Optional, Callable
+
+# 确保embed包可以被导入
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+try:
+    from embed.text_similarity import create_embeddings_batch
+    from embed.async_embedding import TokenBucket, estimate_tokens, DEFAULT_CONCURRENCY
+    from embed.config import get_env_int
+    from embed.embedding_store import (
+        append_to_embedding_store, write_embedding_store, get_store_paths, get_deleted_path
+    )
+    from embed.text_normalizer import get_text_normalizer
+except ImportError:
+    from .text_similarity import create_embeddings_batch
+    from .async_embedding import TokenBucket, estimate_tokens, DEFAULT_CONCURRENCY
+    from .config import get_env_int
+    from .embedding_store import (
+        append_to_embedding_store, write_embedding_store, get_store_paths, get_deleted_path
+    )
+    from .text_normalizer import get_text_normalizer
+
+_DONE = object()
+_ERROR = object()
+
+# 凑批时等待后续记录组的最长时间（秒），空闲的工作线程不会为单条记录立即发出请求
+BATCH_LINGER = 0.05
+
+
+def stream_embeddings(
+    units: Iterable[Tuple[Any, List[Dict]]],
+    api_client=None,
+    model: str = "doubao-embedding-text-240715",
+    batch_size: int = 10,
+    workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    cache=None,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    normalizer=None
+) -> Iterator[Tuple[Any, List[Dict], List[Optional[List[float]]]]]:
+    """
+    以流水线方式为一系列记录组生成嵌入向量
+
+    Args:
+        units: (键, 记录列表) 的可迭代对象，通常每个文件一组，可以是惰性生成器；
+            每条记录包含 "text" 字段
+        api_client: API客户端实例
+        model: 嵌入模型名称
+        batch_size: 每次请求的文本数量
+        workers: 嵌入工作线程数，默认读取 EMBEDDING_CONCURRENCY 环境变量
+        queue_size: 同时在途的记录组数量上限，默认为工作线程数的2倍加 batch_size，
+            使单条记录的记录组也能凑满一批
+        cache: 可选的 EmbeddingCache
+        requests_per_minute: 每分钟请求数上限，默认读取 EMBEDDING_RPM 环境变量
+        tokens_per_minute: 每分钟令牌数上限，默认读取 EMBEDDING_TPM 环境变量
+        normalizer: 发送前规范化文本的 TextNormalizer，默认使用 get_text_normalizer()；
+            记录中的 "text" 保持原文
+
+    Returns:
+        按输入顺序产出 (键, 记录列表, 嵌入向量列表) 的迭代器，生成失败的向量为None
+    """
+    workers = max(1, workers or get_env_int("EMBEDDING_CONCURRENCY", DEFAULT_CONCURRENCY))
+    batch_size = max(1, batch_size or 1)
+    queue_size = max(1, queue_size or workers * 2 + batch_size)
+
+    requests_per_minute = requests_per_minute or get_env_int("EMBEDDING_RPM", None)
+    tokens_per_minute = tokens_per_minute or get_env_int("EMBEDDING_TPM", None)
+    request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+    token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+    normalizer = normalizer or get_text_normalizer()
+
+    # 在途的记录组数量上限：生产者取得名额后入队，写入端产出结果后归还
+    in_flight = threading.Semaphore(queue_size)
+    task_queue = queue.Queue()
+    result_queue = queue.Queue()
+    stop = threading.Event()
+
+    def throttle(request_texts: List[str]):
+        if request_bucket is not None:
+            request_bucket.wait(1)
+        if token_bucket is not None:
+            token_bucket.wait(sum(estimate_tokens(t) for t in request_texts))
+
+    def embed_texts(texts: List[str]) -> List[Optional[List[float]]]:
+        vectors = [None] * len(texts)
+        pending = [i for i, text in enumerate(texts) if text and text.strip()]
+
+        if cache is not None and pending:
+            for i, vector in zip(pending, cache.get_many([texts[i] for i in pending], model)):
+                vectors[i] = vector
+            pending = [i for i in pending if vectors[i] is None]
+
+        for start in range(0, len(pending), batch_size):
+            if stop.is_set():
+                break
+            chunk = pending[start:start + batch_size]
+            chunk_texts = [texts[i] for i in chunk]
+
+            # 限流放在 create_embeddings_batch 内部，整批失败后的逐条重试同样计入配额
+            vectors_chunk = create_embeddings_batch(chunk_texts, api_client, model, len(chunk), throttle=throttle)
+            for i, vector in zip(chunk, vectors_chunk):
+                vectors[i] = vector
+
+        if cache is not None and pending:
+            cache.put_many([texts[i] for i in pending], [vectors[i] for i in pending], model)
+
+        return vectors
+
+    def producer():
+        count = 0
+        try:
+            for key, records in units:
+                # 等待在途名额，写入端提前结束时退出
+                while not in_flight.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                task_queue.put((count, key, records))
+                count += 1
+        except Exception as e:
+            result_queue.put((_ERROR, e))
+        finally:
+            result_queue.put((_DONE, count))
+            for _ in range(workers):
+                task_queue.put(None)
+
+    def gather(task) -> Tuple[List[Tuple[int, Any, List[Dict]]], bool]:
+        """从队列中继续取出记录组，直到合计记录数达到 batch_size 或等待超过
+        BATCH_LINGER；返回 (记录组列表, 是否已取到结束标记)"""
+        tasks = [task]
+        size = len(task[2])
+        deadline = time.monotonic() + BATCH_LINGER
+        while size < batch_size:
+            try:
+                task = task_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if task is None:
+                return tasks, True
+            tasks.append(task)
+            size += len(task[2])
+        return tasks, False
+
+    def worker():
+        finished = False
+        while not finished:
+            task = task_queue.get()
+            if task is None:
+                return
+
+            # 多个记录组的文本一起请求，再按记录组拆分结果；写入端按序号恢复顺序
+            tasks, finished = gather(task)
+            try:
+                texts = []
+                for _, _, records in tasks:
+                    texts += normalizer.normalize_many([record["text"] for record in records])
+                vectors = embed_texts(texts)
+            except Exception as e:
+                print(f"生成嵌入向量时出错 ({', '.join(str(key) for _, key, _ in tasks)}): {str(e)}")
+                vectors = [None] * sum(len(records) for _, _, records in tasks)
+
+            offset = 0
+            for seq, key, records in tasks:
+                result_queue.put((seq, key, records, vectors[offset:offset + len(records)]))
+                offset += len(records)
+
+    threads = [threading.Thread(target=producer, daemon=True)]
+    threads += [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    completed = {}
+    next_seq = 0
+    total = None
+
+    try:
+        while total is None or next_seq < total:
+            message = result_queue.get()
+
+            if message[0] is _DONE:
+                total = message[1]
+                continue
+            if message[0] is _ERROR:
+                raise message[1]
+
+            completed[message[0]] = message[1:]
+
+            # 按输入顺序产出，保证写入顺序确定
+            while next_seq in completed:
+                key, records, vectors = completed.pop(next_seq)
+                next_seq += 1
+                in_flight.release()
+                yield key, records, vectors
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def iter_file_records(
+    file_paths: Iterable[str],
+    extract_records: Callable[[str], List[Dict]]
+) -> Iterator[Tuple[str, List[Dict]]]:
+    """
+    逐个文件惰性提取记录，提取出错的文件记录日志后产出空的记录列表，不中断后续文件
+
+    Args:
+        file_paths: 文件路径列表
+        extract_records: 从单个文件提取记录的函数
+
+    Returns:
+        (文件路径, 记录列表) 的迭代器
+    """
+    for file_path in file_paths:
+        try:
+            records = extract_records(file_path)
+        except Exception as e:
+            print(f"提取记录时出错，跳过文件 {file_path}: {str(e)}")
+            records = []
+        yield file_path, records
+
+
+def stream_files_to_store(
+    input_path: str,
+    store_file: str,
+    extract_records: Callable[[str], List[Dict]],
+    api_client=None,
+    model: str = "doubao-embedding-text-240715",
+    file_pattern: str = "*.xml",
+    batch_size: int = 10,
+    cache=None,
+    concurrency: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    以流式方式从XML文件生成嵌入向量并写入新的二进制存储（覆盖已有存储）
+
+    记录先写入临时存储，全部完成后再替换原有存储；中途出错时原有存储保持不变。
+
+    Args:
+        input_path: 输入文件或目录路径
+        store_file: 存储路径（.npy）
+        extract_records: 从单个文件提取记录的函数，每条记录包含 "text" 字段
+        api_client: API客户端实例
+        model: 嵌入模型名称
+        file_pattern: 匹配XML文件的模式
+        batch_size: 每次请求的文本数量
+        cache: 可选的 EmbeddingCache
+        concurrency: 嵌入工作线程数
+
+    Returns:
+        (写入的记录数量, 提取的记录数量)
+    """
+    if os.path.isdir(input_path):
+        file_paths = sorted(glob.glob(os.path.join(input_path, file_pattern)))
+    else:
+        file_paths = [input_path]
+
+    store_file = get_store_paths(store_file)[0]
+    temp_file = os.path.splitext(store_file)[0] + ".tmp" + os.path.splitext(store_file)[1]
+    write_embedding_store([], temp_file)
+
+    written = 0
+    extracted = 0
+    try:
+        for file_path, records, vectors in stream_embeddings(
+            iter_file_records(file_paths, extract_records),
+            api_client, model, batch_size, workers=concurrency, cache=cache
+        ):
+            extracted += len(records)
+            written += append_to_embedding_store(
+                [dict(record, embedding=vector) for record, vector in zip(records, vectors) if vector],
+                temp_file
+            )
+            print(f"已写入 {os.path.basename(file_path)[:50]}，累计 {written}/{extracted} 条记录")
+    except BaseException:
+        for path in get_store_paths(temp_file):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    for src, dst in zip(get_store_paths(temp_file), get_store_paths(store_file)):
+        os.replace(src, dst)
+    if os.path.exists(get_deleted_path(store_file)):
+        os.remove(get_deleted_path(store_file))
+
+    return written, extracted
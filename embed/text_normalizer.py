@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+嵌入前的文本规范化：减少发送给嵌入API的令牌数
+
+GROBID后处理生成的段落中含有 <ref>、<s> 等标记，process_references_in_text 还会在
+每处引用位置内联完整的参考文献条目，此外图注和页眉也常混入正文。这些内容对检索
+没有帮助，却占用了大部分令牌。规范化只作用于发送给API的文本，记录中保存的
+原文不变，检索结果仍显示原文。
+
+可通过环境变量调整：
+- EMBEDDING_NORMALIZE: 设为0时关闭规范化
+- EMBEDDING_CITATIONS: 内联引用的处理方式，drop（删除，默认）、collapse（连续引用
+  合并为一个 [ref] 标记）或 keep（保留引用文本）
+- EMBEDDING_MAX_TOKENS: 每段文本的令牌数上限（按估计值，默认2048，0表示不限制）
+"""
+
+import os
+import re
+import sys
+import html
+from typing import List, Optional
+
+# 确保embed包可以被导入
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+try:
+    from embed.async_embedding import estimate_tokens
+    from embed.config import get_env_int
+except ImportError:
+    from .async_embedding import estimate_tokens
+    from .config import get_env_int
+
+CITATION_MODES = ("drop", "collapse", "keep")
+DEFAULT_MAX_TOKENS = 2048
+CITATION_MARKER = "[ref]"
+
+# 内联引用：<ref ...>...</ref>，以及连续出现的多个引用
+_REF_PATTERN = re.compile(r'<ref(?:\s[^>]*)?>(.*?)</ref>', re.DOTALL)
+_REF_RUN_PATTERN = re.compile(r'(?:<ref(?:\s[^>]*)?>.*?</ref>[\s,;–-]*)+', re.DOTALL)
+# 方括号形式的数字引用，例如 [12]、[3,4]、[5-8]
+_NUMERIC_CITATION_PATTERN = re.compile(r'\s*\[\d+(?:\s*[,–-]\s*\d+)*\]')
+_TAG_PATTERN = re.compile(r'<[^>]*>')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# 混入正文的期刊页眉，例如 "Pharmaceutics 2023, 15, x FOR PEER REVIEW 3 of 23"
+_PAGE_HEADER_PATTERN = re.compile(
+    r'\b[A-Z][A-Za-z]*\s+\d{4},\s*(?:\d+,\s*)?x\s+FOR\s+PEER\s+REVIEW\s+\d+\s+of\s+\d+\s*'
+)
+
+# GROBID合并的句子之间常没有空格，按句末标点后紧跟大写字母或中文切分
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?。！？])\s*(?=[A-Z\u4e00-\u9fff])')
+# 图注：以分图标签开头（"A) ..."、"B,C) ..."），或以 "Figure 2. ..." 形式开头的句子
+_PANEL_CAPTION_PATTERN = re.compile(r'^[A-Z](?:\s*[,–-]\s*[A-Z])*\)\s')
+_FIGURE_CAPTION_PATTERN = re.compile(r'^(?:Figure|Fig\.|Scheme)\s*S?\d+[A-Za-z]?\s*[.:|]\s')
+# 切分后单独成句的图注编号（"Figure 3."），其后一句是图注标题
+_FIGURE_LABEL_PATTERN = re.compile(r'^(?:Figure|Fig\.|Scheme)\s*S?\d+[A-Za-z]?\s*[.:|]$')
+
+
+class TextNormalizer:
+    """
+    嵌入前的文本规范化器
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        citations: str = "drop",
+        drop_figure_captions: bool = True,
+        max_tokens: Optional[int] = DEFAULT_MAX_TOKENS
+    ):
+        """
+        初始化规范化器
+
+        Args:
+            enabled: 为False时原样返回文本
+            citations: 内联引用的处理方式：drop、collapse 或 keep
+            drop_figure_captions: 是否删除混入正文的图注和页眉
+            max_tokens: 令牌数上限（按 estimate_tokens 估计），None或0表示不限制
+        """
+        if citations not in CITATION_MODES:
+            raise ValueError(f"未知的引用处理方式: {citations}，可选: {', '.join(CITATION_MODES)}")
+
+        self.enabled = enabled
+        self.citations = citations
+        self.drop_figure_captions = drop_figure_captions
+        self.max_tokens = max_tokens or None
+
+    @classmethod
+    def from_env(cls) -> "TextNormalizer":
+        """
+        按环境变量 EMBEDDING_NORMALIZE、EMBEDDING_CITATIONS、EMBEDDING_MAX_TOKENS 创建规范化器
+
+        Returns:
+            TextNormalizer 实例
+        """
+        enabled = os.environ.get("EMBEDDING_NORMALIZE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+        citations = (os.environ.get("EMBEDDING_CITATIONS") or "drop").strip().lower()
+        if citations not in CITATION_MODES:
+            print("警告: EMBEDDING_CITATIONS环境变量无效，使用默认值 drop")
+            citations = "drop"
+
+        return cls(
+            enabled=enabled,
+            citations=citations,
+            max_tokens=get_env_int("EMBEDDING_MAX_TOKENS", DEFAULT_MAX_TOKENS)
+        )
+
+    @property
+    def signature(self) -> str:
+        """
+        规范化配置的标识，写入存储清单；配置变化后存储会重建
+        """
+        if not self.enabled:
+            return "off"
+        return (f"v1;citations={self.citations};captions={int(self.drop_figure_captions)};"
+                f"max_tokens={self.max_tokens or 0}")
+
+    def normalize(self, text: str) -> str:
+        """
+        规范化单段文本
+
+        Args:
+            text: 原文
+
+        Returns:
+            发送给嵌入API的文本；规范化后为空时退回去除标记后的原文
+        """
+        if not self.enabled or not text:
+            return text
+
+        normalized = self._replace_citations(text)
+        normalized = self._clean(normalized)
+
+        if self.drop_figure_captions:
+            normalized = _PAGE_HEADER_PATTERN.sub(' ', normalized)
+
+        sentences = [s.strip() for s in _SENTENCE_BOUNDARY.split(normalized) if s.strip()]
+        if self.drop_figure_captions:
+            sentences = self._drop_captions(sentences)
+
+        normalized = self._truncate(sentences)
+        if not normalized:
+            # 整段都是引用或图注时，保留去除标记后的原文，避免该段落无法生成嵌入向量
+            normalized = self._clean(_REF_PATTERN.sub(r' \1 ', text))
+        return normalized
+
+    def normalize_many(self, texts: List[str]) -> List[str]:
+        """
+        规范化多段文本
+
+        Args:
+            texts: 原文列表
+
+        Returns:
+            与输入一一对应的规范化文本列表
+        """
+        return [self.normalize(text) for text in texts]
+
+    def _replace_citations(self, text: str) -> str:
+        if self.citations == "keep":
+            return _REF_PATTERN.sub(r' \1 ', text)
+        if self.citations == "collapse":
+            text = _REF_RUN_PATTERN.sub(f' {CITATION_MARKER} ', text)
+            return _NUMERIC_CITATION_PATTERN.sub(f' {CITATION_MARKER}', text)
+        text = _REF_RUN_PATTERN.sub(' ', text)
+        return _NUMERIC_CITATION_PATTERN.sub('', text)
+
+    @staticmethod
+    def _clean(text: str) -> str:
+        """去除标记、还原实体并合并空白"""
+        text = html.unescape(_TAG_PATTERN.sub(' ', text))
+        text = _WHITESPACE_PATTERN.sub(' ', text).strip()
+        # 删除引用后标点前会留下空格
+        return re.sub(r'\s+([.,;:!?])', r'\1', text)
+
+    @staticmethod
+    def _drop_captions(sentences: List[str]) -> List[str]:
+        """删除图注句子"""
+        kept = []
+        skip_next = False
+        for sentence in sentences:
+            if skip_next:
+                skip_next = False
+                continue
+            if _FIGURE_LABEL_PATTERN.match(sentence):
+                skip_next = True
+                continue
+            if _PANEL_CAPTION_PATTERN.match(sentence) or _FIGURE_CAPTION_PATTERN.match(sentence):
+                continue
+            kept.append(sentence)
+        return kept
+
+    def _truncate(self, sentences: List[str]) -> str:
+        """按句子截断到令牌数上限，第一句就超出上限时按字符截断"""
+        if not self.max_tokens:
+            return " ".join(sentences)
+
+        kept = []
+        total = 0
+        for sentence in sentences:
+            tokens = estimate_tokens(sentence) + (1 if kept else 0)
+            if total + tokens > self.max_tokens:
+                break
+            kept.append(sentence)
+            total += tokens
+
+        if kept or not sentences:
+            return " ".join(kept)
+
+        sentence = sentences[0]
+        while estimate_tokens(sentence) > self.max_tokens:
+            ratio = self.max_tokens / estimate_tokens(sentence)
+            sentence = sentence[:max(1, min(len(sentence) - 1, int(len(sentence) * ratio)))]
+        return sentence
+
+
+_default_normalizer: Optional[TextNormalizer] = None
+
+
+def get_text_normalizer() -> TextNormalizer:
+    """
+    获取按环境变量配置的默认规范化器（首次调用时创建）
+
+    Returns:
+        TextNormalizer 实例
+    """
+    global _default_normalizer
+    if _default_normalizer is None:
+        _default_normalizer = TextNormalizer.from_env()
+    return _default_normalizer
+
+
+def normalize_for_embedding(text: str, normalizer: Optional[TextNormalizer] = None) -> str:
+    """
+    使用指定或默认的规范化器规范化文本
+
+    Args:
+        text: 原文
+        normalizer: 可选的 TextNormalizer，默认使用 get_text_normalizer()
+
+    Returns:
+        规范化后的文本
+    """
+    return (normalizer or get_text_normalizer()).normalize(text)
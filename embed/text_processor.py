@@ -16,12 +16,26 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 # 导入子模块（使用绝对导入）
 try:
     from embed.xml_text_extractor import extract_paragraphs_with_metadata, process_directory_with_metadata
-    from embed.text_similarity import load_embeddings, create_query_embedding, search_similar_text, format_search_results
+    from embed.text_similarity import load_embeddings, create_query_embedding, search_similar_text, format_search_results, get_embedding_index, EmbeddingIndex
+    from embed.embedding_cache import EmbeddingCache
+    from embed.async_embedding import create_embeddings_concurrent
+    from embed.text_normalizer import get_text_normalizer
+    from embed.incremental_ingest import update_embedding_store
+    from embed.streaming_ingest import stream_files_to_store
+    from embed.embedding_store import is_embedding_store
+    from embed.api_providers import get_api_provider_name, create_api_client, DEFAULT_PROVIDER
 except ImportError:
     # 当作为模块导入时尝试相对导入
     try:
         from .xml_text_extractor import extract_paragraphs_with_metadata, process_directory_with_metadata
-        from .text_similarity import load_embeddings, create_query_embedding, search_similar_text, format_search_results
+        from .text_similarity import load_embeddings, create_query_embedding, search_similar_text, format_search_results, get_embedding_index, EmbeddingIndex
+        from .embedding_cache import EmbeddingCache
+        from .async_embedding import create_embeddings_concurrent
+        from .text_normalizer import get_text_normalizer
+        from .incremental_ingest import update_embedding_store
+        from .streaming_ingest import stream_files_to_store
+        from .embedding_store import is_embedding_store
+        from .api_providers import get_api_provider_name, create_api_client, DEFAULT_PROVIDER
     except ImportError as e:
         print(f"导入错误: {e}")
         print("请确保在正确的目录中运行此脚本，或将embed目录添加到Python路径")
@@ -58,17 +72,30 @@ load_env_file()
 # API密钥配置（优先从环境变量获取，然后尝试从.env文件获取）
 API_KEY = os.environ.get("DOUBAO_API_KEY", "") or os.environ.get("ARK_API_KEY", "")
 
+def _extract_paragraph_records(file_path: str) -> List[Dict]:
+    """从单个XML文件提取段落记录（不含嵌入向量）"""
+    return [
+        {"text": item["content"], "metadata": item.get("metadata", {})}
+        for item in extract_paragraphs_with_metadata(file_path)
+    ]
+
+
 def extract_and_create_embeddings(
     input_path: str,
     output_file: str,
     api_client=None,
     model: str = None,
     file_pattern: str = "*.xml",
-    batch_size: int = None
+    batch_size: int = None,
+    cache=None,
+    concurrency: int = None
 ) -> bool:
     """
     从XML文件中提取文本并生成嵌入向量
     
+    输出路径为二进制存储（.npy）时使用流式模式：逐个文件提取、生成嵌入向量并追加到存储，
+    内存占用与语料规模无关；否则一次性提取全部段落并写入JSON文件。
+    
     Args:
         input_path: 输入文件或目录路径
         output_file: 输出嵌入向量文件路径
@@ -76,6 +103,8 @@ def extract_and_create_embeddings(
         model: 嵌入模型名称
         file_pattern: 匹配XML文件的模式
         batch_size: 批量处理大小
+        cache: 可选的 EmbeddingCache，已缓存的文本不再调用API
+        concurrency: 同时进行的嵌入请求数，默认读取 EMBEDDING_CONCURRENCY 环境变量
         
     Returns:
         处理是否成功
@@ -96,6 +125,25 @@ def extract_and_create_embeddings(
     print(f"使用模型: {model}")
     print(f"批处理大小: {batch_size}")
     
+    if not os.path.exists(input_path):
+        print(f"错误: 路径不存在 {input_path}")
+        return False
+    
+    # 流式写入二进制存储
+    if is_embedding_store(output_file):
+        written, extracted = stream_files_to_store(
+            input_path, output_file, _extract_paragraph_records, api_client, model,
+            file_pattern, batch_size, cache, concurrency
+        )
+        if not extracted:
+            print("未找到文本段落")
+            return False
+        if not written:
+            print("错误: 未生成任何嵌入向量")
+            return False
+        print(f"已将 {written}/{extracted} 条嵌入向量数据保存至 {output_file}")
+        return True
+    
     # 提取文本
     print(f"从 {input_path} 提取文本...")
     paragraphs = []
@@ -118,27 +166,21 @@ def extract_and_create_embeddings(
     print("正在生成嵌入向量...")
     embeddings_data = []
     
-    for i in range(0, len(paragraphs), batch_size):
-        batch = paragraphs[i:i+batch_size]
-        print(f"处理批次 {i//batch_size + 1}/{(len(paragraphs)-1)//batch_size + 1}...")
-        
-        for item in batch:
-            text = item["content"]
-            
-            # 生成嵌入向量
-            try:
-                embedding = create_query_embedding(text, api_client, model)
-                
-                if embedding:
-                    embeddings_data.append({
-                        "text": text,
-                        "embedding": embedding,
-                        "metadata": item.get("metadata", {})
-                    })
-                else:
-                    print(f"警告: 无法为文本生成嵌入向量: {text[:50]}...")
-            except Exception as e:
-                print(f"处理文本时出错: {str(e)}")
+    # 各批次并发请求，结果按段落顺序返回；发送规范化后的文本，记录中保存原文
+    texts = get_text_normalizer().normalize_many([item["content"] for item in paragraphs])
+    embeddings = create_embeddings_concurrent(
+        texts, api_client, model, batch_size, concurrency=concurrency, cache=cache
+    )
+    
+    for item, embedding in zip(paragraphs, embeddings):
+        if embedding:
+            embeddings_data.append({
+                "text": item["content"],
+                "embedding": embedding,
+                "metadata": item.get("metadata", {})
+            })
+        else:
+            print(f"警告: 无法为文本生成嵌入向量: {item['content'][:50]}...")
     
     # 保存嵌入向量数据
     if embeddings_data:
@@ -152,6 +194,59 @@ def extract_and_create_embeddings(
         return False
 
 
+def update_fulltext_store(
+    input_dir: str,
+    store_file: str,
+    api_client=None,
+    model: str = None,
+    file_pattern: str = "*.xml",
+    batch_size: int = None,
+    cache=None,
+    concurrency: int = None
+) -> bool:
+    """
+    增量更新正文嵌入向量存储，只处理新增或修改过的文件
+    
+    Args:
+        input_dir: 包含XML文件的目录
+        store_file: 存储路径（.npy）
+        api_client: API客户端实例
+        model: 嵌入模型名称
+        file_pattern: 匹配XML文件的模式
+        batch_size: 批量处理大小
+        cache: 可选的 EmbeddingCache
+        concurrency: 同时进行的嵌入请求数
+        
+    Returns:
+        处理是否成功
+    """
+    if not api_client:
+        print("错误: 未提供API客户端，无法生成嵌入向量")
+        return False
+    
+    if not os.path.isdir(input_dir):
+        print(f"错误: 目录不存在 {input_dir}")
+        return False
+    
+    model = model or os.environ.get("EMBEDDING_MODEL", "doubao-embedding-text-240715")
+    
+    try:
+        batch_size = batch_size or int(os.environ.get("BATCH_SIZE", "10"))
+    except (ValueError, TypeError):
+        batch_size = 10
+    
+    try:
+        update_embedding_store(
+            input_dir, store_file, _extract_paragraph_records, api_client, model,
+            file_pattern, batch_size, cache, concurrency
+        )
+    except Exception as e:
+        print(f"增量更新正文嵌入向量时出错: {str(e)}")
+        return False
+    
+    return True
+
+
 def process_and_search(
     input_path: str,
     query_text: str,
@@ -199,16 +294,21 @@ def process_and_search(
         print("错误: 无法为查询文本创建嵌入向量")
         return []
     
-    # 加载嵌入向量数据
-    embeddings_data = load_embeddings(temp_embeddings_file)
-    
-    # 搜索相似文本
-    search_results = search_similar_text(
-        query_vector, embeddings_data, top_k, threshold
-    )
+    # 保留的嵌入向量文件使用共享索引；随后删除的临时文件不放入进程内的索引缓存
+    remove_temp_file = not save_embeddings and not embeddings_file
+    if remove_temp_file:
+        index = EmbeddingIndex(temp_embeddings_file)
+        try:
+            search_results = index.search(query_vector, top_k, threshold)
+        finally:
+            index.close()
+    else:
+        search_results = get_embedding_index(temp_embeddings_file).search(
+            query_vector, top_k, threshold
+        )
     
     # 如果不需要保存嵌入向量文件且使用的是临时文件，则删除它
-    if not save_embeddings and not embeddings_file:
+    if remove_temp_file:
         try:
             os.remove(temp_embeddings_file)
             print(f"已删除临时嵌入向量文件 {temp_embeddings_file}")
@@ -222,9 +322,21 @@ def initialize_api_client():
     """
     初始化API客户端
     
+    默认使用Ark客户端；设置环境变量 API_PROVIDER（例如 local）时使用对应的提供方。
+    
     Returns:
         API客户端实例，如果初始化失败则返回None
     """
+    provider = get_api_provider_name()
+    if provider != DEFAULT_PROVIDER:
+        try:
+            api_client = create_api_client(provider)
+            print(f"API客户端初始化成功（提供方: {provider}）")
+            return api_client
+        except Exception as e:
+            print(f"API客户端初始化失败: {str(e)}")
+            return None
+    
     try:
         from volcenginesdkarkruntime import Ark
         
@@ -330,12 +442,9 @@ def interactive():
                 print("错误: 无法为查询文本创建嵌入向量")
                 continue
             
-            # 加载嵌入向量数据
-            embeddings_data = load_embeddings(embeddings_file)
-            
-            # 搜索相似文本
-            search_results = search_similar_text(
-                query_vector, embeddings_data, top_k, threshold
+            # 获取共享的嵌入向量索引并搜索相似文本
+            search_results = get_embedding_index(embeddings_file).search(
+                query_vector, top_k, threshold
             )
             
             # 显示结果
@@ -426,6 +535,7 @@ def main():
     extract_parser.add_argument('--input', '-i', required=True, help='输入XML文件或目录路径')
     extract_parser.add_argument('--output', '-o', default='embeddings.json', help='输出嵌入向量文件路径')
     extract_parser.add_argument('--pattern', '-p', default='*.xml', help='匹配XML文件的模式')
+    extract_parser.add_argument('--cache', '-c', help='嵌入向量缓存文件路径（SQLite），未变化的文本不再调用API')
     
     # 搜索相似文本的子命令
     search_parser = subparsers.add_parser('search', help='搜索相似文本')
@@ -464,9 +574,14 @@ def main():
             print("错误: API客户端未初始化，无法生成嵌入向量")
             return
         
+        cache = EmbeddingCache(args.cache) if args.cache else None
         extract_and_create_embeddings(
-            args.input, args.output, api_client, file_pattern=args.pattern
+            args.input, args.output, api_client, file_pattern=args.pattern, cache=cache
         )
+        if cache is not None:
+            stats = cache.get_stats()
+            print(f"缓存命中 {stats['hits']}/{stats['hits'] + stats['misses']} ({stats['hit_rate']:.1%})")
+            cache.close()
     
     elif args.command == 'search':
         if not api_client:
@@ -480,12 +595,9 @@ def main():
             print("错误: 无法为查询文本创建嵌入向量")
             return
         
-        # 加载嵌入向量数据
-        embeddings_data = load_embeddings(args.embeddings)
-        
-        # 搜索相似文本
-        search_results = search_similar_text(
-            query_vector, embeddings_data, args.top_k, args.threshold
+        # 获取共享的嵌入向量索引并搜索相似文本
+        search_results = get_embedding_index(args.embeddings).search(
+            query_vector, args.top_k, args.threshold
         )
         
         # 显示结果
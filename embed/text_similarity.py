@@ -7,26 +7,39 @@ import os
 import json
 import numpy as np
 import sys
-from typing import List, Dict, Tuple, Optional, Union
+import threading
+from typing import List, Dict, Tuple, Optional, Union, Callable
 import time
 
 # 确保embed包可以被导入
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
+try:
+    from embed.embedding_store import EmbeddingStore, is_embedding_store
+except ImportError:
+    # 当作为模块导入时尝试相对导入
+    from .embedding_store import EmbeddingStore, is_embedding_store
 
-def load_embeddings(embeddings_file: str) -> List[Dict]:
+
+def load_embeddings(embeddings_file: str) -> Union[List[Dict], EmbeddingStore]:
     """
     加载嵌入向量数据
     
     Args:
-        embeddings_file: 嵌入向量JSON文件路径
+        embeddings_file: 嵌入向量JSON文件路径，或二进制存储路径（.npy）
         
     Returns:
-        包含文本和嵌入向量的字典列表
+        包含文本和嵌入向量的字典列表；二进制存储返回按需读取的 EmbeddingStore，
+        其用法与字典列表相同
     """
     if not os.path.exists(embeddings_file):
         raise FileNotFoundError(f"嵌入向量文件不存在: {embeddings_file}")
     
+    if is_embedding_store(embeddings_file):
+        store = EmbeddingStore(embeddings_file)
+        print(f"加载了 {len(store)} 条记录（二进制存储，维度 {store.dimension}）")
+        return store
+    
     with open(embeddings_file, 'r', encoding='utf-8') as f:
         embeddings_data = json.load(f)
     
@@ -79,6 +92,174 @@ def cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
     return np.dot(vec1, vec2)
 
 
+def _get_item_vector(item: Dict) -> Optional[Union[List[float], np.ndarray]]:
+    """
+    从数据项中取出嵌入向量，兼容 {"vector": ...} / {"embedding": ...} 两种嵌套格式
+    
+    Args:
+        item: 嵌入向量数据项
+        
+    Returns:
+        嵌入向量，无效时返回None
+    """
+    if not isinstance(item, dict):
+        return None
+    
+    embedding = item.get("embedding")
+    if embedding is None:
+        return None
+    
+    # 检查嵌入向量的类型
+    if isinstance(embedding, dict) and "vector" in embedding:
+        embedding = embedding["vector"]
+    elif isinstance(embedding, dict) and "embedding" in embedding:
+        embedding = embedding["embedding"]
+    
+    # 确保嵌入向量是列表或数组类型
+    if not isinstance(embedding, (list, np.ndarray)) or len(embedding) == 0:
+        return None
+    
+    return embedding
+
+
+def build_embedding_matrix(embeddings_data: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    将嵌入向量数据集构建为预归一化的float32矩阵
+    
+    Args:
+        embeddings_data: 嵌入向量数据集（字典列表或 EmbeddingStore）
+        
+    Returns:
+        (matrix, row_indices) 元组：matrix 的第 i 行是 embeddings_data[row_indices[i]]
+        的单位向量；缺少嵌入向量或维度不一致的记录会被跳过
+    """
+    # 二进制存储中的向量已是归一化的float32矩阵，直接使用；有删除标记时只取未删除的行
+    if isinstance(embeddings_data, EmbeddingStore):
+        if embeddings_data.deleted is None:
+            return embeddings_data.matrix, np.arange(len(embeddings_data), dtype=np.int64)
+        live_indices = embeddings_data.live_indices
+        return embeddings_data.matrix[live_indices], live_indices
+    
+    vectors = []
+    row_indices = []
+    dimension = None
+    skipped = 0
+    
+    for i, item in enumerate(embeddings_data):
+        embedding = _get_item_vector(item)
+        if embedding is None:
+            continue
+        
+        if dimension is None:
+            dimension = len(embedding)
+        elif len(embedding) != dimension:
+            skipped += 1
+            continue
+        
+        vectors.append(embedding)
+        row_indices.append(i)
+    
+    if skipped:
+        print(f"警告: 跳过了 {skipped} 条维度不一致的嵌入向量")
+    
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    
+    matrix = np.asarray(vectors, dtype=np.float32)
+    
+    # 一次性按行归一化，零向量保持不变
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    
+    return matrix, np.asarray(row_indices, dtype=np.int64)
+
+
+def _select_top_k(scores: np.ndarray, candidates: np.ndarray, top_k: Optional[int]) -> np.ndarray:
+    """
+    从候选行中选出相似度最高的top_k行，按相似度降序、行号升序排列
+    
+    Args:
+        scores: 所有行的相似度
+        candidates: 通过阈值的候选行号（升序）
+        top_k: 返回数量，None表示全部返回
+        
+    Returns:
+        排好序的行号数组
+    """
+    if top_k is not None and top_k < len(candidates):
+        if top_k <= 0:
+            return candidates[:0]
+        
+        candidate_scores = scores[candidates]
+        # argpartition 只定位第k大的值，O(n) 而非全量排序
+        kth = top_k - 1
+        kth_value = candidate_scores[np.argpartition(-candidate_scores, kth)[kth]]
+        
+        # 与第k大值相等的行按行号补足，保证与逐行扫描的稳定排序结果一致
+        above = candidates[candidate_scores > kth_value]
+        ties = candidates[candidate_scores == kth_value]
+        candidates = np.concatenate([above, ties[:top_k - len(above)]])
+    
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def search_embedding_matrix(
+    query_vector: Union[List[float], np.ndarray],
+    matrix: np.ndarray,
+    row_indices: np.ndarray,
+    embeddings_data: List[Dict],
+    top_k: int = 10,
+    threshold: float = 0.5
+) -> List[Dict]:
+    """
+    在预归一化矩阵上搜索与查询向量最相似的文本
+    
+    Args:
+        query_vector: 查询文本的嵌入向量
+        matrix: build_embedding_matrix 生成的单位向量矩阵
+        row_indices: 矩阵行到 embeddings_data 下标的映射
+        embeddings_data: 嵌入向量数据集（用于取回文本和元数据）
+        top_k: 返回的最相似文本数量
+        threshold: 相似度阈值（低于此值的结果将被过滤）
+        
+    Returns:
+        包含相似文本及其相似度的字典列表，按相似度降序排列
+    """
+    start_time = time.time()
+    
+    query = normalize_vector(query_vector).astype(np.float32)
+    
+    if matrix.shape[0] == 0 or query.shape[0] != matrix.shape[1]:
+        if matrix.shape[0] > 0:
+            print(f"错误: 查询向量维度 {query.shape[0]} 与数据集维度 {matrix.shape[1]} 不一致")
+        return []
+    
+    # 一次矩阵-向量乘法得到所有行的余弦相似度
+    scores = matrix @ query
+    
+    # 阈值过滤与top-k选择
+    candidates = np.flatnonzero(scores > threshold)
+    selected = _select_top_k(scores, candidates, top_k)
+    
+    results = []
+    for row in selected:
+        index = int(row_indices[row])
+        item = embeddings_data[index]
+        results.append({
+            "index": index,
+            "text": item.get("text", ""),
+            "similarity": float(scores[row]),
+            "metadata": item.get("metadata", {})
+        })
+    
+    elapsed_time = time.time() - start_time
+    print(f"搜索耗时: {elapsed_time:.3f}秒，找到 {len(candidates)} 个相似结果")
+    
+    return results
+
+
 def search_similar_text(
     query_vector: Union[List[float], np.ndarray],
     embeddings_data: List[Dict],
@@ -97,53 +278,327 @@ def search_similar_text(
     Returns:
         包含相似文本及其相似度的字典列表，按相似度降序排列
     """
-    # 将输入向量转换为NumPy数组并归一化
-    query_vector = normalize_vector(query_vector)
+    matrix, row_indices = build_embedding_matrix(embeddings_data)
     
-    # 计算相似度
-    similarities = []
-    start_time = time.time()
+    return search_embedding_matrix(
+        query_vector, matrix, row_indices, embeddings_data, top_k, threshold
+    )
+
+
+def merge_search_results(
+    per_query_results: List[List[Dict]],
+    query_labels: Optional[List[str]] = None,
+    max_results: Optional[int] = None
+) -> List[Dict]:
+    """
+    合并多个查询的搜索结果：按文本去重，保留相似度最高的结果并记录全部来源查询
     
-    for i, item in enumerate(embeddings_data):
-        if "embedding" not in item or not item["embedding"]:
-            continue
-        
-        # 获取嵌入向量
-        embedding = item["embedding"]
-        
-        # 检查嵌入向量的类型
-        if isinstance(embedding, dict) and "vector" in embedding:
-            embedding = embedding["vector"]
-        elif isinstance(embedding, dict) and "embedding" in embedding:
-            embedding = embedding["embedding"]
+    Args:
+        per_query_results: 每个查询的搜索结果列表
+        query_labels: 每个查询的标签（如关键词），写入 source_keyword / source_keywords
+        max_results: 合并后最多返回的结果数量，None表示全部返回
         
-        # 确保嵌入向量是列表类型
-        if not isinstance(embedding, list):
-            continue
+    Returns:
+        去重后按相似度降序排列的结果列表
+    """
+    unique_results_by_text = {}
+    text_sources = {}
+    
+    for query_index, results in enumerate(per_query_results):
+        label = query_labels[query_index] if query_labels else str(query_index)
         
-        # 归一化嵌入向量
-        normalized_embedding = normalize_vector(embedding)
+        for result in results:
+            text = result.get("text", "")
+            if not text:
+                continue
+            
+            # 记录文本来源的查询
+            sources = text_sources.setdefault(text, [])
+            if label not in sources:
+                sources.append(label)
+            
+            # 保存相似度最高的结果
+            if text not in unique_results_by_text or result.get("similarity", 0) > unique_results_by_text[text].get("similarity", 0):
+                unique_results_by_text[text] = result.copy()
+    
+    for text, result in unique_results_by_text.items():
+        result["source_keywords"] = list(text_sources[text])
+    
+    merged = list(unique_results_by_text.values())
+    merged.sort(key=lambda x: x.get("similarity", 0), reverse=True)
+    
+    if max_results is not None:
+        merged = merged[:max_results]
+    
+    return merged
+
+
+def search_embedding_matrix_batch(
+    query_vectors: List[Union[List[float], np.ndarray]],
+    matrix: np.ndarray,
+    row_indices: np.ndarray,
+    embeddings_data: List[Dict],
+    top_k: int = 10,
+    threshold: float = 0.5,
+    query_labels: Optional[List[str]] = None,
+    max_results: Optional[int] = None
+) -> Dict[str, List]:
+    """
+    在预归一化矩阵上同时搜索多个查询向量（一次矩阵-矩阵乘法）
+    
+    Args:
+        query_vectors: 查询向量列表
+        matrix: build_embedding_matrix 生成的单位向量矩阵
+        row_indices: 矩阵行到 embeddings_data 下标的映射
+        embeddings_data: 嵌入向量数据集（用于取回文本和元数据）
+        top_k: 每个查询返回的最相似文本数量
+        threshold: 相似度阈值
+        query_labels: 每个查询的标签（如关键词）
+        max_results: 合并结果的最大数量，默认 top_k × 查询数
         
-        # 计算余弦相似度
-        similarity = cosine_similarity(query_vector, normalized_embedding)
+    Returns:
+        字典：per_query 为每个查询的结果列表，merged 为去重合并后的结果列表
+    """
+    start_time = time.time()
+    
+    if query_labels is not None and len(query_labels) != len(query_vectors):
+        raise ValueError("query_labels 的数量必须与 query_vectors 一致")
+    
+    per_query = [[] for _ in query_vectors]
+    if max_results is None and top_k is not None:
+        max_results = top_k * len(query_vectors)
+    
+    if not query_vectors or matrix.shape[0] == 0:
+        return {"per_query": per_query, "merged": []}
+    
+    queries = np.vstack([normalize_vector(v).astype(np.float32) for v in query_vectors])
+    if queries.shape[1] != matrix.shape[1]:
+        print(f"错误: 查询向量维度 {queries.shape[1]} 与数据集维度 {matrix.shape[1]} 不一致")
+        return {"per_query": per_query, "merged": []}
+    
+    # 一次矩阵-矩阵乘法得到 (行数, 查询数) 的相似度矩阵
+    all_scores = matrix @ queries.T
+    
+    for q in range(len(query_vectors)):
+        scores = all_scores[:, q]
+        candidates = np.flatnonzero(scores > threshold)
         
-        # 如果相似度高于阈值，添加到结果列表
-        if similarity > threshold:
-            similarities.append({
-                "index": i,
+        for row in _select_top_k(scores, candidates, top_k):
+            index = int(row_indices[row])
+            item = embeddings_data[index]
+            result = {
+                "index": index,
                 "text": item.get("text", ""),
-                "similarity": similarity,
+                "similarity": float(scores[row]),
                 "metadata": item.get("metadata", {})
-            })
+            }
+            if query_labels is not None:
+                result["source_keyword"] = query_labels[q]
+            per_query[q].append(result)
     
-    # 按相似度降序排序
-    similarities.sort(key=lambda x: x["similarity"], reverse=True)
+    merged = merge_search_results(per_query, query_labels, max_results)
     
-    # 返回前top_k个结果
     elapsed_time = time.time() - start_time
-    print(f"搜索耗时: {elapsed_time:.3f}秒，找到 {len(similarities)} 个相似结果")
+    print(f"批量搜索耗时: {elapsed_time:.3f}秒，{len(query_vectors)} 个查询共得到 {len(merged)} 个去重结果")
+    
+    return {"per_query": per_query, "merged": merged}
+
+
+def search_similar_texts_batch(
+    query_vectors: List[Union[List[float], np.ndarray]],
+    embeddings_data: List[Dict],
+    top_k: int = 10,
+    threshold: float = 0.5,
+    query_labels: Optional[List[str]] = None,
+    max_results: Optional[int] = None
+) -> Dict[str, List]:
+    """
+    同时搜索与多个查询向量最相似的文本
+    
+    Args:
+        query_vectors: 查询向量列表
+        embeddings_data: 嵌入向量数据集
+        top_k: 每个查询返回的最相似文本数量
+        threshold: 相似度阈值
+        query_labels: 每个查询的标签（如关键词）
+        max_results: 合并结果的最大数量，默认 top_k × 查询数
+        
+    Returns:
+        字典：per_query 为每个查询的结果列表，merged 为去重合并后的结果列表
+    """
+    matrix, row_indices = build_embedding_matrix(embeddings_data)
+    
+    return search_embedding_matrix_batch(
+        query_vectors, matrix, row_indices, embeddings_data,
+        top_k, threshold, query_labels, max_results
+    )
+
+
+class EmbeddingIndex:
+    """
+    已加载的嵌入向量索引：保存数据集及其预归一化矩阵，可反复搜索
+    
+    通过 get_embedding_index() 获取的实例在进程内按文件共享，
+    文件的修改时间或大小变化后自动重新加载。
+    """
+    
+    def __init__(self, embeddings_file: str):
+        """
+        加载嵌入向量文件并构建矩阵
+        
+        Args:
+            embeddings_file: 嵌入向量文件路径（JSON或二进制存储）
+        """
+        self.embeddings_file = os.path.abspath(embeddings_file)
+        self.signature = _file_signature(self.embeddings_file)
+        self.data = load_embeddings(self.embeddings_file)
+        self.matrix, self.row_indices = build_embedding_matrix(self.data)
+    
+    def __len__(self) -> int:
+        return len(self.data)
+    
+    def search(
+        self,
+        query_vector: Union[List[float], np.ndarray],
+        top_k: int = 10,
+        threshold: float = 0.5
+    ) -> List[Dict]:
+        """
+        搜索与查询向量最相似的文本，参数与返回值同 search_similar_text
+        """
+        return search_embedding_matrix(
+            query_vector, self.matrix, self.row_indices, self.data, top_k, threshold
+        )
     
-    return similarities[:top_k]
+    def search_batch(
+        self,
+        query_vectors: List[Union[List[float], np.ndarray]],
+        top_k: int = 10,
+        threshold: float = 0.5,
+        query_labels: Optional[List[str]] = None,
+        max_results: Optional[int] = None
+    ) -> Dict[str, List]:
+        """
+        同时搜索多个查询向量，参数与返回值同 search_similar_texts_batch
+        """
+        return search_embedding_matrix_batch(
+            query_vectors, self.matrix, self.row_indices, self.data,
+            top_k, threshold, query_labels, max_results
+        )
+    
+    def close(self):
+        """
+        关闭二进制存储的记录文件句柄；JSON数据集无需关闭
+        
+        仍在使用该索引的搜索不受影响，读取记录时会重新打开文件。
+        """
+        close = getattr(self.data, "close", None)
+        if close is not None:
+            close()
+
+
+# 进程内共享的索引缓存：绝对路径 -> EmbeddingIndex
+_index_cache = {}
+_index_cache_lock = threading.Lock()
+_index_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    """文件的 (修改时间, 大小)，用于判断缓存是否失效"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_embedding_index(embeddings_file: str) -> EmbeddingIndex:
+    """
+    获取嵌入向量文件对应的共享索引，文件未变化时直接复用已加载的索引
+    
+    Args:
+        embeddings_file: 嵌入向量文件路径（JSON或二进制存储）
+        
+    Returns:
+        EmbeddingIndex 实例
+    """
+    if not os.path.exists(embeddings_file):
+        raise FileNotFoundError(f"嵌入向量文件不存在: {embeddings_file}")
+    
+    path = os.path.abspath(embeddings_file)
+    
+    with _index_cache_lock:
+        index = _index_cache.get(path)
+        if index is not None and index.signature == _file_signature(path):
+            _index_cache_stats["hits"] += 1
+            return index
+        
+        _index_cache_stats["misses"] += 1
+        old_index = index
+        index = EmbeddingIndex(path)
+        _index_cache[path] = index
+        
+        # 文件变化后替换的旧索引不再被缓存引用，关闭其文件句柄
+        if old_index is not None:
+            old_index.close()
+        return index
+
+
+def get_index_cache_stats() -> Dict:
+    """
+    获取索引缓存的命中统计
+    
+    Returns:
+        包含 hits、misses 和 cached_files 的字典
+    """
+    with _index_cache_lock:
+        return {
+            "hits": _index_cache_stats["hits"],
+            "misses": _index_cache_stats["misses"],
+            "cached_files": list(_index_cache.keys())
+        }
+
+
+def clear_index_cache():
+    """清空索引缓存并重置统计"""
+    with _index_cache_lock:
+        for index in _index_cache.values():
+            index.close()
+        _index_cache.clear()
+        _index_cache_stats["hits"] = 0
+        _index_cache_stats["misses"] = 0
+
+
+def _extract_embedding(embedding_data) -> Optional[List[float]]:
+    """
+    从嵌入API响应的单个数据项中提取嵌入向量
+    
+    Args:
+        embedding_data: response.data 中的一项
+        
+    Returns:
+        嵌入向量，无法提取时返回None
+    """
+    if hasattr(embedding_data, 'embedding'):
+        return embedding_data.embedding
+    elif hasattr(embedding_data, '__dict__'):
+        data_dict = embedding_data.__dict__
+        if 'embedding' in data_dict:
+            return data_dict['embedding']
+    
+    # 处理其他可能的响应格式
+    if isinstance(embedding_data, dict):
+        if 'embedding' in embedding_data:
+            return embedding_data['embedding']
+        elif 'vector' in embedding_data:
+            return embedding_data['vector']
+    
+    return None
+
+
+def _get_response_index(embedding_data, default: int) -> int:
+    """获取响应数据项对应的输入下标，缺省时按返回顺序"""
+    index = getattr(embedding_data, 'index', None)
+    if index is None and isinstance(embedding_data, dict):
+        index = embedding_data.get('index')
+    return index if isinstance(index, int) else default
 
 
 def create_query_embedding(
@@ -181,19 +636,9 @@ def create_query_embedding(
             embedding_data = response.data[0]
             
             # 提取嵌入向量
-            if hasattr(embedding_data, 'embedding'):
-                return embedding_data.embedding
-            elif hasattr(embedding_data, '__dict__'):
-                data_dict = embedding_data.__dict__
-                if 'embedding' in data_dict:
-                    return data_dict['embedding']
-            
-            # 处理其他可能的响应格式
-            if isinstance(embedding_data, dict):
-                if 'embedding' in embedding_data:
-                    return embedding_data['embedding']
-                elif 'vector' in embedding_data:
-                    return embedding_data['vector']
+            embedding = _extract_embedding(embedding_data)
+            if embedding is not None:
+                return embedding
             
             print(f"警告: 无法从响应中提取嵌入向量")
             print(f"响应类型: {type(embedding_data)}")
@@ -209,6 +654,90 @@ def create_query_embedding(
         return None
 
 
+def create_embeddings_batch(
+    texts: List[str],
+    api_client=None,
+    model: str = "doubao-embedding-text-240715",
+    batch_size: int = 10,
+    cache=None,
+    throttle: Optional[Callable[[List[str]], None]] = None
+) -> List[Optional[List[float]]]:
+    """
+    批量创建嵌入向量，每次请求最多发送 batch_size 条文本
+    
+    Args:
+        texts: 文本列表
+        api_client: API客户端实例
+        model: 嵌入模型名称
+        batch_size: 每次请求的文本数量
+        cache: 可选的 EmbeddingCache，命中的文本不再调用API
+        throttle: 可选的限流函数，每次发送请求前以该请求的文本列表调用，
+            整批失败后的逐条重试也不例外
+        
+    Returns:
+        与 texts 一一对应的嵌入向量列表，生成失败的位置为None
+    """
+    embeddings = [None] * len(texts)
+    
+    # 空文本不发送请求
+    pending = [i for i, text in enumerate(texts) if text and text.strip()]
+    
+    if cache is not None and pending:
+        cached = cache.get_many([texts[i] for i in pending], model)
+        for i, vector in zip(pending, cached):
+            embeddings[i] = vector
+        pending = [i for i in pending if embeddings[i] is None]
+    
+    if not pending:
+        return embeddings
+    
+    if not api_client:
+        print("错误: 未提供API客户端")
+        return embeddings
+    
+    batch_size = max(1, batch_size or 1)
+    
+    for start in range(0, len(pending), batch_size):
+        batch_indices = pending[start:start + batch_size]
+        batch_texts = [texts[i] for i in batch_indices]
+        
+        try:
+            if throttle is not None:
+                throttle(batch_texts)
+            response = api_client.embeddings.create(
+                model=model,
+                input=batch_texts,
+                encoding_format="float",
+            )
+            
+            data = response.data if hasattr(response, 'data') and response.data else []
+            for position, embedding_data in enumerate(data):
+                offset = _get_response_index(embedding_data, position)
+                if 0 <= offset < len(batch_indices):
+                    embeddings[batch_indices[offset]] = _extract_embedding(embedding_data)
+        
+        except Exception as e:
+            # 整批请求失败时（例如其中一条文本超长）逐条重试，避免丢弃同批次的其他文本
+            print(f"批量创建嵌入向量时出错，改为逐条处理 {len(batch_texts)} 条文本: {str(e)}")
+            for i in batch_indices:
+                if throttle is not None:
+                    throttle([texts[i]])
+                embeddings[i] = create_query_embedding(texts[i], api_client, model)
+            continue
+        
+        # 响应中缺失的条目单独补齐
+        for i in batch_indices:
+            if embeddings[i] is None:
+                if throttle is not None:
+                    throttle([texts[i]])
+                embeddings[i] = create_query_embedding(texts[i], api_client, model)
+    
+    if cache is not None:
+        cache.put_many([texts[i] for i in pending], [embeddings[i] for i in pending], model)
+    
+    return embeddings
+
+
 def search_by_text(
     query_text: str,
     embeddings_file: str,
@@ -235,8 +764,8 @@ def search_by_text(
         print("错误: 未提供API客户端")
         return []
     
-    # 加载嵌入向量数据
-    embeddings_data = load_embeddings(embeddings_file)
+    # 获取共享的嵌入向量索引（文件未变化时不会重新加载）
+    index = get_embedding_index(embeddings_file)
     
     # 创建查询文本的嵌入向量
     query_vector = create_query_embedding(query_text, api_client, model)
@@ -246,9 +775,7 @@ def search_by_text(
         return []
     
     # 搜索相似文本
-    similar_texts = search_similar_text(
-        query_vector, embeddings_data, top_k, threshold
-    )
+    similar_texts = index.search(query_vector, top_k, threshold)
     
     return similar_texts
 
@@ -271,25 +798,16 @@ def search_by_existing_text(
     Returns:
         相似文本列表
     """
-    # 加载嵌入向量数据
-    embeddings_data = load_embeddings(embeddings_file)
+    # 获取共享的嵌入向量索引
+    index = get_embedding_index(embeddings_file)
     
     # 查找文本对应的嵌入向量
     query_vector = None
     query_index = -1
     
-    for i, item in enumerate(embeddings_data):
+    for i, item in enumerate(index.data):
         if item.get("text") == query_text:
-            embedding = item.get("embedding")
-            
-            # 检查嵌入向量的类型
-            if isinstance(embedding, dict) and "vector" in embedding:
-                query_vector = embedding["vector"]
-            elif isinstance(embedding, dict) and "embedding" in embedding:
-                query_vector = embedding["embedding"]
-            elif isinstance(embedding, list):
-                query_vector = embedding
-            
+            query_vector = _get_item_vector(item)
             query_index = i
             break
     
@@ -298,9 +816,7 @@ def search_by_existing_text(
         return []
     
     # 搜索相似文本
-    similar_texts = search_similar_text(
-        query_vector, embeddings_data, top_k + 1, threshold
-    )
+    similar_texts = index.search(query_vector, top_k + 1, threshold)
     
     # 移除查询文本本身（如果在结果中）
     filtered_results = [item for item in similar_texts if item["index"] != query_index]
@@ -404,7 +920,7 @@ def interactive_search(embeddings_file: str, api_client=None):
                 continue
             
             # 加载嵌入数据
-            embeddings_data = load_embeddings(embeddings_file)
+            embeddings_data = get_embedding_index(embeddings_file).data
             
             # 查找匹配文本
             matches = []
@@ -482,9 +998,13 @@ def main():
     # 检查是否有API客户端
     api_client = None
     try:
-        from volcenginesdkarkruntime import Ark
-        from text_processor import API_KEY
-        api_client = Ark(api_key=API_KEY)
+        from embed.api_providers import get_api_provider_name, create_api_client, DEFAULT_PROVIDER
+        if get_api_provider_name() != DEFAULT_PROVIDER:
+            api_client = create_api_client()
+        else:
+            from volcenginesdkarkruntime import Ark
+            from text_processor import API_KEY
+            api_client = Ark(api_key=API_KEY)
         print("已初始化API客户端")
     except (ImportError, ModuleNotFoundError):
         print("警告: 未找到volcenginesdkarkruntime模块或API密钥，将无法使用新文本搜索功能")
@@ -1,19 +1,192 @@
 #!/usr/bin/env python3
 """
-XML文本提取器：使用纯文本方式和正则表达式从XML文件中提取<p>标签内容
+XML文本提取器：使用纯文本方式从XML文件中提取<p>标签内容
+
+GROBID后处理生成的XML并不总是格式良好（正文中可能含有未转义的 < 和 &），
+因此不使用XML解析器，而是以分块读取的流式扫描器按文本查找段落边界，
+边界规则与正则 <p(?:\\s[^>]*)?>(.*?)</p> 相同。
 """
 
 import os
+import io
 import re
 import glob
 import json
 import argparse
 import sys
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator, TextIO
 
 # 确保embed包可以被导入
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
+try:
+    from embed.parallel_extract import extract_files_parallel
+except ImportError:
+    from .parallel_extract import extract_files_parallel
+
+# 正则 \s 匹配的空白字符
+_WHITESPACE = " \t\n\r\f\v"
+
+# 段落之间的一级标题
+_HEADING_PATTERN = re.compile(r'<h1(?:\s[^>]*)?>(.*?)</h1>', re.DOTALL)
+_TAG_PATTERN = re.compile(r'<[^>]*>')
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkScanner:
+    """
+    在分块读取的文本上查找子串，只保留尚未处理的部分
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.eof = False
+
+    def _read_more(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def find(self, token: str, start: int) -> int:
+        """从 start 开始查找 token，缓冲区中没有时继续读取"""
+        while True:
+            index = self.buffer.find(token, start)
+            if index >= 0:
+                return index
+            # 下次只需从可能跨块的位置开始查找
+            start = max(start, len(self.buffer) - len(token) + 1)
+            if not self._read_more():
+                return -1
+
+    def char_at(self, index: int) -> str:
+        """读取指定位置的字符，超出文件末尾时返回空字符串"""
+        while index >= len(self.buffer):
+            if not self._read_more():
+                return ""
+        return self.buffer[index]
+
+    def discard(self, index: int):
+        """丢弃 index 之前已处理的内容"""
+        self.buffer = self.buffer[index:]
+
+
+def _last_heading(text: str) -> str:
+    """返回文本中最后一个<h1>标题的纯文本，没有时返回None"""
+    heading = None
+    for match in _HEADING_PATTERN.finditer(text):
+        heading = " ".join(_TAG_PATTERN.sub("", match.group(1)).split())
+    return heading
+
+
+def _scan_paragraphs(file: TextIO, chunk_size: int, skip_empty: bool) -> Iterator[Dict]:
+    """在文本流上扫描<p>段落，见 iter_paragraphs"""
+    scanner = _ChunkScanner(file, chunk_size)
+    section = ""
+    position = 0
+    search_from = 0
+
+    while True:
+        tag_start = scanner.find("<p", search_from)
+        if tag_start < 0:
+            break
+
+        # <p> 或 <p 属性...>，其他以 <p 开头的标签（如 <pb/>）不是段落
+        next_char = scanner.char_at(tag_start + 2)
+        if next_char == ">":
+            content_start = tag_start + 3
+        elif next_char and next_char in _WHITESPACE:
+            tag_end = scanner.find(">", tag_start + 3)
+            if tag_end < 0:
+                break
+            content_start = tag_end + 1
+        else:
+            search_from = tag_start + 1
+            continue
+
+        content_end = scanner.find("</p>", content_start)
+        if content_end < 0:
+            break
+
+        heading = _last_heading(scanner.buffer[:tag_start])
+        if heading is not None:
+            section = heading
+
+        content = scanner.buffer[content_start:content_end]
+        scanner.discard(content_end + 4)
+        search_from = 0
+
+        if skip_empty and not content.strip():
+            continue
+
+        yield {"position": position, "section": section, "content": content}
+        position += 1
+
+
+def iter_paragraphs(
+    file_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    skip_empty: bool = True
+) -> Iterator[Dict]:
+    """
+    流式提取XML文件中的<p>标签内容，保留内部标签
+
+    每次只在内存中保留当前段落和尚未处理的一块文本。
+
+    Args:
+        file_path: XML文件路径
+        chunk_size: 每次读取的字符数
+        skip_empty: 是否跳过只含空白的段落
+
+    Returns:
+        段落字典的迭代器，包含 position（段落序号，跳过的空段落不占序号）、
+        section（所在的<h1>标题）和 content
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        yield from _scan_paragraphs(file, chunk_size, skip_empty)
+
+
+def iter_paragraphs_in_text(content: str, skip_empty: bool = True) -> Iterator[Dict]:
+    """
+    从已读入内存的XML文本中提取<p>标签内容，结果与 iter_paragraphs 相同
+
+    Args:
+        content: XML文本
+        skip_empty: 是否跳过只含空白的段落
+
+    Returns:
+        段落字典的迭代器
+    """
+    return _scan_paragraphs(io.StringIO(content), max(len(content), 1), skip_empty)
+
+
+def parse_file_name_metadata(file_name: str) -> Dict:
+    """
+    从 "期刊 - 年份 - 作者 标题" 形式的文件名中提取元数据
+
+    Args:
+        file_name: 文件名
+
+    Returns:
+        元数据字典（journal、year、author、title），文件名不符合格式时为空
+    """
+    metadata = {}
+    if " - " in file_name:
+        parts = file_name.split(" - ")
+        if len(parts) >= 3:
+            metadata["journal"] = parts[0].strip()
+            metadata["year"] = parts[1].strip()
+            metadata["author"] = parts[2].split(" ")[0].strip()
+            metadata["title"] = " ".join(parts[2:]).split(".")[0].strip()
+    return metadata
+
 
 def extract_paragraphs_from_file(file_path: str) -> List[str]:
     """
@@ -26,14 +199,8 @@ def extract_paragraphs_from_file(file_path: str) -> List[str]:
         包含所有<p>标签内容的字符串列表
     """
     try:
-        # 以纯文本形式读取文件
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        # 使用正则表达式查找所有<p>和</p>标签之间的内容
-        # 支持<p>标签可能带有的属性，用非贪婪模式匹配确保正确匹配嵌套标签
-        paragraph_pattern = re.compile(r'<p(?:\s[^>]*)?>((?:.|\n)*?)</p>', re.DOTALL)
-        paragraphs = paragraph_pattern.findall(content)
+        # 流式扫描所有<p>和</p>标签之间的内容
+        paragraphs = [item["content"] for item in iter_paragraphs(file_path, skip_empty=False)]
         
         # 打印调试信息
         print(f"从文件 {file_path} 中提取了 {len(paragraphs)} 个段落")
@@ -58,6 +225,9 @@ def extract_paragraphs_with_metadata(file_path: str) -> List[Dict]:
     """
     从XML文件中提取所有<p>标签内容，并保留文件元数据
     
+    与 extract_paragraphs_from_file 一样跳过只含空白的段落，paragraph_id 为非空段落
+    的序号，编号与原先先过滤再编号的方式相同。
+    
     Args:
         file_path: XML文件路径
         
@@ -65,26 +235,20 @@ def extract_paragraphs_with_metadata(file_path: str) -> List[Dict]:
         包含段落内容和元数据的字典列表
     """
     try:
-        paragraphs = extract_paragraphs_from_file(file_path)
+        paragraphs = list(iter_paragraphs(file_path))
+        print(f"从文件 {file_path} 中提取了 {len(paragraphs)} 个段落")
         
         # 从文件名中提取元数据
         file_name = os.path.basename(file_path)
-        # 尝试从文件名中提取信息
-        metadata = {}
-        if " - " in file_name:
-            parts = file_name.split(" - ")
-            if len(parts) >= 3:
-                metadata["journal"] = parts[0].strip()
-                metadata["year"] = parts[1].strip()
-                metadata["author"] = parts[2].split(" ")[0].strip()
-                metadata["title"] = " ".join(parts[2:]).split(".")[0].strip()
+        metadata = parse_file_name_metadata(file_name)
         
         # 构建结果列表
         result = []
-        for i, p in enumerate(paragraphs):
+        for p in paragraphs:
             result.append({
-                "paragraph_id": i,
-                "content": p,
+                "paragraph_id": p["position"],
+                "section": p["section"],
+                "content": p["content"],
                 "file_path": file_path,
                 "file_name": file_name,
                 "metadata": metadata
@@ -97,13 +261,14 @@ def extract_paragraphs_with_metadata(file_path: str) -> List[Dict]:
         return []
 
 
-def process_directory(directory: str, file_pattern: str = "*.xml") -> Dict[str, List[str]]:
+def process_directory(directory: str, file_pattern: str = "*.xml", workers: int = 1) -> Dict[str, List[str]]:
     """
     处理目录中的所有XML文件
     
     Args:
         directory: 包含XML文件的目录
         file_pattern: 匹配XML文件的glob模式
+        workers: 并行提取的进程数，1表示串行，None或0表示读取 EXTRACT_WORKERS 环境变量或使用CPU核数
         
     Returns:
         字典，键为文件名，值为段落文本列表
@@ -112,7 +277,12 @@ def process_directory(directory: str, file_pattern: str = "*.xml") -> Dict[str,
         raise ValueError("未指定目录")
     
     result = {}
-    file_paths = glob.glob(os.path.join(directory, file_pattern))
+    file_paths = sorted(glob.glob(os.path.join(directory, file_pattern)))
+    
+    if workers != 1:
+        for file_path, paragraphs in extract_files_parallel(extract_paragraphs_from_file, file_paths, workers):
+            result[os.path.basename(file_path)] = paragraphs
+        return result
     
     for file_path in file_paths:
         file_name = os.path.basename(file_path)
@@ -122,13 +292,14 @@ def process_directory(directory: str, file_pattern: str = "*.xml") -> Dict[str,
     return result
 
 
-def process_directory_with_metadata(directory: str, file_pattern: str = "*.xml") -> List[Dict]:
+def process_directory_with_metadata(directory: str, file_pattern: str = "*.xml", workers: int = 1) -> List[Dict]:
     """
     处理目录中的所有XML文件，保留文件元数据
     
     Args:
         directory: 包含XML文件的目录
         file_pattern: 匹配XML文件的glob模式
+        workers: 并行提取的进程数，1表示串行，None或0表示读取 EXTRACT_WORKERS 环境变量或使用CPU核数
         
     Returns:
         包含段落内容和元数据的字典列表
@@ -137,7 +308,14 @@ def process_directory_with_metadata(directory: str, file_pattern: str = "*.xml")
         raise ValueError("未指定目录")
     
     result = []
-    file_paths = glob.glob(os.path.join(directory, file_pattern))
+    file_paths = sorted(glob.glob(os.path.join(directory, file_pattern)))
+    
+    if workers != 1:
+        for _, paragraphs_with_metadata in extract_files_parallel(
+            extract_paragraphs_with_metadata, file_paths, workers
+        ):
+            result.extend(paragraphs_with_metadata)
+        return result
     
     for file_path in file_paths:
         paragraphs_with_metadata = extract_paragraphs_with_metadata(file_path)
@@ -218,16 +396,23 @@ def main():
         help='是否包含文件元数据（仅用于JSON格式）'
     )
     
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=1,
+        help='并行提取的进程数，0表示使用CPU核数（默认：1，串行）'
+    )
+    
     args = parser.parse_args()
     
     # 处理输入
     if os.path.isdir(args.input):
         if args.metadata:
-            result = process_directory_with_metadata(args.input, args.pattern)
+            result = process_directory_with_metadata(args.input, args.pattern, args.workers)
             output_file = args.output or "paragraphs_with_metadata.json"
             save_paragraphs_with_metadata(result, output_file)
         else:
-            result = process_directory(args.input, args.pattern)
+            result = process_directory(args.input, args.pattern, args.workers)
             output_file = args.output or f"paragraphs.{args.format}"
             save_paragraphs_to_file(result, output_file, args.format)
     else:
@@ -1,7 +1,8 @@
 """ Generic API Client """
-from copy import deepcopy
 import json
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 
 try:
     from urlparse import urljoin
@@ -19,8 +20,20 @@ class ApiClient(object):
     accept_type = "application/xml"
     api_base = None
 
+    # Connection pool limits of the shared session: number of per-host pools
+    # kept, and number of keep-alive connections kept in each pool.
+    pool_connections = 10
+    pool_maxsize = 10
+
+    _session = None
+    _session_pool_maxsize = 0
+    _session_lock = threading.Lock()
+    # Number of requests currently sent through the shared session.
+    _requests_in_flight = 0
+
     def __init__(
-        self, base_url, username=None, api_key=None, status_endpoint=None, timeout=60
+        self, base_url, username=None, api_key=None, status_endpoint=None, timeout=60,
+        pool_connections=None, pool_maxsize=None
     ):
         """Initialise client.
 
@@ -29,12 +42,122 @@ class ApiClient(object):
             username (str): The username to authenticate with.
             api_key (str): The API key to authenticate with.
             timeout (int): Maximum time before timing out.
+            pool_connections (int or None): Number of per-host connection pools to keep.
+            pool_maxsize (int or None): Number of connections kept alive per host.
         """
         self.base_url = base_url
         self.username = username
         self.api_key = api_key
         self.status_endpoint = urljoin(self.base_url, status_endpoint)
         self.timeout = timeout
+        self.configure_pool(pool_connections, pool_maxsize)
+
+    def configure_pool(self, pool_connections=None, pool_maxsize=None):
+        """Set the connection pool limits of the shared session.
+
+        An open session whose pool is smaller than ``pool_maxsize`` is closed
+        and replaced on next use, so the pool should be configured before
+        requests are issued concurrently (e.g. with the executor's
+        ``max_workers`` before a batch is submitted). Do not call it while a
+        run such as ``iter_process`` is in progress: closing the session would
+        break the requests of its worker threads. If requests are in flight,
+        the session is kept and the new limits only apply to the next session,
+        created after ``close``.
+
+        Args:
+            pool_connections (int or None): Number of per-host connection pools to keep.
+            pool_maxsize (int or None): Number of connections kept alive per host.
+
+        Returns:
+            bool: False if the session needed replacing but was kept because
+            requests were in flight, True otherwise.
+        """
+        with self._session_lock:
+            if pool_connections:
+                self.pool_connections = int(pool_connections)
+            if pool_maxsize:
+                self.pool_maxsize = int(pool_maxsize)
+
+            if self._session is not None and self._session_pool_maxsize < self.pool_maxsize:
+                if self._requests_in_flight:
+                    print("Connection pool not resized: %d requests are in flight"
+                          % self._requests_in_flight)
+                    return False
+                self._session.close()
+                self._session = None
+            return True
+
+    def _create_session(self):
+        """Create a session whose adapters keep connections alive for reuse.
+
+        Returns:
+            requests.Session: The new session.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @property
+    def session(self):
+        """The pooled session shared by all calls, created on first use.
+
+        urllib3 connection pools are thread-safe, so worker threads can issue
+        requests through the same session concurrently.
+
+        Returns:
+            requests.Session: The shared session.
+        """
+        session = self._session
+        if session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+                    self._session_pool_maxsize = self.pool_maxsize
+                session = self._session
+        return session
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the shared session.
+
+        The request is counted as in flight until it completes, so that
+        ``configure_pool`` does not close the session under it.
+
+        Args:
+            method (str): The HTTP method to use.
+            url (str): The URL to call.
+            **kwargs: Passed on to ``requests.Session.request``.
+
+        Returns:
+            requests.Response: The response.
+        """
+        with self._session_lock:
+            self._requests_in_flight += 1
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            with self._session_lock:
+                self._requests_in_flight -= 1
+
+    def close(self):
+        """Close the shared session and its pooled connections.
+
+        The client stays usable: a new session is created on the next call.
+        """
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     @staticmethod
     def encode(request, data):
@@ -111,14 +234,14 @@ class ApiClient(object):
         Returns:
             ResultParser or ErrorParser.
         """
-        headers = deepcopy(headers) or {}
+        headers = dict(headers) if headers else {}
         headers["Accept"] = self.accept_type
-        params = deepcopy(params) or {}
+        params = dict(params) if params else {}
         data = data or {}
         files = files or {}
         # if self.username is not None and self.api_key is not None:
         #    params.update(self.get_credentials())
-        r = requests.request(
+        r = self.request(
             method,
             url,
             headers=headers,
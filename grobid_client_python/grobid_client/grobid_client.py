@@ -2,16 +2,13 @@
 
 Grobid Python Client
 
-This version uses the standard ThreadPoolExecutor for parallelizing the
-concurrent calls to the GROBID services.  Given the limits of
-ThreadPoolExecutor (input stored in memory, blocking Executor.map until the 
-whole input is acquired), it works with batches of PDF of a size indicated 
-in the config.json file (default is 1000 entries). We are moving from first 
-batch to the second one only when the first is entirely processed - which 
-means it is slightly sub-optimal, but should scale better. Working without 
-batch would mean acquiring a list of millions of files in directories and 
-would require something scalable too (e.g. done in a separate thread), 
-which is not implemented for the moment.
+Files are processed as a continuous pipeline: a discovery thread walks the
+input directory and feeds a bounded queue, a fixed pool of n worker threads
+takes files from the queue and sends them to the GROBID service, and the TEI
+results are written as soon as each request completes. Queues are bounded by
+the batch size indicated in the config.json file (default is 1000 entries),
+so memory use does not depend on the number of input files, and a slow PDF
+never holds back the other workers.
 
 """
 import os
@@ -20,11 +17,19 @@ import json
 import argparse
 import time
 import concurrent.futures
+import queue
+import threading
 import ntpath
 import requests
 import pathlib
 
 from .client import ApiClient
+from .limiter import AdaptiveConcurrencyLimiter, backoff_delay
+from .server_pool import ServerPool
+
+# retries of a request rejected with 503, and upper bound of the backoff delay in seconds
+DEFAULT_MAX_RETRIES = 10
+DEFAULT_MAX_SLEEP_TIME = 60
 
 
 class ServerUnavailableException(Exception):
@@ -32,22 +37,41 @@ class ServerUnavailableException(Exception):
 
 class GrobidClient(ApiClient):
 
+    # AIMD limit on in-flight requests, only set while process() is running
+    _limiter = None
+
     def __init__(self, grobid_server='localhost', 
                  batch_size=1000, 
                  coordinates=["persName", "figure", "ref", "biblStruct", "formula", "s", "note", "title"], 
                  sleep_time=5,
                  timeout=60,
                  config_path=None, 
-                 check_server=True):
+                 check_server=True,
+                 pool_connections=None,
+                 pool_maxsize=None):
         self.config = {
             'grobid_server': grobid_server,
             'batch_size': batch_size,
             'coordinates': coordinates,
             'sleep_time': sleep_time,
-            'timeout': timeout
+            'timeout': timeout,
+            'pool_connections': pool_connections,
+            'pool_maxsize': pool_maxsize
         }
         if config_path:
             self._load_config(config_path)
+        # grobid_server is either one URL or a list of URLs to balance the requests over
+        servers = self.config['grobid_server']
+        if isinstance(servers, str):
+            servers = [servers]
+        self._servers = ServerPool(
+            [server.rstrip('/') for server in servers],
+            self._is_alive,
+            error_threshold=self.config.get('server_error_threshold', 0.5),
+            eject_time=self.config.get('server_eject_time', 30)
+        )
+        # all requests go through one pooled keep-alive session, see ApiClient.session
+        self.configure_pool(self.config.get('pool_connections'), self.config.get('pool_maxsize'))
         if check_server:
             self._test_server_connection()
 
@@ -58,23 +82,41 @@ class GrobidClient(ApiClient):
         config_json = open(path).read()
         self.config = json.loads(config_json)
 
+    def _is_alive(self, server_url):
+        """Probe one server with the isalive service."""
+        r = self.request("GET", server_url + "/api/isalive", timeout=10)
+        return r.status_code == 200
+
     def _test_server_connection(self):
-        """Test if the server is up and running."""
-        the_url = self.get_server_url("isalive")
-        try:
-            r = requests.get(the_url)
-        except:
-            print("GROBID server does not appear up and running, the connection to the server failed")
-            raise ServerUnavailableException
+        """Test if the servers are up and running, servers that are down are taken out of rotation."""
+        several = len(self._servers) > 1
+        results = []
+        for server in self._servers.servers:
+            name = "GROBID server " + server.url if several else "GROBID server"
+            the_url = self.get_server_url("isalive", server)
+            try:
+                r = self.request("GET", the_url)
+            except:
+                print(name, "does not appear up and running, the connection to the server failed")
+                self._servers.eject(server, "connection failed")
+                results.append(None)
+                continue
+
+            status = r.status_code
+            results.append(status)
+
+            if status != 200:
+                print(name + " does not appear up and running " + str(status))
+                self._servers.eject(server, "isalive returned " + str(status))
+            else:
+                print(name + " is up and running")
 
-        status = r.status_code
+        if all(status is None for status in results):
+            raise ServerUnavailableException
 
-        if status != 200:
-            print("GROBID server does not appear up and running " + str(status))
-            return False, status
-        else:
-            print("GROBID server is up and running")
-            return True, status
+        if 200 in results:
+            return True, 200
+        return False, next(status for status in results if status is not None)
 
     def _output_file_name(self, input_file, input_path, output):
         # we use ntpath here to be sure it will work on Windows too
@@ -99,7 +141,75 @@ class GrobidClient(ApiClient):
         """
         return self._test_server_connection()
 
+    def _is_input_file(self, service, filename):
+        """Return True if the file is an input for the given service."""
+        if filename.endswith(".pdf") or filename.endswith(".PDF"):
+            return True
+        if service == 'processCitationList':
+            return filename.endswith(".txt") or filename.endswith(".TXT")
+        if service == 'processCitationPatentST36':
+            return filename.endswith(".xml") or filename.endswith(".XML")
+        return False
+
+    def _iter_input_files(self, service, input_path, verbose=False):
+        """Walk the input directory lazily and yield the files to process."""
+        for (dirpath, dirnames, filenames) in os.walk(input_path):
+            for filename in filenames:
+                if self._is_input_file(service, filename):
+                    if verbose:
+                        try:
+                            print(filename)
+                        except Exception:
+                            # may happen on linux see https://stackoverflow.com/questions/27366479/python-3-os-walk-file-paths-unicodeencodeerror-utf-8-codec-cant-encode-s
+                            pass
+                    yield os.sep.join([dirpath, filename])
+
     def process(
+        self,
+        service,
+        input_path,
+        output=None,
+        n=10,
+        generateIDs=False,
+        consolidate_header=True,
+        consolidate_citations=False,
+        include_raw_citations=False,
+        include_raw_affiliations=False,
+        tei_coordinates=False,
+        segment_sentences=False,
+        force=True,
+        verbose=False,
+        flavor=None,
+        callback=None
+    ):
+        """
+        Process all the files of input_path with up to n concurrent requests.
+
+        See iter_process() for the processing pipeline. If callback is given,
+        it is called in the calling thread as callback(input_file, status,
+        text, filename) after the result of each file has been written.
+        """
+        results = self.iter_process(
+            service,
+            input_path,
+            output=output,
+            n=n,
+            generateIDs=generateIDs,
+            consolidate_header=consolidate_header,
+            consolidate_citations=consolidate_citations,
+            include_raw_citations=include_raw_citations,
+            include_raw_affiliations=include_raw_affiliations,
+            tei_coordinates=tei_coordinates,
+            segment_sentences=segment_sentences,
+            force=force,
+            verbose=verbose,
+            flavor=flavor
+        )
+        for result in results:
+            if callback is not None:
+                callback(*result)
+
+    def iter_process(
         self,
         service,
         input_path,
@@ -116,61 +226,215 @@ class GrobidClient(ApiClient):
         verbose=False,
         flavor=None
     ):
-        batch_size_pdf = self.config["batch_size"]
-        input_files = []
+        """
+        Process all the files of input_path with up to n concurrent requests,
+        yielding each result as soon as its request completes.
+
+        A discovery thread walks input_path and feeds a bounded queue, n worker
+        threads take files from it and call the service, and the calling thread
+        writes each TEI result as soon as its request completes. Both queues
+        hold at most batch_size entries, so memory stays constant whatever the
+        number of files, and a slow PDF only occupies its own worker.
+
+        The number of requests in flight adapts to the server: it is halved
+        when GROBID answers 503 and grows back while requests succeed. The
+        concurrency observed to work is printed at the end of the run.
+
+        Each item is a tuple (input_file, status, text, filename), where
+        filename is the TEI file or error file written for the input, or None
+        if writing failed. The result is written before it is yielded, so the
+        caller can read the file right away. Files skipped because their TEI
+        file already exists are not yielded. Closing the generator early stops
+        the run.
+        """
+        queue_size = max(n, self.config.get("batch_size") or n)
+
+        # one keep-alive connection per worker thread, reused for the whole run
+        self.configure_pool(pool_maxsize=max(n, self.config.get('pool_maxsize') or 0))
+
+        input_queue = queue.Queue(maxsize=queue_size)
+        result_queue = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        errors = []
+
+        def put(target_queue, item):
+            # give up when the run is being stopped, so no thread blocks forever
+            while not stop.is_set():
+                try:
+                    target_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def discover():
+            try:
+                for input_file in self._iter_input_files(service, input_path, verbose):
+                    # check if TEI file is already produced
+                    filename = self._output_file_name(input_file, input_path, output)
+                    if not force and os.path.isfile(filename):
+                        print(filename, "already exist, skipping... (use --force to reprocess pdf input files)")
+                        continue
 
-        for (dirpath, dirnames, filenames) in os.walk(input_path):
-            for filename in filenames:
-                if filename.endswith(".pdf") or filename.endswith(".PDF") or \
-                    (service == 'processCitationList' and (filename.endswith(".txt") or filename.endswith(".TXT"))) or \
-                    (service == 'processCitationPatentST36' and (filename.endswith(".xml") or filename.endswith(".XML"))):
                     if verbose:
-                        try:
-                            print(filename)
-                        except Exception:
-                            # may happen on linux see https://stackoverflow.com/questions/27366479/python-3-os-walk-file-paths-unicodeencodeerror-utf-8-codec-cant-encode-s
-                            pass
-                    input_files.append(os.sep.join([dirpath, filename]))
-
-                    if len(input_files) == batch_size_pdf:
-                        self.process_batch(
-                            service,
-                            input_files,
-                            input_path,
-                            output,
-                            n,
-                            generateIDs,
-                            consolidate_header,
-                            consolidate_citations,
-                            include_raw_citations,
-                            include_raw_affiliations,
-                            tei_coordinates,
-                            segment_sentences,
-                            force,
-                            verbose,
-                            flavor
-                        )
-                        input_files = []
-
-        # last batch
-        if len(input_files) > 0:
-            self.process_batch(
+                        print(f"Adding {input_file} to the queue.")
+
+                    if not put(input_queue, input_file):
+                        return
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                for _ in range(n):
+                    put(input_queue, None)
+
+        def work():
+            while True:
+                try:
+                    input_file = input_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+
+                if input_file is None:
+                    put(result_queue, None)
+                    return
+
+                try:
+                    result = self._process_file(
+                        service,
+                        input_file,
+                        generateIDs,
+                        consolidate_header,
+                        consolidate_citations,
+                        include_raw_citations,
+                        include_raw_affiliations,
+                        tei_coordinates,
+                        segment_sentences,
+                        flavor
+                    )
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                    return
+
+                if not put(result_queue, result):
+                    return
+
+        self._limiter = AdaptiveConcurrencyLimiter(n)
+        self._servers.reset_stats()
+
+        threads = [threading.Thread(target=discover, daemon=True)]
+        threads += [threading.Thread(target=work, daemon=True) for _ in range(n)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            finished = 0
+            while finished < n:
+                try:
+                    result = result_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        break
+                    continue
+
+                if result is None:
+                    finished += 1
+                    continue
+
+                input_file, status, text = result
+                filename = self._write_result(input_file, status, text, input_path, output)
+                yield input_file, status, text, filename
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            print("GROBID client:", self._limiter.summary())
+            self._limiter = None
+            if len(self._servers) > 1:
+                for line in self._servers.summary():
+                    print("GROBID server", line)
+
+        if errors:
+            raise errors[0]
+
+    def _process_file(
+        self,
+        service,
+        input_file,
+        generateIDs,
+        consolidate_header,
+        consolidate_citations,
+        include_raw_citations,
+        include_raw_affiliations,
+        tei_coordinates,
+        segment_sentences,
+        flavor=None
+    ):
+        """Call the service for one input file, returns (input_file, status, text)."""
+        if service == 'processCitationList':
+            return self.process_txt(
                 service,
-                input_files,
-                input_path,
-                output,
-                n,
+                input_file,
                 generateIDs,
                 consolidate_header,
                 consolidate_citations,
                 include_raw_citations,
                 include_raw_affiliations,
                 tei_coordinates,
-                segment_sentences,
-                force,
-                verbose,
+                segment_sentences
             )
 
+        return self.process_pdf(
+            service,
+            input_file,
+            generateIDs,
+            consolidate_header,
+            consolidate_citations,
+            include_raw_citations,
+            include_raw_affiliations,
+            tei_coordinates,
+            segment_sentences,
+            flavor,
+            -1,
+            -1
+        )
+
+    def _write_result(self, input_file, status, text, input_path, output):
+        """Write the TEI result of one file, or an error file suffixed with the status code.
+
+        Returns:
+            str: Path of the written file, None if writing failed.
+        """
+        filename = self._output_file_name(input_file, input_path, output)
+
+        if status != 200 or text is None:
+            print("Processing of", input_file, "failed with error", str(status), ",", text)
+            # writing error file with suffixed error code
+            filename = filename.replace(".grobid.tei.xml", "_"+str(status)+".txt")
+            try:
+                pathlib.Path(os.path.dirname(filename)).mkdir(parents=True, exist_ok=True)
+                with open(filename, 'w', encoding='utf8') as tei_file:
+                    if text is not None:
+                        tei_file.write(text)
+                    else:
+                        tei_file.write("")
+            except OSError:
+                print("Writing resulting TEI XML file", filename, "failed")
+                return None
+        else:
+            # writing TEI file
+            try:
+                pathlib.Path(os.path.dirname(filename)).mkdir(parents=True, exist_ok=True)
+                with open(filename,'w',encoding='utf8') as tei_file:
+                    tei_file.write(text)
+            except OSError:
+               print("Writing resulting TEI XML file", filename, "failed")
+               return None
+        return filename
+
     def process_batch(
         self,
         service,
@@ -189,12 +453,12 @@ class GrobidClient(ApiClient):
         verbose=False,
         flavor=None
     ):
+        """Process an explicit list of files and wait for all of them (process() streams instead)."""
         if verbose:
             print(len(input_files), "files to process in current batch")
 
         # we use ThreadPoolExecutor and not ProcessPoolExecutor because it is an I/O intensive process
         with concurrent.futures.ThreadPoolExecutor(max_workers=n) as executor:
-            #with concurrent.futures.ProcessPoolExecutor(max_workers=n) as executor:
             results = []
             for input_file in input_files:
                 # check if TEI file is already produced
@@ -203,15 +467,11 @@ class GrobidClient(ApiClient):
                     print(filename, "already exist, skipping... (use --force to reprocess pdf input files)")
                     continue
 
-                selected_process = self.process_pdf
-                if service == 'processCitationList':
-                    selected_process = self.process_txt
-
                 if verbose:
                     print(f"Adding {input_file} to the queue.")
                 
                 r = executor.submit(
-                    selected_process,
+                    self._process_file,
                     service,
                     input_file,
                     generateIDs,
@@ -221,36 +481,13 @@ class GrobidClient(ApiClient):
                     include_raw_affiliations,
                     tei_coordinates,
                     segment_sentences,
-                    flavor,
-                    -1,
-                    -1)
+                    flavor)
 
                 results.append(r)
 
-        for r in concurrent.futures.as_completed(results):
-            input_file, status, text = r.result()
-            filename = self._output_file_name(input_file, input_path, output)
-
-            if status != 200 or text is None:
-                print("Processing of", input_file, "failed with error", str(status), ",", text)
-                # writing error file with suffixed error code
-                try:
-                    pathlib.Path(os.path.dirname(filename)).mkdir(parents=True, exist_ok=True)
-                    with open(filename.replace(".grobid.tei.xml", "_"+str(status)+".txt"), 'w', encoding='utf8') as tei_file:
-                        if text is not None:
-                            tei_file.write(text)
-                        else:
-                            tei_file.write("")
-                except OSError:
-                    print("Writing resulting TEI XML file", filename, "failed")
-            else:
-                # writing TEI file
-                try:
-                    pathlib.Path(os.path.dirname(filename)).mkdir(parents=True, exist_ok=True)
-                    with open(filename,'w',encoding='utf8') as tei_file:
-                        tei_file.write(text)
-                except OSError:
-                   print("Writing resulting TEI XML file", filename, "failed")
+            for r in concurrent.futures.as_completed(results):
+                input_file, status, text = r.result()
+                self._write_result(input_file, status, text, input_path, output)
 
     def process_pdf(
         self,
@@ -277,8 +514,6 @@ class GrobidClient(ApiClient):
             )
         }
         
-        the_url = self.get_server_url(service)
-
         # set the GROBID parameters
         the_data = {}
         if generateIDs:
@@ -303,35 +538,69 @@ class GrobidClient(ApiClient):
             the_data["end"] = str(end)
 
         try:
-            res, status = self.post(
-                url=the_url, files=files, data=the_data, headers={"Accept": "text/plain"}, timeout=self.config['timeout']
+            res, status = self._post_with_retry(
+                service, rewind=pdf_handle, files=files, data=the_data, headers={"Accept": "text/plain"}, timeout=self.config['timeout']
             )
-
-            if status == 503:
-                time.sleep(self.config["sleep_time"])
-                return self.process_pdf(
-                    service,
-                    pdf_file,
-                    generateIDs,
-                    consolidate_header,
-                    consolidate_citations,
-                    include_raw_citations,
-                    include_raw_affiliations,
-                    tei_coordinates,
-                    segment_sentences,
-                    start,
-                    end,
-                    flavor
-                )
         except requests.exceptions.ReadTimeout:
-            pdf_handle.close()
             return (pdf_file, 408, None)
+        finally:
+            pdf_handle.close()
 
-        pdf_handle.close()
         return (pdf_file, status, res.text)
 
-    def get_server_url(self, service):
-        return self.config['grobid_server'] + "/api/" + service
+    def _post_with_retry(self, service, rewind=None, **kwargs):
+        """
+        POST a request to the least-loaded healthy server, retrying with
+        exponential backoff and jitter while the server answers 503 (all its
+        threads are busy). When several servers are configured, a request
+        whose server cannot be reached is sent to another one.
+
+        Args:
+            service (str): GROBID service name.
+            rewind (file or None): Uploaded file handle to rewind before each attempt.
+            **kwargs: Arguments passed to post().
+
+        Returns:
+            (response, status) of the last attempt.
+        """
+        max_retries = self.config.get("max_retries", DEFAULT_MAX_RETRIES)
+        max_sleep_time = self.config.get("max_sleep_time", DEFAULT_MAX_SLEEP_TIME)
+        limiter = self._limiter
+
+        attempt = 0
+        while True:
+            if rewind is not None:
+                rewind.seek(0)
+
+            token = limiter.acquire() if limiter is not None else None
+            server = self._servers.acquire()
+            started = time.time()
+            try:
+                res, status = self.post(url=self.get_server_url(service, server), **kwargs)
+            except Exception as e:
+                self._servers.release(server, None, time.time() - started)
+                if limiter is not None:
+                    limiter.abandon()
+                if isinstance(e, requests.exceptions.ConnectionError) and len(self._servers) > 1 \
+                        and (max_retries is None or attempt < max_retries):
+                    self._servers.eject(server, "connection failed")
+                    attempt += 1
+                    continue
+                raise
+            self._servers.release(server, status, time.time() - started)
+            if limiter is not None:
+                limiter.release(token, overloaded=(status == 503))
+
+            if status != 503 or (max_retries is not None and attempt >= max_retries):
+                return res, status
+
+            time.sleep(backoff_delay(attempt, self.config["sleep_time"], max_sleep_time))
+            attempt += 1
+
+    def get_server_url(self, service, server=None):
+        if server is None:
+            server = self._servers.servers[0]
+        return server.url + "/api/" + service
 
     def process_txt(
         self,
@@ -350,8 +619,6 @@ class GrobidClient(ApiClient):
         with open(txt_file) as f:
             references = [line.rstrip() for line in f]
 
-        the_url = self.get_server_url(service)
-
         # set the GROBID parameters
         the_data = {}
         if consolidate_citations:
@@ -359,24 +626,10 @@ class GrobidClient(ApiClient):
         if include_raw_citations:
             the_data["includeRawCitations"] = "1"
         the_data["citations"] = references
-        res, status = self.post(
-            url=the_url, data=the_data, headers={"Accept": "application/xml"}
+        res, status = self._post_with_retry(
+            service, data=the_data, headers={"Accept": "application/xml"}
         )
 
-        if status == 503:
-            time.sleep(self.config["sleep_time"])
-            return self.process_txt(
-                service,
-                txt_file,
-                generateIDs,
-                consolidate_header,
-                consolidate_citations,
-                include_raw_citations,
-                include_raw_affiliations,
-                tei_coordinates,
-                segment_sentences
-            )
-
         return (txt_file, status, res.text)
 
 def main():
@@ -507,22 +760,23 @@ def main():
 
     start_time = time.time()
 
-    client.process(
-        service,
-        input_path,
-        output=output_path,
-        n=n,
-        generateIDs=generateIDs,
-        consolidate_header=consolidate_header,
-        consolidate_citations=consolidate_citations,
-        include_raw_citations=include_raw_citations,
-        include_raw_affiliations=include_raw_affiliations,
-        tei_coordinates=tei_coordinates,
-        segment_sentences=segment_sentences,
-        force=force,
-        verbose=verbose,
-        flavor=flavor
-    )
+    with client:
+        client.process(
+            service,
+            input_path,
+            output=output_path,
+            n=n,
+            generateIDs=generateIDs,
+            consolidate_header=consolidate_header,
+            consolidate_citations=consolidate_citations,
+            include_raw_citations=include_raw_citations,
+            include_raw_affiliations=include_raw_affiliations,
+            tei_coordinates=tei_coordinates,
+            segment_sentences=segment_sentences,
+            force=force,
+            verbose=verbose,
+            flavor=flavor
+        )
 
     runtime = round(time.time() - start_time, 3)
     print("runtime: %s seconds " % (runtime))
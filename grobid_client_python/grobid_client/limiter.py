@@ -0,0 +1,109 @@
+""" Adaptive concurrency limiting and retry backoff for GROBID requests """
+import random
+import threading
+
+
+def backoff_delay(attempt, base, maximum):
+    """Exponential backoff with jitter for the given retry attempt.
+
+    Half of the delay is fixed and half is random, so waiting clients spread
+    out instead of retrying in lockstep.
+
+    Args:
+        attempt (int): Number of the retry, starting at 0.
+        base (float): Delay of the first retry, in seconds.
+        maximum (float): Upper bound of the delay, in seconds.
+
+    Returns:
+        float: Delay in seconds.
+    """
+    delay = min(maximum, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class AdaptiveConcurrencyLimiter(object):
+    """AIMD limit on the number of requests in flight.
+
+    The limit grows by one after a full window of successful requests
+    (additive increase) and is halved when the server answers 503
+    (multiplicative decrease). 503 responses to requests sent before the
+    last decrease are ignored, so a burst of rejections from one overload
+    episode only lowers the limit once.
+    """
+
+    def __init__(self, max_limit, min_limit=1, initial_limit=None, decrease_factor=0.5):
+        """Initialise limiter.
+
+        Args:
+            max_limit (int): Highest allowed limit, usually the number of worker threads.
+            min_limit (int): Lowest allowed limit.
+            initial_limit (int or None): Starting limit, defaults to max_limit.
+            decrease_factor (float): Factor applied to the limit on overload.
+        """
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.limit = float(initial_limit or self.max_limit)
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+
+        self._condition = threading.Condition()
+        self._epoch = 0
+        self._successes = 0
+        self._overloads = 0
+        self._limit_total = 0.0
+
+    def acquire(self):
+        """Wait for a free slot.
+
+        Returns:
+            int: Token to pass back to release().
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return self._epoch
+
+    def release(self, token, overloaded=False):
+        """Free a slot and adjust the limit.
+
+        Args:
+            token (int): Value returned by the matching acquire().
+            overloaded (bool): True if the server rejected the request with 503.
+        """
+        with self._condition:
+            self.in_flight -= 1
+
+            if overloaded:
+                self._overloads += 1
+                if token == self._epoch:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._epoch += 1
+            else:
+                self._successes += 1
+                self._limit_total += self.limit
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+            self._condition.notify_all()
+
+    def abandon(self):
+        """Free a slot without adjusting the limit, when a request failed without a response."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    @property
+    def optimal_concurrency(self):
+        """Average limit under which requests succeeded, None before any success."""
+        if not self._successes:
+            return None
+        return self._limit_total / self._successes
+
+    def summary(self):
+        """One-line description of the observed concurrency."""
+        optimal = self.optimal_concurrency
+        if optimal is None:
+            return "no successful request, concurrency limit ended at %d" % int(self.limit)
+        return "observed optimal concurrency %.1f (max %d, %d requests, %d overloaded 503 responses)" % (
+            optimal, self.max_limit, self._successes, self._overloads
+        )
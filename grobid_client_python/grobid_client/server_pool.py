@@ -0,0 +1,188 @@
+""" Load balancing of requests over several GROBID servers """
+import threading
+import time
+from collections import deque
+
+
+class GrobidServer(object):
+    """State and statistics of one GROBID server."""
+
+    def __init__(self, url, window=20):
+        self.url = url
+        self.healthy = True
+        self.in_flight = 0
+        self.retry_at = 0.0
+        self.probing = False
+
+        # outcomes of the last requests, True for errors
+        self.recent = deque(maxlen=window)
+
+        self.requests = 0
+        self.successes = 0
+        self.errors = 0
+        self.busy = 0
+        self.seconds = 0.0
+
+    @property
+    def error_rate(self):
+        if not self.recent:
+            return 0.0
+        return sum(self.recent) / len(self.recent)
+
+
+class ServerPool(object):
+    """Send each request to the least-loaded healthy server.
+
+    A server is ejected when the error rate over its last requests reaches
+    ``error_threshold``, or when its ``isalive`` probe fails. An ejected
+    server is probed again after ``eject_time`` seconds and re-admitted if
+    the probe succeeds. The last healthy server is never ejected, so a
+    single-server pool behaves like a plain client.
+    """
+
+    def __init__(
+        self,
+        urls,
+        probe,
+        error_threshold=0.5,
+        window=20,
+        min_requests=5,
+        eject_time=30,
+    ):
+        """Initialise pool.
+
+        Args:
+            urls (list): Base URLs of the GROBID servers.
+            probe (callable): Function taking a server URL, returns True if the server is alive.
+            error_threshold (float): Error rate at which a server is ejected.
+            window (int): Number of recent requests used for the error rate.
+            min_requests (int): Requests needed in the window before ejecting on error rate.
+            eject_time (float): Seconds before an ejected server is probed again.
+        """
+        if not urls:
+            raise ValueError("at least one GROBID server is required")
+
+        self.servers = [GrobidServer(url, window) for url in urls]
+        self.probe = probe
+        self.error_threshold = error_threshold
+        self.min_requests = min_requests
+        self.eject_time = eject_time
+
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    def __len__(self):
+        return len(self.servers)
+
+    def reset_stats(self):
+        """Clear the throughput statistics, e.g. at the start of a run."""
+        with self._lock:
+            for server in self.servers:
+                server.requests = server.successes = server.errors = server.busy = 0
+                server.seconds = 0.0
+            self._started = time.time()
+
+    def eject(self, server, reason):
+        """Take a server out of rotation until it passes a probe again."""
+        with self._lock:
+            self._eject(server, reason)
+
+    def _eject(self, server, reason):
+        if not server.healthy:
+            return
+        if sum(1 for s in self.servers if s.healthy) <= 1:
+            # keep the last healthy server in rotation
+            return
+        print("GROBID server", server.url, "ejected:", reason)
+        server.healthy = False
+        server.retry_at = time.time() + self.eject_time
+
+    def _readmit(self, server):
+        print("GROBID server", server.url, "re-admitted")
+        server.healthy = True
+        server.recent.clear()
+
+    def acquire(self):
+        """Choose the server for the next request.
+
+        An ejected server whose waiting time has passed is probed first by
+        the calling thread.
+
+        Returns:
+            GrobidServer: The least-loaded healthy server.
+        """
+        with self._lock:
+            now = time.time()
+            candidate = None
+            for server in self.servers:
+                if not server.healthy and not server.probing and server.retry_at <= now:
+                    candidate = server
+                    candidate.probing = True
+                    break
+
+        if candidate is not None:
+            try:
+                alive = self.probe(candidate.url)
+            except Exception:
+                alive = False
+            with self._lock:
+                candidate.probing = False
+                if alive:
+                    self._readmit(candidate)
+                else:
+                    candidate.retry_at = time.time() + self.eject_time
+
+        with self._lock:
+            healthy = [server for server in self.servers if server.healthy]
+            server = min(healthy, key=lambda s: (s.in_flight, s.requests))
+            server.in_flight += 1
+            server.requests += 1
+            return server
+
+    def release(self, server, status=None, seconds=0.0):
+        """Record the outcome of a request.
+
+        Args:
+            server (GrobidServer): Server returned by acquire().
+            status (int or None): HTTP status, None if the request failed without a response.
+            seconds (float): Duration of the request.
+        """
+        with self._lock:
+            server.in_flight -= 1
+            server.seconds += seconds
+
+            if status == 503:
+                # busy, handled by backoff and the concurrency limiter
+                server.busy += 1
+                return
+
+            # 500 is GROBID's answer to a PDF it cannot process, not a server fault
+            error = status is None or (status > 500 and status != 503)
+            server.recent.append(error)
+            if error:
+                server.errors += 1
+            else:
+                server.successes += 1
+
+            if (server.healthy and len(server.recent) >= self.min_requests
+                    and server.error_rate >= self.error_threshold):
+                self._eject(server, "error rate %.0f%% over the last %d requests"
+                            % (server.error_rate * 100, len(server.recent)))
+
+    def summary(self):
+        """Per-server throughput since the start of the run.
+
+        Returns:
+            list: One line per server.
+        """
+        elapsed = max(time.time() - self._started, 1e-9)
+        lines = []
+        with self._lock:
+            for server in self.servers:
+                average = server.seconds / server.requests if server.requests else 0.0
+                lines.append(
+                    "%s: %d requests, %d ok, %d errors, %d busy (503), %.2f documents/s, %.2f s/request%s"
+                    % (server.url, server.requests, server.successes, server.errors, server.busy,
+                       server.successes / elapsed, average, "" if server.healthy else " [ejected]")
+                )
+        return lines
@@ -1,10 +1,93 @@
 import os
-import subprocess
+import re
+import json
+import hashlib
+import tempfile
 import xml.etree.ElementTree as ET
 import glob
 import threading
 import time
 import sys
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import ExitStack
+from urllib.parse import quote
+
+try:
+    from grobid_client.grobid_client import GrobidClient
+except ImportError:
+    from .grobid_client.grobid_client import GrobidClient
+
+TEI_NS = '{http://www.tei-c.org/ns/1.0}'
+XML_ID = '{http://www.w3.org/XML/1998/namespace}id'
+
+# 正文暂存文件保存在内存中的上限，超出后写入磁盘
+BODY_SPOOL_SIZE = 4 * 1024 * 1024
+
+# 暂存记录的分隔符和引用占位符，这些控制字符不会出现在XML文本中
+_RECORD_END = '\x1e'
+_DEFERRED_REF = re.compile('\x00([^\x01]*)\x01([^\x02]*)\x02')
+
+RECORDS_SUFFIX = ".jsonl"
+
+# 从处理后的XML读取章节标题时会去除其中的标记，JSONL记录与之保持一致
+_MARKUP = re.compile(r'<[^>]*>')
+
+# 参考文献表模式：正文中的引用写为 <ref key="键">原始引用文本</ref>
+REFERENCE_TABLE_FILE = "references.json"
+_REF_KEY = re.compile(r'<ref key="([^"]*)">(.*?)</ref>', re.DOTALL)
+
+
+def parse_file_name_metadata(file_name):
+    """
+    从 "期刊 - 年份 - 作者 标题" 形式的文件名中提取元数据，
+    与 embed.xml_text_extractor.parse_file_name_metadata 相同
+    
+    参数:
+        file_name: 文件名
+        
+    返回:
+        dict: 元数据（journal、year、author、title），文件名不符合格式时为空
+    """
+    metadata = {}
+    if " - " in file_name:
+        parts = file_name.split(" - ")
+        if len(parts) >= 3:
+            metadata["journal"] = parts[0].strip()
+            metadata["year"] = parts[1].strip()
+            metadata["author"] = parts[2].split(" ")[0].strip()
+            metadata["title"] = " ".join(parts[2:]).split(".")[0].strip()
+    return metadata
+
+
+def _process_xml_task(settings, xml_file, output_file, records_file=None):
+    """
+    在工作进程中处理单个XML文件
+    
+    参数:
+        settings: 处理参数，见 GrobidProcessor._xml_settings
+        xml_file: 输入XML文件路径
+        output_file: 输出文件路径，为None时不输出XML
+        records_file: JSONL记录文件路径，为None时不输出记录
+        
+    返回:
+        tuple: (处理是否成功, 处理过程中的日志消息列表, 参考文献表条目)，
+            未使用参考文献表时条目为None
+    """
+    messages = []
+    processor = GrobidProcessor(logger=messages.append)
+    processor.use_ascii_only = settings["use_ascii_only"]
+    processor.min_paragraph_length = settings["min_paragraph_length"]
+    if settings["reference_table"]:
+        # 工作进程只收集本文件的条目，由主进程合并到语料级参考文献表
+        processor.reference_table = ReferenceTable()
+    try:
+        success = processor.process_single_xml(xml_file, output_file, records_file)
+    except Exception as e:
+        messages.append(f"处理 {os.path.basename(xml_file)} 时出错: {str(e)}")
+        success = False
+    entries = processor.reference_table.entries if processor.reference_table is not None else None
+    return success, messages, entries
+
 
 class GrobidProcessor:
     def __init__(self, logger=None):
@@ -21,12 +104,23 @@ class GrobidProcessor:
         # 处理状态
         self.processing = False
         
+        # 最近一次批量处理的结果，见 run_grobid_processing
+        self.results = None
+        
         # 日志函数
         self.logger = logger if logger else print
         
         # 段落长度阈值，小于此值的段落将被删除
         self.min_paragraph_length = 150
         
+        # XML后处理参数，process_batch 会覆盖
+        self.use_ascii_only = True
+        self.xml_workers = 1
+        self.records_output_path = None
+        
+        # 语料级参考文献表，为None时引用处内联完整的参考文献
+        self.reference_table = None
+        
     def log(self, message):
         """输出日志"""
         self.logger(message)
@@ -34,20 +128,29 @@ class GrobidProcessor:
     def process_batch(self, input_path, output_path, final_output_path, 
                       grobid_client="grobid_client", concurrency=300,
                       include_raw_citations=True, segment_sentences=True,
-                      use_ascii_only=True, min_paragraph_length=150):
+                      use_ascii_only=True, min_paragraph_length=150,
+                      xml_workers=1, records_output_path=None,
+                      reference_table_path=None):
         """
         批量处理PDF文件
         
         参数:
             input_path: PDF输入文件夹路径
             output_path: XML输出文件夹路径
-            final_output_path: 最终处理结果输出文件夹路径
-            grobid_client: GROBID客户端路径
+            final_output_path: 最终处理结果输出文件夹路径，提供 records_output_path 时
+                可以为None，不输出处理后的XML
+            grobid_client: 已不再使用，GROBID改为在进程内调用，保留此参数以兼容旧调用
             concurrency: 并发数
             include_raw_citations: 是否保留原始引用
             segment_sentences: 是否进行句子分割
             use_ascii_only: 是否只使用ASCII字符(删除非ASCII字符)
             min_paragraph_length: 段落最小长度阈值，小于此值的段落将被删除
+            xml_workers: XML后处理的工作进程数，1表示在当前进程中处理
+            records_output_path: JSONL记录输出文件夹路径，每个文件输出一个文档记录和
+                各段落记录，嵌入阶段可直接读取而无需再解析XML；为None时不输出
+            reference_table_path: 参考文献表文件路径。提供时所有文件的参考文献按DOI
+                或规范化标题去重后写入此文件，正文中只保留引用键，可用
+                ReferenceTable.expand 还原；文件已存在时在其基础上合并
             
         返回:
             bool: 处理是否成功
@@ -61,13 +164,15 @@ class GrobidProcessor:
             self.log("错误：请提供XML输出文件夹")
             return False
         
-        if not final_output_path:
+        if not final_output_path and not records_output_path:
             self.log("错误：请提供处理后文件输出文件夹")
             return False
         
         # 创建输出目录（如果不存在）
         os.makedirs(output_path, exist_ok=True)
-        os.makedirs(final_output_path, exist_ok=True)
+        for path in (final_output_path, records_output_path):
+            if path:
+                os.makedirs(path, exist_ok=True)
         
         # 设置处理参数
         self.grobid_client = grobid_client
@@ -76,23 +181,22 @@ class GrobidProcessor:
         self.segment_sentences = segment_sentences
         self.use_ascii_only = use_ascii_only
         self.min_paragraph_length = min_paragraph_length
+        self.xml_workers = xml_workers
+        self.records_output_path = records_output_path
+        self.reference_table = ReferenceTable(reference_table_path) if reference_table_path else None
         
         # 设置处理状态
         self.processing = True
         
         try:
-            # 第一步：使用GROBID处理PDF文件
-            self.log("=== 步骤1：使用GROBID处理PDF文件 ===")
-            self.run_grobid_processing(input_path, output_path)
+            # GROBID处理PDF与XML后处理重叠进行：每个TEI结果返回后立即处理
+            self.log("=== 使用GROBID处理PDF文件并处理生成的XML文件 ===")
+            self.results = self.run_grobid_processing(input_path, output_path, final_output_path)
             
             if not self.processing:
                 self.log("处理已停止")
                 return False
             
-            # 第二步：处理生成的XML文件
-            self.log("\n=== 步骤2：处理生成的XML文件 ===")
-            self.process_xml_files(output_path, final_output_path)
-            
             self.log("\n处理完成！")
             return True
         except Exception as e:
@@ -100,6 +204,7 @@ class GrobidProcessor:
             return False
         finally:
             self.processing = False
+            self.save_reference_table()
     
     def stop_processing(self):
         """停止处理"""
@@ -107,77 +212,125 @@ class GrobidProcessor:
             self.processing = False
             self.log("正在停止处理...")
     
-    def run_grobid_processing(self, input_path, output_path):
+    def run_grobid_processing(self, input_path, output_path, final_output_path=None):
         """
-        运行GROBID处理PDF文件
+        在进程内调用GrobidClient处理PDF文件
+        
+        每个PDF的TEI结果写入 output_path 后立即进行XML后处理并保存到
+        final_output_path，两个步骤重叠进行，不必等待全部PDF处理完毕。
+        已存在TEI文件而被跳过的PDF，在GROBID处理结束后补做XML后处理。
+        xml_workers 大于1时，XML后处理分给进程池中的工作进程。
+        设置了 records_output_path 时同时输出JSONL记录。
         
         参数:
             input_path: PDF输入文件夹路径
             output_path: XML输出文件夹路径
+            final_output_path: 最终处理结果输出文件夹路径，为None且没有设置
+                records_output_path 时只运行GROBID
+        
+        返回:
+            dict: 处理结果，包含 processed（处理成功的PDF）、failed（GROBID处理失败的
+                PDF及状态码）和 xml_failed（XML后处理失败的TEI文件）
         """
-        # 构建命令
-        cmd = [
-            self.grobid_client,
-            "--input", input_path,
-            "--output", output_path,
-            "--n", str(self.concurrency)
-        ]
+        results = {"processed": [], "failed": [], "xml_failed": []}
+        handled = set()
+        post_process = bool(final_output_path or self.records_output_path)
         
-        # 添加选项
-        if self.include_raw_citations:
-            cmd.append("--include_raw_citations")
+        # config.json 位于与 grobid_processor.py 相同的目录
+        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+        self.log(f"使用GROBID配置文件: {config_path}")
         
-        if self.segment_sentences:
-            cmd.append("--segmentSentences")
+        executor = self._create_xml_executor(self.xml_workers if post_process else 1)
+        pending = {}
         
-        # 添加service参数（必需）
-        cmd.append("processFulltextDocument")
+        # GrobidClient 的构造（例如服务器不可用）或GROBID处理出错时，进程池同样需要关闭
+        try:
+            with GrobidClient(config_path=config_path) as client:
+                files = client.iter_process(
+                    "processFulltextDocument",
+                    input_path,
+                    output=output_path,
+                    n=self.concurrency,
+                    include_raw_citations=self.include_raw_citations,
+                    segment_sentences=self.segment_sentences,
+                    force=False
+                )
+                try:
+                    for input_file, status, text, xml_file in files:
+                        if not self.processing:
+                            break
         
-        self.log(f"执行命令: {' '.join(cmd)}")
+                        name = os.path.basename(input_file)
+                        if status != 200 or xml_file is None:
+                            self.log(f"GROBID处理失败 ({status}): {name}")
+                            results["failed"].append((input_file, status))
+                            continue
         
-        # 确定 grobid_client_python 目录作为工作目录
-        # 假设 config.json 位于与 grobid_processor.py 相同的目录
-        process_cwd = os.path.dirname(os.path.abspath(__file__))
-        self.log(f"设置 grobid_client 工作目录为: {process_cwd}")
-
-        # 执行命令
-        try:
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1,
-                cwd=process_cwd  # 设置子进程的工作目录
-            )
-            
-            # 实时读取输出
-            for line in iter(process.stdout.readline, ''):
-                if not self.processing:
-                    process.terminate()
-                    break
-                self.log(line.strip())
-            
-            process.stdout.close()
-            return_code = process.wait()
+                        results["processed"].append(input_file)
+                        self.log(f"GROBID处理完成 ({len(results['processed'])}): {name}")
+        
+                        if post_process:
+                            handled.add(os.path.abspath(xml_file))
+                            results["xml_failed"] += self._submit_xml_file(
+                                executor, pending, xml_file, final_output_path)
+                finally:
+                    # 提前停止时关闭生成器，GrobidClient随之停止所有工作线程
+                    files.close()
             
-            if return_code != 0 and self.processing:
-                self.log(f"GROBID处理返回错误码: {return_code}")
+            # 补做已存在而被跳过的TEI文件
+            if post_process and self.processing:
+                remaining = [xml_file for xml_file in glob.glob(os.path.join(output_path, "*.xml"))
+                             if os.path.abspath(xml_file) not in handled]
+                if remaining:
+                    self.log(f"处理 {len(remaining)} 个已存在的XML文件")
+                for xml_file in remaining:
+                    if not self.processing:
+                        break
+                    results["xml_failed"] += self._submit_xml_file(
+                        executor, pending, xml_file, final_output_path)
             
-        except Exception as e:
-            self.log(f"执行GROBID命令时出错: {str(e)}")
+            results["xml_failed"] += self._collect_xml_results(pending)
+        finally:
+            self._shutdown_xml_executor(executor, pending)
+        
+        self.log(f"GROBID处理成功 {len(results['processed'])} 个文件，失败 {len(results['failed'])} 个文件")
+        for input_file, status in results["failed"]:
+            self.log(f"  失败: {input_file} (状态码 {status})")
+        if results["xml_failed"]:
+            self.log(f"XML后处理失败 {len(results['xml_failed'])} 个文件")
+        
+        return results
+    
+    def save_reference_table(self):
+        """保存参考文献表，没有使用参考文献表时不做任何事"""
+        if self.reference_table is None or not self.reference_table.path:
+            return
+        try:
+            self.reference_table.save()
+            self.log(f"参考文献表已保存到: {self.reference_table.path} ({len(self.reference_table)} 条)")
+        except OSError as e:
+            self.log(f"保存参考文献表时出错: {str(e)}")
     
     def convert_to_ascii(self, text):
         """将文本转换为ASCII，删除所有非ASCII字符"""
         return ''.join(char for char in text if ord(char) < 128)
     
-    def process_xml_files(self, xml_dir, output_dir):
+    def process_xml_files(self, xml_dir, output_dir, workers=None):
         """
         处理生成的XML文件
         
+        workers 大于1时，文件分给进程池中的工作进程并行处理，每个文件的结果
+        在完成后记录到日志；输出文件与串行处理相同。
+        使用参考文献表时，各文件的条目合并到 self.reference_table，由调用者
+        通过 save_reference_table 保存。
+        
         参数:
             xml_dir: XML文件夹路径
-            output_dir: 输出文件夹路径
+            output_dir: 输出文件夹路径，为None时只输出 records_output_path 中的JSONL记录
+            workers: 工作进程数，默认使用 self.xml_workers
+            
+        返回:
+            list: 处理失败的XML文件
         """
         # 获取所有XML文件
         xml_files = glob.glob(os.path.join(xml_dir, "*.xml"))
@@ -185,105 +338,338 @@ class GrobidProcessor:
         
         if total_files == 0:
             self.log("没有找到XML文件进行处理")
-            return
+            return []
         
         self.log(f"找到 {total_files} 个XML文件需要处理")
         
-        # 处理每个XML文件
-        for i, xml_file in enumerate(xml_files):
-            if not self.processing:
-                break
+        failed = []
+        executor = self._create_xml_executor(workers or self.xml_workers)
+        pending = {}
+        try:
+            # 处理每个XML文件
+            for i, xml_file in enumerate(xml_files):
+                if not self.processing:
+                    break
+                
+                if executor is None:
+                    self.log(f"处理文件 ({i+1}/{total_files}): {os.path.basename(xml_file)}")
+                failed += self._submit_xml_file(executor, pending, xml_file, output_dir)
             
-            try:
+            failed += self._collect_xml_results(pending)
+        finally:
+            self._shutdown_xml_executor(executor, pending)
+        
+        return failed
+    
+    def _output_files(self, xml_file, output_dir):
+        """
+        XML文件对应的输出文件
+        
+        返回:
+            tuple: (处理后的XML文件路径, JSONL记录文件路径)，不输出的为None
+        """
+        base_name = os.path.basename(xml_file)
+        output_file = os.path.join(output_dir, base_name) if output_dir else None
+        records_file = None
+        if self.records_output_path:
+            records_file = os.path.join(self.records_output_path,
+                                        os.path.splitext(base_name)[0] + RECORDS_SUFFIX)
+        return output_file, records_file
+    
+    def _xml_settings(self):
+        """传给工作进程的XML后处理参数"""
+        return {
+            "use_ascii_only": self.use_ascii_only,
+            "min_paragraph_length": self.min_paragraph_length,
+            "reference_table": self.reference_table is not None,
+        }
+    
+    def _create_xml_executor(self, workers):
+        """workers大于1时创建XML后处理进程池，否则返回None"""
+        if not workers or workers <= 1:
+            return None
+        self.log(f"使用 {workers} 个工作进程处理XML文件")
+        self._xml_max_pending = workers * 4
+        return ProcessPoolExecutor(max_workers=workers)
+    
+    def _submit_xml_file(self, executor, pending, xml_file, output_dir):
+        """
+        处理一个XML文件：没有进程池时直接处理，否则提交到进程池
+        
+        同时提交的任务数不超过工作进程数的4倍，超出时等待已提交的任务完成。
+        
+        参数:
+            executor: 进程池，None表示在当前进程中处理
+            pending: 未完成的任务，future到XML文件路径的映射
+            xml_file: XML文件路径
+            output_dir: 输出文件夹路径
+            
+        返回:
+            list: 本次调用中确认处理失败的XML文件
+        """
+        if executor is None:
+            return [] if self._process_xml_file(xml_file, output_dir) else [xml_file]
+        
+        output_file, records_file = self._output_files(xml_file, output_dir)
+        future = executor.submit(_process_xml_task, self._xml_settings(), xml_file,
+                                 output_file, records_file)
+        pending[future] = xml_file
+        return self._collect_xml_results(pending, self._xml_max_pending)
+    
+    def _collect_xml_results(self, pending, max_pending=0):
+        """
+        记录已完成任务的结果，并等待到未完成的任务数不超过 max_pending
+        
+        参数:
+            pending: 未完成的任务，future到XML文件路径的映射
+            max_pending: 允许保留的未完成任务数，0表示等待全部完成
+            
+        返回:
+            list: 处理失败的XML文件
+        """
+        failed = []
+        while pending:
+            done = [future for future in pending if future.done()]
+            if not done:
+                if len(pending) <= max_pending or not self.processing:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                xml_file = pending.pop(future)
                 base_name = os.path.basename(xml_file)
-                output_file = os.path.join(output_dir, base_name)
-                
-                self.log(f"处理文件 ({i+1}/{total_files}): {base_name}")
-                success = self.process_single_xml(xml_file, output_file)
+                try:
+                    success, messages, entries = future.result()
+                except Exception as e:
+                    success, messages, entries = False, [f"处理 {base_name} 时出错: {str(e)}"], None
                 
+                for message in messages:
+                    self.log(message)
+                if entries and self.reference_table is not None:
+                    self.reference_table.update(entries)
                 if success:
-                    self.log(f"成功处理并保存到: {output_file}")
+                    self.log(f"成功处理: {base_name}")
                 else:
                     self.log(f"处理文件失败: {base_name}")
-                
-            except Exception as e:
-                self.log(f"处理 {os.path.basename(xml_file)} 时出错: {str(e)}")
+                    failed.append(xml_file)
+        return failed
+    
+    def _shutdown_xml_executor(self, executor, pending):
+        """关闭进程池，处理已停止时取消尚未开始的任务"""
+        if executor is None:
+            return
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
     
-    def process_single_xml(self, input_file, output_file):
+    def _process_xml_file(self, xml_file, output_dir):
         """
-        处理单个XML文件
+        处理单个XML文件并保存到输出文件夹，出错时只记录日志
         
         参数:
-            input_file: 输入XML文件路径
-            output_file: 输出文件路径
+            xml_file: XML文件路径
+            output_dir: 输出文件夹路径
             
         返回:
             bool: 处理是否成功
         """
-        # 解析XML文件
+        base_name = os.path.basename(xml_file)
+        output_file, records_file = self._output_files(xml_file, output_dir)
         try:
-            tree = ET.parse(input_file)
-            root = tree.getroot()
+            success = self.process_single_xml(xml_file, output_file, records_file)
         except Exception as e:
-            self.log(f"解析XML错误: {str(e)}")
+            self.log(f"处理 {base_name} 时出错: {str(e)}")
             return False
         
-        # 提取标题
-        title_text = self.extract_title(root)
-        
-        # 提取摘要
-        abstract_text = self.extract_abstract(root)
+        if success:
+            self.log(f"成功处理并保存到: {output_file or records_file}")
+        else:
+            self.log(f"处理文件失败: {base_name}")
+        return success
+    
+    def process_single_xml(self, input_file, output_file, records_file=None):
+        """
+        处理单个XML文件
         
-        # 提取参考文献信息
-        self.references = {}
-        self.extract_bibliography(root)
+        使用增量解析只遍历一次TEI：标题、摘要、参考文献条目和正文div在各自的
+        元素结束时处理，处理完的元素随即从树中移除，内存占用不随文档长度增长。
+        正文在文末的参考文献之前，其中的引用先以占位符写入暂存文件（较小时保存在
+        内存中），解析结束后再替换为参考文献并写入输出文件。
         
-        # 查找正文
-        body = root.find(".//tei:body", self.xml_namespace)
-        if body is None:
-            self.log("找不到正文元素")
-            return False
+        提供 records_file 时，同时将标题、摘要和保留的段落写为JSONL记录：第一行为
+        文档记录，其后每行一个段落记录，包含章节标题、段落序号和文件元数据，
+        与从处理后的XML中提取的内容相同。
         
-        # 处理正文中的引用
-        processed_body = self.process_references_in_text(body)
+        设置了 self.reference_table 时，参考文献加入参考文献表，正文中的引用写为
+        <ref key="键">原始引用文本</ref>；段落长度仍按内联参考文献后的文本判断，
+        两种模式保留的段落相同。
         
-        # 提取并组合div内容
-        all_divs_content = ""
-        for div in processed_body.findall("tei:div", self.xml_namespace):
-            div_text = self.serialize_div(div)
-            all_divs_content += div_text # 不需要额外的换行，serialize_div已处理
+        参数:
+            input_file: 输入XML文件路径
+            output_file: 输出文件路径，为None时不输出XML
+            records_file: JSONL记录文件路径，为None时不输出记录
+            
+        返回:
+            bool: 处理是否成功
+        """
+        # 清空上一个文件的参考文献，摘要中的引用不能使用其他文件的条目
+        self.references = {}
+        references = {}
+        keys = {}  # 参考文献ID到参考文献表键的映射
         
-        # 如果选择了只使用ASCII编码，则转换内容
-        if self.use_ascii_only:
-            # 转换为ASCII并删除非ASCII字符
-            self.log("正在转换为ASCII编码并删除非ASCII字符...")
-            title_text = self.convert_to_ascii(title_text)
-            abstract_text = self.convert_to_ascii(abstract_text)
-            all_divs_content = self.convert_to_ascii(all_divs_content)
-            xml_declaration = '<?xml version="1.0" encoding="ASCII"?>\n'
-        else:
-            xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
+        title_text = None
+        abstract_text = ""
+        abstract_div = None
+        body = None
+        kept = None  # 需要保留子元素的子树：摘要div、正文div或参考文献条目
+        stack = []
         
-        # 保存到输出文件，并添加根元素
-        encoding = 'ascii' if self.use_ascii_only else 'utf-8'
-        with open(output_file, 'w', encoding=encoding) as f:
-            f.write(xml_declaration) # 添加XML声明
-            f.write('<document>\n') # 写入根元素开始标签
+        with tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_SIZE, mode='w+',
+                                           encoding='utf-8', newline='') as spool:
+            # 解析XML文件
+            try:
+                for event, elem in ET.iterparse(input_file, events=("start", "end")):
+                    if event == "start":
+                        stack.append(elem)
+                        parent = stack[-2] if len(stack) > 1 else None
+                        
+                        if elem.tag == TEI_NS + "body" and body is None and parent is not None:
+                            body = elem
+                        elif (elem.tag == TEI_NS + "div" and abstract_div is None and len(stack) >= 4
+                              and parent.tag == TEI_NS + "abstract"
+                              and stack[-3].tag == TEI_NS + "profileDesc"):
+                            abstract_div = elem
+                        
+                        if kept is None and (
+                            elem is abstract_div
+                            or (elem.tag == TEI_NS + "div" and body is not None and parent is body)
+                            or (elem.tag == TEI_NS + "biblStruct" and len(stack) >= 3
+                                and parent.tag == TEI_NS + "listBibl")
+                        ):
+                            kept = elem
+                        continue
+                    
+                    stack.pop()
+                    parent = stack[-1] if stack else None
+                    
+                    # 提取标题
+                    if (title_text is None and elem.tag == TEI_NS + "title" and len(stack) >= 3
+                            and parent.tag == TEI_NS + "titleStmt" and stack[-2].tag == TEI_NS + "fileDesc"
+                            and elem.get('level') == 'a' and elem.get('type') == 'main'):
+                        title_text = elem.text.strip() if elem.text else ""
+                    
+                    # 提取摘要
+                    elif elem is abstract_div:
+                        abstract_text = self.extract_abstract_div(elem)
+                    
+                    # 提取参考文献信息
+                    elif elem.tag == TEI_NS + "biblStruct" and len(stack) >= 2 and parent.tag == TEI_NS + "listBibl":
+                        ref_id, formatted_ref = self.format_reference(elem)
+                        references[ref_id] = formatted_ref
+                        if self.reference_table is not None and formatted_ref:
+                            keys[ref_id] = self.reference_table.add(
+                                formatted_ref,
+                                doi=self.find_text(elem, ".//tei:idno[@type='DOI']"),
+                                title=self.find_text(elem, ".//tei:title[@level='a']")
+                            )
+                    
+                    # 正文div暂存，引用留待参考文献解析后替换
+                    elif elem.tag == TEI_NS + "div" and body is not None and parent is body:
+                        self._spool_div(elem, spool)
+                    
+                    if elem is kept:
+                        kept = None
+                    if kept is None and parent is not None:
+                        parent.remove(elem)
+            except (ET.ParseError, OSError) as e:
+                self.log(f"解析XML错误: {str(e)}")
+                return False
+            
+            self.references = references
+            
+            if body is None:
+                self.log("找不到正文元素")
+                return False
             
-            # 写入标题
-            if title_text:
-                f.write(f'<title level="a" type="main">{title_text}</title>\n')
+            title_text = title_text or ""
             
-            # 写入摘要
-            if abstract_text:
-                f.write(f'<abstract>{abstract_text}</abstract>\n')
+            # 如果选择了只使用ASCII编码，则转换内容（正文在暂存时已转换）
+            if self.use_ascii_only:
+                # 转换为ASCII并删除非ASCII字符
+                self.log("正在转换为ASCII编码并删除非ASCII字符...")
+                title_text = self.convert_to_ascii(title_text)
+                abstract_text = self.convert_to_ascii(abstract_text)
+                xml_declaration = '<?xml version="1.0" encoding="ASCII"?>\n'
+            else:
+                xml_declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
+            
+            # 保存到输出文件，并添加根元素
+            encoding = 'ascii' if self.use_ascii_only else 'utf-8'
+            spool.seek(0)
+            with ExitStack() as files:
+                f = files.enter_context(open(output_file, 'w', encoding=encoding)) if output_file else None
+                records = None
+                if records_file:
+                    records = _RecordWriter(files.enter_context(open(records_file, 'w', encoding='utf-8')),
+                                            os.path.basename(input_file))
+                    records.document(title_text, abstract_text)
+                
+                if f:
+                    f.write(xml_declaration) # 添加XML声明
+                    f.write('<document>\n') # 写入根元素开始标签
+                    
+                    # 写入标题
+                    if title_text:
+                        f.write(f'<title level="a" type="main">{title_text}</title>\n')
+                    
+                    # 写入摘要
+                    if abstract_text:
+                        f.write(f'<abstract>{abstract_text}</abstract>\n')
+                    
+                # 写入正文内容，替换引用后再判断段落长度
+                for kind, text in self._read_spool(spool):
+                    if kind == "h":
+                        if f:
+                            f.write(f"<h1>{text}</h1>\n")
+                        if records:
+                            records.section = " ".join(_MARKUP.sub("", text).split())
+                        continue
+                    
+                    p_text = self.resolve_references(text, references)
+                    compact_text = self.resolve_references(text, references, keys) if keys else None
+                    p_text = self.clean_paragraph(p_text, compact_text)
+                    if p_text is None:
+                        continue
+                    if f:
+                        f.write(f"<p>{p_text}</p>\n")
+                    if records:
+                        records.paragraph(p_text)
                 
-            # 写入正文内容
-            f.write(all_divs_content)
-            f.write('</document>\n') # 写入根元素结束标签
+                if f:
+                    f.write('</document>\n') # 写入根元素结束标签
         
         return True
     
+    def _spool_div(self, div, spool):
+        """将正文div的标题和段落写入暂存文件，引用以占位符表示"""
+        head_text = self.head_text(div)
+        if head_text is not None:
+            spool.write("h" + head_text + _RECORD_END)
+        for p in div.findall("tei:p", self.xml_namespace):
+            spool.write("p" + self.get_element_text(p, self._deferred_ref_text) + _RECORD_END)
+    
+    def _read_spool(self, spool):
+        """逐条读取暂存记录，返回 (类型, 内容) 的迭代器"""
+        pending = ""
+        while True:
+            chunk = spool.read(1024 * 1024)
+            if not chunk:
+                break
+            records = (pending + chunk).split(_RECORD_END)
+            pending = records.pop()
+            for record in records:
+                yield record[0], record[1:]
+    
     def extract_title(self, root):
         """提取文档标题"""
         try:
@@ -296,11 +682,14 @@ class GrobidProcessor:
     
     def extract_abstract(self, root):
         """提取并处理摘要文本，去除type='figure'的内容"""
+        abstract_div = root.find(".//tei:profileDesc/tei:abstract/tei:div", self.xml_namespace)
+        if abstract_div is None:
+            return ""
+        return self.extract_abstract_div(abstract_div)
+    
+    def extract_abstract_div(self, abstract_div):
+        """提取摘要div的文本，去除type='figure'的内容"""
         try:
-            abstract_div = root.find(".//tei:profileDesc/tei:abstract/tei:div", self.xml_namespace)
-            if abstract_div is None:
-                return ""
-            
             abstract_text = ""
             for p in abstract_div.findall(".//tei:p", self.xml_namespace):
                 # 处理段落内容，跳过带有type="figure"属性的内容
@@ -338,85 +727,101 @@ class GrobidProcessor:
         bib_structs = root.findall(".//tei:listBibl/tei:biblStruct", self.xml_namespace)
         
         for bib in bib_structs:
-            ref_id = bib.get('{http://www.w3.org/XML/1998/namespace}id')
+            ref_id, formatted_ref = self.format_reference(bib)
+            self.references[ref_id] = formatted_ref
+    
+    def find_text(self, element, path):
+        """子元素的文本，不存在或为空时返回空字符串"""
+        child = element.find(path, self.xml_namespace)
+        return child.text if child is not None and child.text else ""
+    
+    def format_reference(self, bib):
+        """
+        格式化一条参考文献
+        
+        参数:
+            bib: biblStruct元素
             
-            # 提取作者
-            author_elements = bib.findall(".//tei:author/tei:persName", self.xml_namespace)
-            authors = []
+        返回:
+            tuple: (参考文献ID, 格式化引用)
+        """
+        ref_id = bib.get(XML_ID)
+        
+        # 提取作者
+        author_elements = bib.findall(".//tei:author/tei:persName", self.xml_namespace)
+        authors = []
+        
+        for author in author_elements:
+            forename = author.find("tei:forename", self.xml_namespace)
+            surname = author.find("tei:surname", self.xml_namespace)
             
-            for author in author_elements:
-                forename = author.find("tei:forename", self.xml_namespace)
-                surname = author.find("tei:surname", self.xml_namespace)
-                
-                if forename is not None and surname is not None:
-                    forename_text = forename.text if forename.text else ""
-                    surname_text = surname.text if surname.text else ""
-                    authors.append(f"{surname_text}, {forename_text}")
-            
-            # 提取标题
-            title = bib.find(".//tei:title[@level='a']", self.xml_namespace)
-            title_text = title.text if title is not None and title.text else ""
-            
-            # 提取期刊名称
-            journal = bib.find(".//tei:title[@level='j']", self.xml_namespace)
-            journal_text = journal.text if journal is not None and journal.text else ""
-            
-            # 提取年份
-            year = bib.find(".//tei:date[@type='published']", self.xml_namespace)
-            year_text = year.get('when') if year is not None and year.get('when') else ""
-            
-            # 提取卷号
-            volume = bib.find(".//tei:biblScope[@unit='volume']", self.xml_namespace)
-            volume_text = volume.text if volume is not None and volume.text else ""
-            
-            # 提取期号
-            issue = bib.find(".//tei:biblScope[@unit='issue']", self.xml_namespace)
-            issue_text = issue.text if issue is not None and issue.text else ""
-            
-            # 提取页码
-            page = bib.find(".//tei:biblScope[@unit='page']", self.xml_namespace)
-            page_text = ""
-            if page is not None:
-                if page.text:
-                    page_text = page.text
-                elif page.get('from') and page.get('to'):
-                    page_text = f"{page.get('from')}-{page.get('to')}"
-                    
-            # 提取DOI
-            doi = bib.find(".//tei:idno[@type='DOI']", self.xml_namespace)
-            doi_text = doi.text if doi is not None and doi.text else ""
-            
-            # 构建格式化引用
-            formatted_ref = ""
-            if authors:
-                formatted_ref += " and ".join(authors) + ". "
-            if title_text:
-                formatted_ref += f"{title_text}. "
-            if journal_text:
-                formatted_ref += f"{journal_text}. "
-            if year_text:
-                formatted_ref += f"{year_text};"
-            if volume_text:
-                formatted_ref += f"{volume_text}"
-            if issue_text:
-                formatted_ref += f"({issue_text})"
-            if page_text:
-                formatted_ref += f":{page_text}. "
-            if doi_text:
-                formatted_ref += f"doi:{doi_text}"
-                
-            # 如果选择了只使用ASCII编码，则在这里也转换引用文本
-            if self.use_ascii_only:
-                formatted_ref = self.convert_to_ascii(formatted_ref)
+            if forename is not None and surname is not None:
+                forename_text = forename.text if forename.text else ""
+                surname_text = surname.text if surname.text else ""
+                authors.append(f"{surname_text}, {forename_text}")
+        
+        # 提取标题
+        title = bib.find(".//tei:title[@level='a']", self.xml_namespace)
+        title_text = title.text if title is not None and title.text else ""
+        
+        # 提取期刊名称
+        journal = bib.find(".//tei:title[@level='j']", self.xml_namespace)
+        journal_text = journal.text if journal is not None and journal.text else ""
+        
+        # 提取年份
+        year = bib.find(".//tei:date[@type='published']", self.xml_namespace)
+        year_text = year.get('when') if year is not None and year.get('when') else ""
+        
+        # 提取卷号
+        volume = bib.find(".//tei:biblScope[@unit='volume']", self.xml_namespace)
+        volume_text = volume.text if volume is not None and volume.text else ""
+        
+        # 提取期号
+        issue = bib.find(".//tei:biblScope[@unit='issue']", self.xml_namespace)
+        issue_text = issue.text if issue is not None and issue.text else ""
+        
+        # 提取页码
+        page = bib.find(".//tei:biblScope[@unit='page']", self.xml_namespace)
+        page_text = ""
+        if page is not None:
+            if page.text:
+                page_text = page.text
+            elif page.get('from') and page.get('to'):
+                page_text = f"{page.get('from')}-{page.get('to')}"
                 
-            self.references[ref_id] = formatted_ref.strip()
+        # 提取DOI
+        doi = bib.find(".//tei:idno[@type='DOI']", self.xml_namespace)
+        doi_text = doi.text if doi is not None and doi.text else ""
+        
+        # 构建格式化引用
+        formatted_ref = ""
+        if authors:
+            formatted_ref += " and ".join(authors) + ". "
+        if title_text:
+            formatted_ref += f"{title_text}. "
+        if journal_text:
+            formatted_ref += f"{journal_text}. "
+        if year_text:
+            formatted_ref += f"{year_text};"
+        if volume_text:
+            formatted_ref += f"{volume_text}"
+        if issue_text:
+            formatted_ref += f"({issue_text})"
+        if page_text:
+            formatted_ref += f":{page_text}. "
+        if doi_text:
+            formatted_ref += f"doi:{doi_text}"
+            
+        # 如果选择了只使用ASCII编码，则在这里也转换引用文本
+        if self.use_ascii_only:
+            formatted_ref = self.convert_to_ascii(formatted_ref)
+            
+        return ref_id, formatted_ref.strip()
     
     def process_references_in_text(self, body_element):
         """替换文本中的引用标记为参考文献信息"""
         # 处理body中的所有div元素
         for div in body_element.findall(".//tei:div", self.xml_namespace):
-            div_content = ET.tostring(div, encoding='unicode', method='xml')
-            
             # 查找所有引用元素并替换
             ref_tags = div.findall(".//tei:ref[@type='bibr']", self.xml_namespace)
             
@@ -436,59 +841,304 @@ class GrobidProcessor:
     
     def serialize_div(self, div):
         """将div元素转换为文本，同时保留段落标记"""
-        div_text = ""
+        div_text = self.serialize_head(div)
+        
+        # 处理段落
+        for p in div.findall("tei:p", self.xml_namespace):
+            # 处理所有文本和嵌套元素
+            div_text += self.serialize_paragraph(self.get_element_text(p))
         
-        # 处理标题（如果存在）
+        return div_text
+    
+    def head_text(self, div):
+        """div的标题文本，没有标题时返回None"""
         head = div.find("tei:head", self.xml_namespace)
         if head is not None and head.text:
             head_text = head.text
             if self.use_ascii_only:
                 head_text = self.convert_to_ascii(head_text)
-            div_text += f"<h1>{head_text}</h1>\n"
+            return head_text
+        return None
+    
+    def serialize_head(self, div):
+        """将div的标题转换为 <h1> 标记，没有标题时返回空字符串"""
+        head_text = self.head_text(div)
+        return f"<h1>{head_text}</h1>\n" if head_text is not None else ""
+    
+    def clean_paragraph(self, p_text, compact_text=None):
+        """
+        转换段落文本的编码，小于长度阈值的段落返回None
         
-        # 处理段落
-        for p in div.findall("tei:p", self.xml_namespace):
-            # 处理所有文本和嵌套元素
-            p_text = self.get_element_text(p)
-            if self.use_ascii_only:
-                p_text = self.convert_to_ascii(p_text)
+        参数:
+            p_text: 段落文本
+            compact_text: 引用写为参考文献表键的同一段落，提供时按 p_text 判断长度，
+                返回转换后的 compact_text
             
-            # 判断段落长度，小于阈值的段落将被删除
-            if len(p_text) >= self.min_paragraph_length:
-                div_text += f"<p>{p_text}</p>\n"
-            else:
-                self.log(f"删除了长度为 {len(p_text)} 的短段落 (阈值: {self.min_paragraph_length})")
+        返回:
+            str: 转换后的段落文本，段落过短时为None
+        """
+        if self.use_ascii_only:
+            p_text = self.convert_to_ascii(p_text)
         
-        return div_text
+        # 判断段落长度，小于阈值的段落将被删除
+        if len(p_text) >= self.min_paragraph_length:
+            if compact_text is None:
+                return p_text
+            return self.convert_to_ascii(compact_text) if self.use_ascii_only else compact_text
+        self.log(f"删除了长度为 {len(p_text)} 的短段落 (阈值: {self.min_paragraph_length})")
+        return None
+    
+    def serialize_paragraph(self, p_text):
+        """将段落文本转换为 <p> 标记，小于长度阈值的段落返回空字符串"""
+        p_text = self.clean_paragraph(p_text)
+        return f"<p>{p_text}</p>\n" if p_text is not None else ""
     
-    def get_element_text(self, element):
-        """获取元素的文本内容，包括嵌套元素"""
+    def get_element_text(self, element, ref_text=None):
+        """
+        获取元素的文本内容，包括嵌套元素
+        
+        参数:
+            element: XML元素
+            ref_text: 将引用元素转换为文本的函数，默认按 self.references 替换
+            
+        返回:
+            str: 元素文本
+        """
+        ref_text = ref_text or self.ref_text
         text = element.text or ""
         
         for child in element:
             # 特殊处理引用标记
             if child.tag == f"{{{self.xml_namespace['tei']}}}ref" and child.get('type') == 'bibr':
-                target = child.get('target')
-                if target and target.startswith('#'):
-                    ref_id = target[1:]
-                    if ref_id in self.references:
-                        text += f"<ref>{self.references[ref_id]}</ref>"
-                    else:
-                        # 如果未找到引用，使用原始文本
-                        child_text = child.text or ""
-                        text += f"<ref>{child_text}</ref>"
-                else:
-                    child_text = child.text or ""
-                    text += f"<ref>{child_text}</ref>"
+                text += ref_text(child)
             else:
                 # 对于其他元素，递归获取文本
-                text += self.get_element_text(child)
+                text += self.get_element_text(child, ref_text)
             
             # 添加尾部文本（如果有）
             if child.tail:
                 text += child.tail
         
         return text
+    
+    def ref_text(self, ref):
+        """将引用元素替换为参考文献信息，未找到时使用原始文本"""
+        target = ref.get('target')
+        if target and target.startswith('#'):
+            ref_id = target[1:]
+            if ref_id in self.references:
+                return f"<ref>{self.references[ref_id]}</ref>"
+        return f"<ref>{ref.text or ''}</ref>"
+    
+    def _deferred_ref_text(self, ref):
+        """参考文献尚未解析时使用的占位符，由 resolve_references 替换"""
+        target = ref.get('target')
+        if target and target.startswith('#'):
+            return f"\x00{target[1:]}\x01{ref.text or ''}\x02"
+        return f"<ref>{ref.text or ''}</ref>"
+    
+    def resolve_references(self, text, references, keys=None):
+        """
+        将引用占位符替换为参考文献信息，未找到时使用原始文本
+        
+        参数:
+            text: 含引用占位符的文本
+            references: 参考文献ID到格式化引用的映射
+            keys: 可选的参考文献ID到参考文献表键的映射，其中的引用写为
+                <ref key="键">原始引用文本</ref>
+            
+        返回:
+            str: 替换后的文本
+        """
+        def replace(match):
+            ref_id = match.group(1)
+            if keys and ref_id in keys:
+                return f'<ref key="{keys[ref_id]}">{match.group(2)}</ref>'
+            return f"<ref>{references[ref_id] if ref_id in references else match.group(2)}</ref>"
+        return _DEFERRED_REF.sub(replace, text)
+
+class _RecordWriter:
+    """将一个文档的记录逐行写入JSONL文件"""
+    
+    def __init__(self, file, file_name):
+        self.file = file
+        self.file_name = file_name
+        self.metadata = parse_file_name_metadata(file_name)
+        self.section = ""
+        self.position = 0
+    
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def document(self, title, abstract):
+        """写入文档记录"""
+        self._write({
+            "type": "document",
+            "file_name": self.file_name,
+            "title": title.strip(),
+            "abstract": abstract.strip(),
+            "metadata": self.metadata
+        })
+    
+    def paragraph(self, content):
+        """写入段落记录，只含空白的段落不写入"""
+        if not content.strip():
+            return
+        self._write({
+            "type": "paragraph",
+            "paragraph_id": self.position,
+            "section": self.section,
+            "content": content,
+            "file_name": self.file_name,
+            "metadata": self.metadata
+        })
+        self.position += 1
+
+
+class ReferenceTable:
+    """
+    语料级参考文献表
+    
+    参考文献以DOI为键，没有DOI时以规范化标题的哈希为键（连标题也没有时使用格式化
+    引用的哈希），不同文件引用的同一文献只保存一次。正文中的引用写为
+    <ref key="键">原始引用文本</ref>，使用方可按需用 get 或 expand 取得完整引用。
+    """
+    
+    def __init__(self, path=None):
+        """
+        初始化参考文献表
+        
+        参数:
+            path: 参考文献表文件路径，文件已存在时加载其中的条目；为None时只保存在内存中
+        """
+        self.path = path
+        self.entries = {}  # 键到 {"citation", "doi", "title"} 的映射
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get("references", {})
+    
+    @classmethod
+    def load(cls, path):
+        """
+        加载参考文献表文件
+        
+        参数:
+            path: 参考文献表文件路径
+            
+        返回:
+            ReferenceTable: 参考文献表
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"参考文献表不存在: {path}")
+        return cls(path)
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __contains__(self, key):
+        return key in self.entries
+    
+    @staticmethod
+    def make_key(citation, doi="", title=""):
+        """
+        参考文献的键
+        
+        参数:
+            citation: 格式化引用
+            doi: DOI
+            title: 文献标题
+            
+        返回:
+            str: "doi:" 加小写DOI，或 "title:"/"citation:" 加规范化文本的SHA-1前16位
+        """
+        doi = doi.strip().lower()
+        if doi:
+            # 键写在属性中，引号和尖括号等字符需要转义
+            return "doi:" + quote(doi, safe="/:;()[]")
+        
+        for prefix, text in (("title", title), ("citation", citation)):
+            normalized = " ".join(re.findall(r"\w+", text.lower()))
+            if normalized:
+                return f"{prefix}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]}"
+        return None
+    
+    def add(self, citation, doi="", title=""):
+        """
+        加入一条参考文献
+        
+        同一个键已有条目时保留较长（信息较完整）的格式化引用，长度相同时取字典序
+        较小者，因此结果与文件的处理顺序无关。
+        
+        参数:
+            citation: 格式化引用
+            doi: DOI
+            title: 文献标题
+            
+        返回:
+            str: 参考文献的键，无法生成键时为None
+        """
+        key = self.make_key(citation, doi, title)
+        if key is not None:
+            self._merge(key, {"citation": citation, "doi": doi.strip(), "title": title.strip()})
+        return key
+    
+    def update(self, entries):
+        """
+        合并另一个参考文献表的条目，例如工作进程返回的条目
+        
+        参数:
+            entries: 键到条目的映射
+        """
+        for key, entry in entries.items():
+            self._merge(key, entry)
+    
+    def _merge(self, key, entry):
+        current = self.entries.get(key)
+        if current is None or ((-len(entry["citation"]), entry["citation"])
+                               < (-len(current["citation"]), current["citation"])):
+            self.entries[key] = entry
+    
+    def get(self, key, default=None):
+        """
+        键对应的格式化引用
+        
+        参数:
+            key: 参考文献的键
+            default: 键不存在时的返回值
+            
+        返回:
+            str: 格式化引用
+        """
+        entry = self.entries.get(key)
+        return entry["citation"] if entry is not None else default
+    
+    def expand(self, text):
+        """
+        将文本中的 <ref key="键">...</ref> 还原为内联完整参考文献的 <ref>...</ref>，
+        键不在表中时保留原始引用文本
+        
+        参数:
+            text: 含引用键的文本
+            
+        返回:
+            str: 还原后的文本，与不使用参考文献表时的输出相同
+        """
+        def replace(match):
+            return f"<ref>{self.get(match.group(1), match.group(2))}</ref>"
+        return _REF_KEY.sub(replace, text)
+    
+    def save(self, path=None):
+        """
+        保存参考文献表，先写入临时文件再替换，中断时不会留下不完整的文件
+        
+        参数:
+            path: 保存路径，默认为 self.path
+        """
+        path = path or self.path
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"references": self.entries}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(temp_path, path)
 
 # 示例用法
 if __name__ == "__main__":
@@ -498,13 +1148,16 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='GROBID PDF处理工具')
     parser.add_argument('--input', required=True, help='PDF输入文件夹路径')
     parser.add_argument('--output', required=True, help='XML输出文件夹路径')
-    parser.add_argument('--final_output', required=True, help='最终处理结果输出文件夹路径')
-    parser.add_argument('--grobid_client', default='grobid_client', help='GROBID客户端路径')
+    parser.add_argument('--final_output', help='最终处理结果输出文件夹路径')
+    parser.add_argument('--grobid_client', default='grobid_client', help='已不再使用，保留以兼容旧的命令行')
     parser.add_argument('--concurrency', type=int, default=300, help='并发数')
     parser.add_argument('--no_raw_citations', action='store_false', dest='include_raw_citations', help='不保留原始引用')
     parser.add_argument('--no_segment_sentences', action='store_false', dest='segment_sentences', help='不进行句子分割')
     parser.add_argument('--no_ascii_only', action='store_false', dest='use_ascii_only', help='使用UTF-8而非ASCII')
     parser.add_argument('--min_paragraph_length', type=int, default=150, help='段落最小长度阈值，小于此值的段落将被删除')
+    parser.add_argument('--xml_workers', type=int, default=1, help='XML后处理的工作进程数，1表示不使用进程池')
+    parser.add_argument('--records_output', help='JSONL记录输出文件夹路径，可供嵌入阶段直接读取')
+    parser.add_argument('--reference_table', help='参考文献表文件路径，提供时正文中只保留引用键')
     
     args = parser.parse_args()
     
@@ -519,7 +1172,10 @@ if __name__ == "__main__":
         include_raw_citations=args.include_raw_citations,
         segment_sentences=args.segment_sentences,
         use_ascii_only=args.use_ascii_only,
-        min_paragraph_length=args.min_paragraph_length
+        min_paragraph_length=args.min_paragraph_length,
+        xml_workers=args.xml_workers,
+        records_output_path=args.records_output,
+        reference_table_path=args.reference_table
     )
     
     sys.exit(0 if success else 1) 
\ No newline at end of file
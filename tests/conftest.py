@@ -0,0 +1,96 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+WORDS = ["tumour", "vessel", "naïve", "α-helix", "&amp;", "&lt;x&gt;", "data", "cells",
+         "growth", "μm", "thrombosis", "embolization", "vascular"]
+
+
+class TeiBuilder:
+    """生成结构多样但可复现的GROBID TEI文档，用于对比不同实现的输出"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def words(self, n):
+        return " ".join(self.rng.choice(WORDS) for _ in range(n))
+
+    def ref(self, bibl_count):
+        k = self.rng.random()
+        if k < 0.6:
+            return f'<ref type="bibr" target="#b{self.rng.randrange(bibl_count + 2)}">[{self.rng.randrange(50)}]</ref>'
+        if k < 0.7:
+            return f'<ref type="bibr">[{self.rng.randrange(9)}]<hi>x</hi></ref>'
+        if k < 0.85:
+            return f'<ref type="figure" target="#fig_1">Fig. {self.rng.randrange(9)}</ref>'
+        return '<ref type="table">T</ref>'
+
+    def paragraph(self, bibl_count, segmented):
+        parts = []
+        for _ in range(self.rng.randrange(1, 5)):
+            inner = f"{self.words(self.rng.randrange(0, 40))} {self.ref(bibl_count)} {self.words(self.rng.randrange(0, 8))}"
+            parts.append(f"<s>{inner}</s>" if segmented else inner)
+        return f'<p>{" ".join(parts)}</p>'
+
+    def bibl(self, document, index):
+        authors = "".join(
+            f'<author><persName><forename type="first">F{k}</forename><surname>S{k}</surname></persName></author>'
+            for k in range(self.rng.randrange(0, 4))
+        )
+        # 标题和DOI在整个语料中唯一，参考文献表中不会有不同引用共用一个键
+        title = f'<title level="a" type="main">T{document}.{index} {self.words(3)}</title>' if self.rng.random() < 0.8 else ''
+        doi = f'<idno type="DOI">10.1/{document}.{index}</idno>' if self.rng.random() < 0.5 else ''
+        pages = self.rng.choice(['', '<biblScope unit="page" from="1" to="9"/>', '<biblScope unit="page">33</biblScope>'])
+        return (f'<biblStruct xml:id="b{index}"><analytic>{title}{authors}{doi}</analytic>'
+                f'<monogr><title level="j">J {self.words(1)}</title><imprint>'
+                f'<biblScope unit="volume">{index}</biblScope>{pages}'
+                f'<date type="published" when="20{index % 100:02d}"/></imprint></monogr></biblStruct>')
+
+    def document(self, index):
+        bibl_count = self.rng.randrange(0, 20)
+        segmented = self.rng.random() < 0.7
+        title = self.rng.choice([f'<title level="a" type="main"> Doc {index} {self.words(4)} </title>', ''])
+        abstract = self.rng.choice([
+            '',
+            f'<abstract><div><p>{self.words(5)} {self.ref(bibl_count)}</p>'
+            f'{self.paragraph(bibl_count, segmented)}</div></abstract>',
+        ])
+        divs = []
+        for k in range(self.rng.randrange(1, 10)):
+            head = self.rng.choice(['', f'<head n="{k}">Sec {k} {self.words(2)}</head>'])
+            body = "".join(self.paragraph(bibl_count, segmented) for _ in range(self.rng.randrange(0, 5)))
+            extra = self.rng.choice([
+                '', '<formula>E=mc2</formula>',
+                f'<figure><head>Fig</head><figDesc>{self.words(9)}</figDesc></figure>',
+            ])
+            divs.append(f'<div xmlns="http://www.tei-c.org/ns/1.0">{head}{body}{extra}</div>')
+        bibls = "".join(self.bibl(index, j) for j in range(bibl_count))
+        return f'''<?xml version="1.0" encoding="UTF-8"?>
+<TEI xml:space="preserve" xmlns="http://www.tei-c.org/ns/1.0">
+<teiHeader xml:lang="en"><fileDesc><titleStmt>{title}</titleStmt></fileDesc>
+<profileDesc>{abstract}</profileDesc></teiHeader>
+<text xml:lang="en"><body>{"".join(divs)}</body>
+<back><div type="references"><listBibl>{bibls}</listBibl></div></back></text></TEI>'''
+
+
+def write_tei_corpus(directory, count, seed=0):
+    """
+    在目录中写入 count 个TEI文件，返回按文件名排序的路径列表
+
+    文件名一半带有 "期刊 - 年份 - 作者 标题" 形式的元数据。
+    """
+    builder = TeiBuilder(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        if i % 2:
+            name = f"Adv Mater - 20{i:02d} - Auth{i} Paper {i}.grobid.tei.xml"
+        else:
+            name = f"doc{i}.grobid.tei.xml"
+        path = os.path.join(str(directory), name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(builder.document(i))
+        paths.append(path)
+    return sorted(paths)
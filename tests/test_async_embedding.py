@@ -0,0 +1,45 @@
+import asyncio
+
+from embed.api_providers import LocalApiClient
+from embed.async_embedding import AsyncEmbeddingClient, TokenBucket, estimate_tokens
+
+
+class BatchRejectingClient(LocalApiClient):
+    """拒绝多条文本的请求，逐条请求正常返回"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+        local_embeddings = self.embeddings
+
+        class Embeddings:
+            def create(inner, model, input, **kwargs):
+                self.requests += 1
+                if isinstance(input, list) and len(input) > 1:
+                    raise RuntimeError("batch rejected")
+                return local_embeddings.create(model=model, input=input, **kwargs)
+
+        self.embeddings = Embeddings()
+
+
+def test_token_bucket_wait_takes_tokens():
+    bucket = TokenBucket(60)
+    bucket.wait(10)
+    assert 50 <= bucket.tokens < 51
+
+
+def test_fallback_requests_are_throttled():
+    texts = [f"text number {i}" for i in range(9)]
+    client = BatchRejectingClient()
+    embedder = AsyncEmbeddingClient(client, batch_size=3, concurrency=2,
+                                    requests_per_minute=600, tokens_per_minute=60000)
+
+    vectors = asyncio.run(embedder.embed(texts))
+
+    assert all(vectors)
+    # 3 个被拒绝的批次加 9 次逐条重试，每次请求都从令牌桶取出令牌
+    assert client.requests == 12
+    # 运行期间令牌桶会少量补充
+    assert abs((600 - embedder.request_bucket.tokens) - 12) < 1
+    expected_tokens = 2 * sum(estimate_tokens(t) for t in texts)
+    assert abs((60000 - embedder.token_bucket.tokens) - expected_tokens) < 100
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+from conftest import write_tei_corpus
+
+from embed.document_parser import load_processed_document
+from grobid_client_python.grobid_processor import GrobidProcessor
+
+
+def document_fields(document):
+    return (document.file_name, document.title, document.abstract, document.metadata,
+            document.paragraphs, document.abstract_records()[0]["text"] if document.abstract_records() else None,
+            document.paragraph_records())
+
+
+@pytest.mark.parametrize("use_ascii_only", [True, False])
+def test_jsonl_records_match_processed_xml(tmp_path, use_ascii_only):
+    processor = GrobidProcessor(logger=lambda message: None)
+    processor.use_ascii_only = use_ascii_only
+    paragraphs = 0
+    for raw_file in write_tei_corpus(tmp_path / "raw", 20, seed=1):
+        stem = os.path.splitext(os.path.basename(raw_file))[0]
+        xml_file = str(tmp_path / (stem + ".xml"))
+        records_file = str(tmp_path / (stem + ".jsonl"))
+        assert processor.process_single_xml(raw_file, xml_file, records_file)
+
+        from_xml = load_processed_document(xml_file)
+        from_records = load_processed_document(records_file)
+        assert document_fields(from_records) == document_fields(from_xml)
+        paragraphs += len(from_xml.paragraphs)
+
+    assert paragraphs
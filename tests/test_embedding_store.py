@@ -0,0 +1,68 @@
+import os
+import random
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from embed.embedding_store import EmbeddingStore, write_embedding_store
+
+
+def test_get_record_is_thread_safe(tmp_path):
+    path = str(tmp_path / "store.npy")
+    count = 2000
+    write_embedding_store(
+        ({"text": f"paragraph {i} " + "x" * (i % 97), "id": i, "embedding": [1.0, float(i)]}
+         for i in range(count)),
+        path,
+    )
+
+    store = EmbeddingStore(path)
+    errors = []
+    start = threading.Barrier(8)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        start.wait()
+        for _ in range(3000):
+            index = rng.randrange(count)
+            try:
+                record = store.get_record(index)
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            if record["id"] != index:
+                errors.append(f"record {index} returned {record['id']}")
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+
+    assert errors == []
+
+
+def test_replaced_index_closes_store(tmp_path):
+    from embed.embedding_store import append_to_embedding_store
+    from embed.text_similarity import clear_index_cache, get_embedding_index
+
+    path = str(tmp_path / "store.npy")
+    write_embedding_store([{"text": "a", "embedding": [1.0, 0.0]}], path)
+
+    old_index = get_embedding_index(path)
+    old_index.data.get_record(0)
+    assert old_index.data._records_file is not None
+
+    append_to_embedding_store([{"text": "b", "embedding": [0.0, 1.0]}], path)
+    new_index = get_embedding_index(path)
+    assert new_index is not old_index
+    assert old_index.data._records_file is None
+    # a search still running on the replaced index reopens the records file
+    assert old_index.data.get_record(0)["text"] == "a"
+
+    new_index.data.get_record(1)
+    clear_index_cache()
+    assert new_index.data._records_file is None
+    old_index.data.close()
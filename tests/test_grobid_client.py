@@ -0,0 +1,45 @@
+from grobid_client_python.grobid_client.client import ApiClient
+
+
+class FakeSession:
+    def __init__(self, on_request=None):
+        self.closed = False
+        self.on_request = on_request
+
+    def request(self, method, url, **kwargs):
+        assert not self.closed
+        if self.on_request:
+            self.on_request()
+        assert not self.closed
+        return "response"
+
+    def close(self):
+        self.closed = True
+
+
+def make_client(session):
+    client = ApiClient("http://localhost:8070/api/")
+    client._session = session
+    client._session_pool_maxsize = client.pool_maxsize
+    return client
+
+
+def test_configure_pool_keeps_session_while_requests_are_in_flight():
+    resized = []
+    session = FakeSession(lambda: resized.append(client.configure_pool(pool_maxsize=32)))
+    client = make_client(session)
+
+    assert client.request("GET", "http://localhost:8070/api/isalive") == "response"
+    assert resized == [False]
+    assert client._session is session and not session.closed
+    assert client._requests_in_flight == 0
+
+
+def test_configure_pool_replaces_idle_session():
+    session = FakeSession()
+    client = make_client(session)
+    client.request("GET", "http://localhost:8070/api/isalive")
+
+    assert client.configure_pool(pool_maxsize=32) is True
+    assert session.closed
+    assert client._session is None
@@ -0,0 +1,172 @@
+import filecmp
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+from conftest import write_tei_corpus
+
+import grobid_client_python.grobid_processor as grobid_processor
+from grobid_client_python.grobid_client.grobid_client import ServerUnavailableException
+from grobid_client_python.grobid_processor import GrobidProcessor, ReferenceTable
+
+
+def make_processor(use_ascii_only=True, messages=None):
+    processor = GrobidProcessor(logger=(messages.append if messages is not None else lambda message: None))
+    processor.use_ascii_only = use_ascii_only
+    processor.processing = True
+    return processor
+
+
+def assert_same_files(dir_a, dir_b):
+    names = sorted(os.listdir(dir_a))
+    assert names == sorted(os.listdir(dir_b))
+    match, mismatch, errors = filecmp.cmpfiles(dir_a, dir_b, names, shallow=False)
+    assert (mismatch, errors) == ([], [])
+    return names
+
+
+@pytest.mark.parametrize("use_ascii_only", [True, False])
+def test_process_pool_matches_serial_output(tmp_path, use_ascii_only):
+    xml_dir = tmp_path / "xml"
+    write_tei_corpus(xml_dir, 24, seed=4)
+    (xml_dir / "broken.grobid.tei.xml").write_text("<TEI><a></TEI>", encoding="utf-8")
+
+    outputs = {}
+    for workers in (1, 3):
+        output_dir = tmp_path / f"out{workers}"
+        records_dir = tmp_path / f"records{workers}"
+        output_dir.mkdir()
+        records_dir.mkdir()
+        processor = make_processor(use_ascii_only)
+        processor.records_output_path = str(records_dir)
+        failed = processor.process_xml_files(str(xml_dir), str(output_dir), workers=workers)
+        outputs[workers] = (sorted(os.path.basename(f) for f in failed), output_dir, records_dir)
+
+    assert outputs[1][0] == outputs[3][0] == ["broken.grobid.tei.xml"]
+    assert len(assert_same_files(outputs[1][1], outputs[3][1])) == 24
+    assert len(assert_same_files(outputs[1][2], outputs[3][2])) == 24
+
+
+def tree_process(processor, input_file, output_file):
+    """原先基于完整元素树的 process_single_xml，由现有的树辅助方法组成"""
+    try:
+        root = ET.parse(input_file).getroot()
+    except Exception as e:
+        processor.log(f"解析XML错误: {str(e)}")
+        return False
+
+    processor.references = {}
+    title_text = processor.extract_title(root)
+    abstract_text = processor.extract_abstract(root)
+    processor.extract_bibliography(root)
+
+    body = root.find(".//tei:body", processor.xml_namespace)
+    if body is None:
+        processor.log("找不到正文元素")
+        return False
+    body = processor.process_references_in_text(body)
+    content = "".join(processor.serialize_div(div) for div in body.findall("tei:div", processor.xml_namespace))
+
+    if processor.use_ascii_only:
+        processor.log("正在转换为ASCII编码并删除非ASCII字符...")
+        title_text = processor.convert_to_ascii(title_text)
+        abstract_text = processor.convert_to_ascii(abstract_text)
+        content = processor.convert_to_ascii(content)
+        declaration = '<?xml version="1.0" encoding="ASCII"?>\n'
+    else:
+        declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+    with open(output_file, "w", encoding="ascii" if processor.use_ascii_only else "utf-8") as f:
+        f.write(declaration + "<document>\n")
+        if title_text:
+            f.write(f'<title level="a" type="main">{title_text}</title>\n')
+        if abstract_text:
+            f.write(f"<abstract>{abstract_text}</abstract>\n")
+        f.write(content + "</document>\n")
+    return True
+
+
+@pytest.mark.parametrize("use_ascii_only", [True, False])
+@pytest.mark.parametrize("min_paragraph_length", [0, 150])
+def test_iterparse_matches_tree_path(tmp_path, use_ascii_only, min_paragraph_length):
+    xml_dir = tmp_path / "xml"
+    files = write_tei_corpus(xml_dir, 30, seed=5)
+    for name, text in (("broken.xml", "<TEI><a></TEI>"),
+                       ("no_body.xml", '<TEI xmlns="http://www.tei-c.org/ns/1.0"><text/></TEI>')):
+        (xml_dir / name).write_text(text, encoding="utf-8")
+        files.append(str(xml_dir / name))
+
+    for file_path in files:
+        name = os.path.basename(file_path)
+        results = []
+        for method in ("tree", "iterparse"):
+            messages = []
+            processor = make_processor(use_ascii_only, messages)
+            processor.min_paragraph_length = min_paragraph_length
+            output_file = tmp_path / f"{method}-{name}"
+            if method == "tree":
+                success = tree_process(processor, file_path, str(output_file))
+            else:
+                success = processor.process_single_xml(file_path, str(output_file))
+            output = output_file.read_bytes() if output_file.exists() else None
+            results.append((success, output, sorted(messages)))
+        assert results[0][:2] == results[1][:2], name
+        assert results[0][2] == results[1][2], name
+
+
+@pytest.mark.parametrize("use_ascii_only", [True, False])
+def test_reference_table_expand_round_trip(tmp_path, use_ascii_only):
+    xml_dir = tmp_path / "xml"
+    write_tei_corpus(xml_dir, 24, seed=6)
+
+    inline_dir = tmp_path / "inline"
+    inline_dir.mkdir()
+    make_processor(use_ascii_only).process_xml_files(str(xml_dir), str(inline_dir), workers=1)
+
+    tables = []
+    for workers in (1, 3):
+        compact_dir = tmp_path / f"compact{workers}"
+        compact_dir.mkdir()
+        processor = make_processor(use_ascii_only)
+        processor.reference_table = ReferenceTable()
+        assert processor.process_xml_files(str(xml_dir), str(compact_dir), workers=workers) == []
+        tables.append(processor.reference_table)
+
+        keyed = 0
+        for name in sorted(os.listdir(inline_dir)):
+            encoding = "ascii" if use_ascii_only else "utf-8"
+            compact = (compact_dir / name).read_text(encoding=encoding)
+            keyed += compact.count('<ref key="')
+            assert processor.reference_table.expand(compact) == (inline_dir / name).read_text(encoding=encoding)
+        assert keyed
+
+    # 工作进程返回的条目合并后与串行处理得到的参考文献表相同，保存后重新加载不变
+    assert tables[0].entries == tables[1].entries
+    table_file = str(tmp_path / "references.json")
+    tables[1].save(table_file)
+    assert ReferenceTable.load(table_file).entries == tables[0].entries
+
+
+def test_xml_pool_is_shut_down_when_grobid_is_unavailable(tmp_path, monkeypatch):
+    executors = []
+
+    class RecordingExecutor:
+        def __init__(self, max_workers):
+            self.shut_down = False
+            executors.append(self)
+
+        def shutdown(self, wait=True):
+            self.shut_down = True
+
+    def unavailable_client(config_path):
+        raise ServerUnavailableException("GROBID server does not appear up and running")
+
+    monkeypatch.setattr(grobid_processor, "ProcessPoolExecutor", RecordingExecutor)
+    monkeypatch.setattr(grobid_processor, "GrobidClient", unavailable_client)
+
+    processor = make_processor()
+    processor.xml_workers = 2
+    with pytest.raises(ServerUnavailableException):
+        processor.run_grobid_processing(str(tmp_path), str(tmp_path / "xml"), str(tmp_path / "out"))
+
+    assert [executor.shut_down for executor in executors] == [True]
@@ -0,0 +1,125 @@
+import json
+import os
+
+from conftest import write_tei_corpus
+
+from embed.api_providers import LocalApiClient
+from embed.document_parser import load_processed_document
+from embed.embedding_store import EmbeddingStore
+from embed.incremental_ingest import get_manifest_path, update_document_stores
+from grobid_client_python.grobid_processor import GrobidProcessor
+
+
+def process_corpus(raw_files, output_dir, with_records):
+    """处理TEI文件，with_records 中的文档同时输出JSONL记录"""
+    processor = GrobidProcessor(logger=lambda message: None)
+    stems = []
+    for raw_file in raw_files:
+        stem = os.path.splitext(os.path.basename(raw_file))[0]
+        records_file = os.path.join(output_dir, stem + ".jsonl") if stem in with_records else None
+        assert processor.process_single_xml(raw_file, os.path.join(output_dir, stem + ".xml"), records_file)
+        stems.append(stem)
+    return stems
+
+
+def expected_records(output_dir, stems):
+    abstracts, paragraphs = [], []
+    for stem in stems:
+        document = load_processed_document(os.path.join(output_dir, stem + ".xml"))
+        abstracts.extend(record["text"] for record in document.abstract_records())
+        paragraphs.extend(record["text"] for record in document.paragraph_records())
+    return abstracts, paragraphs
+
+
+def live_texts(store_file):
+    store = EmbeddingStore(store_file)
+    try:
+        return [store[int(i)]["text"] for i in store.live_indices]
+    finally:
+        store.close()
+
+
+def live_records(store_file):
+    """存储中未删除的记录，不含来源文件路径"""
+    store = EmbeddingStore(store_file)
+    try:
+        return [{key: value for key, value in store.get_record(int(i)).items() if key != "file_path"}
+                for i in store.live_indices]
+    finally:
+        store.close()
+
+
+def ingest(output_dir, stores):
+    return update_document_stores(output_dir, stores[0], stores[1],
+                                  api_client=LocalApiClient(), concurrency=1)
+
+
+def test_mixed_xml_and_jsonl_directory(tmp_path):
+    raw_files = write_tei_corpus(tmp_path / "raw", 6)
+    output_dir = str(tmp_path / "processed")
+    os.makedirs(output_dir)
+    stores = (str(tmp_path / "abstract.npy"), str(tmp_path / "fulltext.npy"))
+
+    # 先只有XML输出，之后处理的新文档同时有JSONL记录
+    stems = process_corpus(raw_files[:4], output_dir, with_records=set())
+    ingest(output_dir, stores)
+
+    stems += process_corpus(raw_files[4:], output_dir,
+                            with_records={os.path.splitext(os.path.basename(p))[0] for p in raw_files[4:]})
+    results = ingest(output_dir, stores)
+
+    for stats in results.values():
+        assert stats["added"] == 2
+        assert stats["unchanged"] == 4
+        assert stats["deleted"] == stats["changed"] == stats["records_deleted"] == 0
+
+    # 每次运行按文档名顺序追加
+    abstracts, paragraphs = expected_records(output_dir, sorted(stems[:4]) + sorted(stems[4:]))
+    assert paragraphs
+    assert live_texts(stores[0]) == abstracts
+    assert live_texts(stores[1]) == paragraphs
+
+    with open(get_manifest_path(stores[1]), encoding="utf-8") as f:
+        assert sorted(json.load(f)["files"]) == sorted(stems)
+
+
+def test_version_1_manifest_keys_are_migrated(tmp_path):
+    raw_files = write_tei_corpus(tmp_path / "raw", 3)
+    output_dir = str(tmp_path / "processed")
+    os.makedirs(output_dir)
+    stores = (str(tmp_path / "abstract.npy"), str(tmp_path / "fulltext.npy"))
+    process_corpus(raw_files, output_dir, with_records=set())
+    ingest(output_dir, stores)
+
+    # 第1版清单以带扩展名的文件名为键
+    for store_file in stores:
+        manifest_path = get_manifest_path(store_file)
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        manifest["version"] = 1
+        manifest["files"] = {key + ".xml": entry for key, entry in manifest["files"].items()}
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    for stats in ingest(output_dir, stores).values():
+        assert stats["unchanged"] == 3
+        assert stats["added"] == stats["deleted"] == stats["records_added"] == 0
+
+
+def test_jsonl_and_xml_sources_give_the_same_stores(tmp_path):
+    raw_files = write_tei_corpus(tmp_path / "raw", 8, seed=2)
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in raw_files]
+    xml_dir = str(tmp_path / "xml")
+    mixed_dir = str(tmp_path / "mixed")
+    os.makedirs(xml_dir)
+    os.makedirs(mixed_dir)
+    process_corpus(raw_files, xml_dir, with_records=set())
+    process_corpus(raw_files, mixed_dir, with_records=set(stems[::2]))
+
+    xml_stores = (str(tmp_path / "xml_abstract.npy"), str(tmp_path / "xml_fulltext.npy"))
+    mixed_stores = (str(tmp_path / "mixed_abstract.npy"), str(tmp_path / "mixed_fulltext.npy"))
+    ingest(xml_dir, xml_stores)
+    ingest(mixed_dir, mixed_stores)
+
+    for xml_store, mixed_store in zip(xml_stores, mixed_stores):
+        assert live_records(mixed_store) == live_records(xml_store)
@@ -0,0 +1,40 @@
+import os
+
+from conftest import write_tei_corpus
+
+import text_processor.process_pdf as process_pdf
+from embed.api_providers import LocalApiClient
+from grobid_client_python.grobid_processor import GrobidProcessor
+
+
+class FailingEmbeddings:
+    def create(self, **kwargs):
+        raise RuntimeError("service unavailable")
+
+
+class FailingClient:
+    embeddings = FailingEmbeddings()
+
+
+def make_processed_dir(tmp_path):
+    output_dir = str(tmp_path / "processed")
+    os.makedirs(output_dir)
+    processor = GrobidProcessor(logger=lambda message: None)
+    for raw_file in write_tei_corpus(tmp_path / "raw", 3):
+        processor.process_single_xml(raw_file, os.path.join(output_dir, os.path.basename(raw_file)))
+    return output_dir
+
+
+def test_create_embeddings_reports_failed_requests(tmp_path, monkeypatch):
+    processed_dir = make_processed_dir(tmp_path)
+    monkeypatch.setattr(process_pdf, "current_dir", str(tmp_path))
+    monkeypatch.setattr(process_pdf, "EmbeddingCache", None)
+
+    monkeypatch.setattr(process_pdf, "initialize_api_client", FailingClient)
+    assert process_pdf.create_embeddings(processed_dir) is False
+
+    monkeypatch.setattr(process_pdf, "initialize_api_client", LocalApiClient)
+    assert process_pdf.create_embeddings(processed_dir) is True
+
+    # 没有待处理的文件时同样成功
+    assert process_pdf.create_embeddings(processed_dir) is True
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import embed.streaming_ingest as streaming_ingest
+from embed.api_providers import LocalApiClient
+from embed.embedding_store import EmbeddingStore, get_store_paths, write_embedding_store
+from embed.streaming_ingest import stream_files_to_store
+
+
+def extract_lines(file_path):
+    with open(file_path, encoding="utf-8") as f:
+        text = f.read()
+    if text.startswith("<broken"):
+        raise ValueError("malformed XML")
+    return [{"text": line, "file": os.path.basename(file_path)} for line in text.splitlines()]
+
+
+def make_input(tmp_path):
+    input_dir = tmp_path / "xml"
+    input_dir.mkdir()
+    for i in range(5):
+        content = "<broken" if i == 2 else "\n".join(f"file {i} line {j}" for j in range(3))
+        (input_dir / f"doc{i}.xml").write_text(content, encoding="utf-8")
+    return str(input_dir)
+
+
+def store_texts(store_file):
+    store = EmbeddingStore(store_file)
+    try:
+        return [record["text"] for record in store]
+    finally:
+        store.close()
+
+
+def test_extraction_error_skips_only_that_file(tmp_path):
+    store_file = str(tmp_path / "store.npy")
+    written, extracted = stream_files_to_store(make_input(tmp_path), store_file, extract_lines,
+                                               api_client=LocalApiClient(), concurrency=2)
+
+    assert written == extracted == 12
+    assert store_texts(store_file) == [f"file {i} line {j}" for i in (0, 1, 3, 4) for j in range(3)]
+
+
+def test_existing_store_is_kept_when_the_run_fails(tmp_path, monkeypatch):
+    store_file = str(tmp_path / "store.npy")
+    write_embedding_store([{"text": "old record", "embedding": [1.0, 0.0]}], store_file)
+
+    calls = []
+    append = streaming_ingest.append_to_embedding_store
+
+    def failing_append(records, path):
+        calls.append(path)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        return append(records, path)
+
+    monkeypatch.setattr(streaming_ingest, "append_to_embedding_store", failing_append)
+    with pytest.raises(OSError):
+        stream_files_to_store(make_input(tmp_path), store_file, extract_lines,
+                              api_client=LocalApiClient(), concurrency=1)
+
+    assert store_texts(store_file) == ["old record"]
+    assert sorted(os.listdir(tmp_path)) == sorted(["xml"] + [os.path.basename(p) for p in get_store_paths(store_file)])
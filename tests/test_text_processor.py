@@ -0,0 +1,21 @@
+import os
+
+from embed.api_providers import LocalApiClient
+from embed.text_processor import process_and_search
+from embed.text_similarity import clear_index_cache, get_index_cache_stats
+
+
+def test_temporary_embeddings_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "doc.xml").write_text(
+        "<document><p>tumour vessel embolization therapy</p><p>thrombosis in tumour vessels</p></document>",
+        encoding="utf-8",
+    )
+    clear_index_cache()
+
+    results = process_and_search(str(tmp_path / "doc.xml"), "tumour vessel embolization therapy",
+                                 api_client=LocalApiClient(), threshold=0.0, save_embeddings=False)
+
+    assert results[0]["text"] == "tumour vessel embolization therapy"
+    assert not os.path.exists(tmp_path / "temp_embeddings.json")
+    assert get_index_cache_stats()["cached_files"] == []
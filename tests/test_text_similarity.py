@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from embed.text_similarity import (
+    cosine_similarity, normalize_vector, search_similar_text, search_similar_texts_batch
+)
+
+
+def loop_search(query_vector, embeddings_data, top_k, threshold):
+    """逐行计算余弦相似度再稳定排序的原始实现"""
+    query_vector = normalize_vector(query_vector)
+    similarities = []
+    for i, item in enumerate(embeddings_data):
+        embedding = item.get("embedding")
+        if isinstance(embedding, dict):
+            embedding = embedding.get("vector", embedding.get("embedding"))
+        if not isinstance(embedding, list) or not embedding:
+            continue
+        similarity = cosine_similarity(query_vector, normalize_vector(embedding))
+        if similarity > threshold:
+            similarities.append({"index": i, "text": item.get("text", ""), "similarity": similarity,
+                                 "metadata": item.get("metadata", {})})
+    similarities.sort(key=lambda x: x["similarity"], reverse=True)
+    return similarities[:top_k]
+
+
+def make_dataset(seed, count=400, dimension=16):
+    """从少量不同的向量中重复抽取，制造大量相似度相同的行"""
+    rng = np.random.default_rng(seed)
+    pool = rng.normal(size=(40, dimension))
+    data = []
+    for i in range(count):
+        vector = [float(x) for x in pool[rng.integers(len(pool))] * rng.choice([1, 2, 0.5])]
+        kind = i % 10
+        if kind == 0:
+            item = {"text": f"t{i}", "embedding": {"vector": vector}}
+        elif kind == 1:
+            item = {"text": f"t{i}"}
+        else:
+            item = {"text": f"t{i}", "embedding": vector, "metadata": {"n": i}}
+        data.append(item)
+    return data, pool
+
+
+@pytest.mark.parametrize("top_k", [1, 5, 17, 1000])
+@pytest.mark.parametrize("threshold", [-1.0, 0.0, 0.3])
+def test_vectorized_search_matches_loop(top_k, threshold):
+    data, pool = make_dataset(seed=top_k)
+    for query in list(pool[:5]) + [np.random.default_rng(0).normal(size=pool.shape[1])]:
+        expected = loop_search(list(query), data, top_k, threshold)
+        actual = search_similar_text(list(query), data, top_k, threshold)
+
+        assert [r["index"] for r in actual] == [r["index"] for r in expected]
+        assert [r["text"] for r in actual] == [r["text"] for r in expected]
+        assert [r["metadata"] for r in actual] == [r["metadata"] for r in expected]
+        assert [r["similarity"] for r in actual] == pytest.approx([r["similarity"] for r in expected], abs=1e-5)
+
+
+def merge_by_text(per_keyword_results, max_results):
+    """原大纲关键词搜索中的合并逻辑：按文本去重，保留相似度最高的结果"""
+    unique_results_by_text = {}
+    text_sources = {}
+    for keyword, results in per_keyword_results:
+        for result in results:
+            result = dict(result, source_keyword=keyword)
+            text_sources.setdefault(result["text"], set()).add(keyword)
+            if (result["text"] not in unique_results_by_text
+                    or result["similarity"] > unique_results_by_text[result["text"]]["similarity"]):
+                unique_results_by_text[result["text"]] = result
+    merged = sorted(unique_results_by_text.values(), key=lambda x: x["similarity"], reverse=True)
+    for result in merged:
+        result["source_keywords"] = text_sources[result["text"]]
+    return merged[:max_results]
+
+
+def test_batch_search_matches_single_queries():
+    data, pool = make_dataset(seed=3)
+    # 不同的行共用文本，合并时需要去重
+    for i, item in enumerate(data):
+        item["text"] = f"t{i % 150}"
+    keywords = [f"k{q}" for q in range(6)]
+    queries = [list(v) for v in pool[:5]] + [list(np.random.default_rng(1).normal(size=pool.shape[1]))]
+    top_k, threshold = 7, 0.1
+
+    batch = search_similar_texts_batch(queries, data, top_k, threshold, query_labels=keywords,
+                                       max_results=top_k * len(keywords))
+
+    singles = [search_similar_text(query, data, top_k, threshold) for query in queries]
+    for actual, expected in zip(batch["per_query"], singles):
+        assert [r["index"] for r in actual] == [r["index"] for r in expected]
+        assert [r["similarity"] for r in actual] == pytest.approx([r["similarity"] for r in expected], abs=1e-5)
+
+    # 矩阵乘法与矩阵-向量乘法的舍入可能不同，合并结果以批量搜索的单查询结果为输入对比
+    expected = merge_by_text(zip(keywords, batch["per_query"]), top_k * len(keywords))
+    merged = batch["merged"]
+    assert [r["text"] for r in merged] == [r["text"] for r in expected]
+    assert [r["index"] for r in merged] == [r["index"] for r in expected]
+    assert [r["source_keyword"] for r in merged] == [r["source_keyword"] for r in expected]
+    assert [set(r["source_keywords"]) for r in merged] == [r["source_keywords"] for r in expected]
@@ -0,0 +1,81 @@
+import glob
+import io
+import os
+import random
+import re
+
+import pytest
+
+from embed.xml_text_extractor import (
+    _scan_paragraphs, extract_paragraphs_with_metadata, iter_paragraphs, iter_paragraphs_in_text
+)
+
+# 原实现使用的段落正则
+PARAGRAPH_PATTERN = re.compile(r'<p(?:\s[^>]*)?>((?:.|\n)*?)</p>', re.DOTALL)
+
+PROCESSED_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "text_processor", "processed_output")
+
+EDGE_CASES = [
+    "",
+    "<p>one</p>",
+    "<p>a</p><p></p><p>  </p><p>b</p>",
+    "<pb/><p>after page break</p><pre>x</pre>",
+    '<p class="x">attr</p><p\nid="2">newline attr</p><p\t>tab</p>',
+    "<p>outer <p>nested</p> tail</p>",
+    "<p>unclosed <p>second</p>",
+    "<p>never closed",
+    "<p",
+    "<p attr",
+    "text </p> <p>ok</p> <p>multi\nline\n</p>",
+    "<h1>A</h1><p>x</p><h1><hi>B</hi>  c</h1><p>y</p><p>z</p>",
+]
+
+
+def random_document(rng):
+    tokens = ["<p>", "</p>", "<p ", ">", "<pb/>", "<h1>", "</h1>", "<p\n", "text", " ", "\n", "<", "&"]
+    return "".join(rng.choice(tokens) for _ in range(rng.randrange(0, 80)))
+
+
+def scan(text, chunk_size, skip_empty=False):
+    return list(_scan_paragraphs(io.StringIO(text), chunk_size, skip_empty))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+def test_scanner_matches_regex(chunk_size):
+    rng = random.Random(chunk_size)
+    documents = EDGE_CASES + [random_document(rng) for _ in range(300)]
+    for text in documents:
+        contents = [item["content"] for item in scan(text, chunk_size)]
+        assert contents == PARAGRAPH_PATTERN.findall(text), text
+
+
+def test_scanner_matches_regex_on_processed_output():
+    files = sorted(glob.glob(os.path.join(PROCESSED_DIR, "*.xml")))
+    assert files
+    for file_path in files:
+        with open(file_path, encoding="utf-8") as f:
+            text = f.read()
+        expected = [p for p in PARAGRAPH_PATTERN.findall(text) if p.strip()]
+        assert [item["content"] for item in iter_paragraphs(file_path, chunk_size=4096)] == expected
+        assert [item["content"] for item in iter_paragraphs_in_text(text)] == expected
+
+
+def test_paragraphs_record_preceding_heading():
+    text = "<p>intro</p><h1>A</h1><p>x</p><h1><hi>B</hi>  c</h1><p></p><p>y</p>"
+    for chunk_size in (1, 5, 1024):
+        items = scan(text, chunk_size, skip_empty=True)
+        assert [(item["position"], item["section"], item["content"]) for item in items] == [
+            (0, "", "intro"), (1, "A", "x"), (2, "B c", "y")
+        ]
+
+
+def test_paragraph_ids_skip_empty_paragraphs(tmp_path):
+    text = "<document><h1>A</h1><p>first</p><p></p><p> \n </p><h1>B</h1><p>second</p><p/><p>third</p></document>"
+    file_path = tmp_path / "doc.xml"
+    file_path.write_text(text, encoding="utf-8")
+
+    # 原实现先丢弃空段落再用 enumerate 编号
+    expected = list(enumerate(p for p in PARAGRAPH_PATTERN.findall(text) if p.strip()))
+    items = extract_paragraphs_with_metadata(str(file_path))
+    assert [(item["paragraph_id"], item["content"]) for item in items] == expected
+    assert [item["section"] for item in items] == ["A", "B", "B"]
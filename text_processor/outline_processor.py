@@ -14,10 +14,11 @@ import logging
 from pathlib import Path
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, filedialog
-from volcenginesdkarkruntime import Ark
 import numpy as np
+import re
 import glob
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 设置日志
 logging.basicConfig(
@@ -44,14 +45,32 @@ if embed_dir not in sys.path:
 
 # 尝试导入相关模块
 try:
-    from outline_decompose.outline_decompose import OutlineDecomposer
     from embed.text_processor import initialize_api_client,extract_and_create_embeddings
-    from embed.abstract_extractor import search_by_text, search_by_text as search_abstract_by_text
+    from embed.text_similarity import create_embeddings_batch, get_embedding_index, get_index_cache_stats
+    from embed.embedding_store import resolve_embeddings_file
+    from embed.api_providers import get_api_provider_name, DEFAULT_PROVIDER
+    from embed.config import get_env_int
 except ImportError as e:
     logger.error(f"导入模块出错: {e}")
     logger.error("请确保已安装所有必要的依赖和模块")
     sys.exit(1)
 
+# 大纲分解器只在Ark提供方下使用，其他提供方（如离线运行的local）直接用对话接口分解
+try:
+    from outline_decompose.outline_decompose import OutlineDecomposer
+except ImportError:
+    OutlineDecomposer = None
+
+# 同时处理的大纲板块数，可通过 OUTLINE_WORKERS 环境变量调整，1表示逐个处理
+DEFAULT_BLOCK_WORKERS = 8
+
+# 综述生成：同时发送的请求数、单个请求的超时时间（秒）、失败block的重试轮数，
+# 可通过 REVIEW_WORKERS、REVIEW_TIMEOUT、REVIEW_RETRIES 环境变量调整
+DEFAULT_REVIEW_WORKERS = 4
+DEFAULT_REVIEW_TIMEOUT = 600
+DEFAULT_REVIEW_RETRIES = 2
+REVIEW_RETRY_DELAY = 5  # 第一轮重试前的等待时间（秒），之后每轮加倍
+
 def clean_for_json(obj):
     """
     清理对象，使其可以序列化为JSON
@@ -82,9 +101,12 @@ class OutlineProcessor:
     
     def __init__(self):
         """初始化处理器"""
+        # 本地提供方（API_PROVIDER=local）不需要API密钥
+        self.use_ark = get_api_provider_name() == DEFAULT_PROVIDER
+        
         # 检查API密钥
         self.api_key = os.getenv('ARK_API_KEY')
-        if not self.api_key:
+        if not self.api_key and self.use_ark:
             logger.error("环境变量ARK_API_KEY未设置")
             raise ValueError("请设置环境变量ARK_API_KEY")
         
@@ -94,27 +116,44 @@ class OutlineProcessor:
             logger.error("API客户端初始化失败")
             raise ValueError("API客户端初始化失败")
         
-        # 初始化大纲分解器
-        self.outline_decomposer = OutlineDecomposer(self.api_key)
-        
-        # 初始化Ark客户端（用于调用大模型）
-        self.client = Ark(api_key=self.api_key)
+        # 初始化Ark客户端（用于调用大模型），其他提供方直接复用同一客户端
+        if self.use_ark:
+            from volcenginesdkarkruntime import Ark
+            self.client = Ark(api_key=self.api_key)
+        else:
+            self.client = self.api_client
         self.model = "doubao-1-5-thinking-pro-250415"
         
+        # 初始化大纲分解器；其他提供方没有分解器，由 decompose_outline 通过 self.client 分解
+        self.outline_decomposer = None
+        if self.use_ark:
+            if OutlineDecomposer is None:
+                logger.error("无法导入outline_decompose模块")
+                raise ValueError("大纲分解模块outline_decompose不可用")
+            self.outline_decomposer = OutlineDecomposer(self.api_key)
+        
         # 设置嵌入向量文件路径
         self.embeddings_dir = os.path.join(current_dir, "embeddings")
         self.abstract_embeddings_file = os.path.join(self.embeddings_dir, "abstract_embeddings.json")
         self.fulltext_embeddings_file = os.path.join(self.embeddings_dir, "fulltext_embeddings.json")
         
-        # 检查嵌入向量文件
-        if not os.path.exists(self.abstract_embeddings_file):
+        # 检查嵌入向量文件（JSON或对应的二进制存储）
+        if not os.path.exists(resolve_embeddings_file(self.abstract_embeddings_file)):
             logger.warning(f"摘要嵌入向量文件不存在: {self.abstract_embeddings_file}")
-        if not os.path.exists(self.fulltext_embeddings_file):
+        if not os.path.exists(resolve_embeddings_file(self.fulltext_embeddings_file)):
             logger.warning(f"正文嵌入向量文件不存在: {self.fulltext_embeddings_file}")
         
         # 设置输出目录
         self.output_dir = os.path.join(current_dir, "outline_results")
         os.makedirs(self.output_dir, exist_ok=True)
+        
+        # 板块处理的并发数
+        self.block_workers = max(1, get_env_int("OUTLINE_WORKERS", DEFAULT_BLOCK_WORKERS) or 1)
+        
+        # 综述生成的并发数、请求超时和重试轮数
+        self.review_workers = max(1, get_env_int("REVIEW_WORKERS", DEFAULT_REVIEW_WORKERS) or 1)
+        self.review_timeout = get_env_int("REVIEW_TIMEOUT", DEFAULT_REVIEW_TIMEOUT) or None
+        self.review_retries = max(0, get_env_int("REVIEW_RETRIES", DEFAULT_REVIEW_RETRIES) or 0)
 
 
 
@@ -131,13 +170,63 @@ class OutlineProcessor:
         """
         logger.info("开始分解大纲...")
         try:
-            result = self.outline_decomposer.decompose_outline(outline_text)
+            if self.outline_decomposer is not None:
+                result = self.outline_decomposer.decompose_outline(outline_text)
+            else:
+                result = self.decompose_outline_with_client(outline_text)
             logger.info(f"大纲分解完成，共 {len(result.get('blocks', []))} 个板块")
             return result
         except Exception as e:
             logger.error(f"大纲分解失败: {e}")
             raise
     
+    def decompose_outline_with_client(self, outline_text):
+        """
+        通过 self.client 的对话接口分解大纲，用于没有大纲分解器的提供方
+        
+        参数:
+            outline_text: 大纲文本
+            
+        返回:
+            dict: 分解后的大纲JSON对象，blocks 中每个板块包含 title、content 和 keywords
+        """
+        prompt = f"""
+你的任务是将一篇综述的大纲分解为若干板块，每个板块对应大纲中的一个章节。
+
+请仔细阅读以下综述大纲：
+<outline>
+{outline_text}
+</outline>
+
+为每个板块给出标题、该板块需要论述的内容，以及用于检索文献的英文关键词（最多不超过10个）。
+以json格式输出，不要输出其他内容：
+{{
+  "blocks": [
+    {{"title": "", "content": "", "keywords": []}}
+  ]
+}}
+"""
+        
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "user", "content": prompt},
+            ]
+        )
+        
+        response = completion.choices[0].message.content
+        response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL)
+        
+        json_start = response.find('{')
+        json_end = response.rfind('}') + 1
+        if json_start < 0 or json_end <= json_start:
+            raise ValueError("无法在大纲分解响应中找到有效的JSON")
+        
+        result = json.loads(response[json_start:json_end])
+        if not isinstance(result.get("blocks"), list):
+            raise ValueError("大纲分解响应中没有blocks列表")
+        return result
+    
     def search_abstract_by_keywords(self, keywords, top_k=5):
         """
         使用关键词在摘要数据库中搜索
@@ -149,96 +238,89 @@ class OutlineProcessor:
         返回:
             list: 搜索结果列表，每个关键词保留top_k个结果
         """
+        return self._search_by_keywords(
+            keywords,
+            self.abstract_embeddings_file,
+            "摘要",
+            top_k=top_k,
+            threshold=0.1  # 设置较低的阈值以确保返回结果
+        )
+    
+    def _search_by_keywords(self, keywords, embeddings_file, label, top_k=5, threshold=0.5):
+        """
+        使用一组关键词在嵌入向量数据库中批量搜索并合并去重
+        
+        参数:
+            keywords: 关键词列表
+            embeddings_file: 嵌入向量文件路径（JSON或二进制存储）
+            label: 日志中使用的数据库名称
+            top_k: 每个关键词返回的结果数量
+            threshold: 相似度阈值
+            
+        返回:
+            list: 去重后的搜索结果列表，每条结果带有source_keywords
+        """
         # 确保keywords不为None
         if not keywords:
-            logger.warning("关键词列表为空，无法进行摘要搜索")
+            logger.warning(f"关键词列表为空，无法进行{label}搜索")
             return []
         
-        if not os.path.exists(self.abstract_embeddings_file):
-            logger.warning(f"摘要嵌入向量文件不存在: {self.abstract_embeddings_file}，将返回空结果")
+        # 优先使用与JSON对应的二进制存储
+        embeddings_file = resolve_embeddings_file(embeddings_file)
+        
+        if not os.path.exists(embeddings_file):
+            logger.warning(f"{label}嵌入向量文件不存在: {embeddings_file}，将返回空结果")
             return []
             
-        if not os.path.getsize(self.abstract_embeddings_file):
-            logger.warning(f"摘要嵌入向量文件为空: {self.abstract_embeddings_file}，将返回空结果")
+        if not os.path.getsize(embeddings_file):
+            logger.warning(f"{label}嵌入向量文件为空: {embeddings_file}，将返回空结果")
             return []
         
-        all_results = []
-        keyword_results = {}  # 用于存储每个关键词的搜索结果
+        # 所有关键词通过一次嵌入请求生成查询向量
+        keywords = [keyword for keyword in keywords if keyword]  # 跳过空关键词
+        logger.info(f"使用关键词在{label}数据库中搜索: {', '.join(keywords)}")
+        vectors = create_embeddings_batch(keywords, self.api_client, batch_size=len(keywords))
         
-        for keyword in keywords:
-            if not keyword:  # 跳过空关键词
+        query_keywords = []
+        query_vectors = []
+        for keyword, query_vector in zip(keywords, vectors):
+            if not query_vector:
+                logger.error(f"无法为关键词 '{keyword}' 生成嵌入向量")
                 continue
             
-            logger.info(f"使用关键词在摘要数据库中搜索: {keyword}")
-            try:
-                results = search_abstract_by_text(
-                    keyword, 
-                    self.abstract_embeddings_file,
-                    self.api_client,
-                    top_k=top_k,
-                    threshold=0.1  # 设置较低的阈值以确保返回结果
-                )
-                
-                if results:
-                    # 为每个结果添加来源关键词信息
-                    for result in results:
-                        result["source_keyword"] = keyword
-                        
-                    # 存储该关键词的结果
-                    keyword_results[keyword] = results
-                    
-                    # 同时将结果添加到所有结果列表
-                    all_results.extend(results)
-                    logger.info(f"找到 {len(results)} 条摘要搜索结果")
-                else:
-                    logger.info(f"未找到关键词 '{keyword}' 的摘要搜索结果")
-                    keyword_results[keyword] = []
-            except Exception as e:
-                logger.error(f"摘要搜索出错: {e}")
-                keyword_results[keyword] = []
-                # 继续处理下一个关键词，不中断整个搜索过程
+            query_keywords.append(keyword)
+            query_vectors.append(query_vector)
+        
+        if not query_vectors:
+            return []
         
-        # 执行去重（基于完整文本内容）
         try:
-            # 首先，对所有结果进行去重，相同text值只保留一个结果
-            unique_results_by_text = {}  # 使用text作为键的字典
-            
-            # 记录每个text来自哪些关键词
-            text_sources = {}  # 记录每个text对应的所有来源关键词
-            
-            for result in all_results:
-                text = result.get("text", "")
-                if not text:
-                    continue
-                    
-                # 记录文本来源的关键词
-                if text not in text_sources:
-                    text_sources[text] = set()
-                text_sources[text].add(result.get("source_keyword", ""))
-                
-                # 保存相似度最高的结果
-                if text not in unique_results_by_text or result.get("similarity", 0) > unique_results_by_text[text].get("similarity", 0):
-                    unique_results_by_text[text] = result.copy()
-            
-            # 更新每个结果的来源关键词列表
-            for text, result in unique_results_by_text.items():
-                if text in text_sources:
-                    result["source_keywords"] = list(text_sources[text])  # 所有来源关键词列表
-            
-            # 转换为列表并按相似度降序排序
-            unique_results_list = list(unique_results_by_text.values())
-            unique_results_list.sort(key=lambda x: x.get("similarity", 0), reverse=True)
-            
-            # 记录去重前后的数量变化
-            logger.info(f"摘要搜索去重: 从 {len(all_results)} 条结果去重为 {len(unique_results_list)} 条唯一结果")
-            
-            # 返回前top_k×len(keywords)个结果，确保有足够的结果
-            max_results = min(top_k * len(keywords), len(unique_results_list))
-            return unique_results_list[:max_results]
+            # 共享索引只在文件变化时重新加载
+            index = get_embedding_index(embeddings_file)
             
+            # 所有关键词共用一次扫描，并按文本去重合并
+            search_result = index.search_batch(
+                query_vectors,
+                top_k=top_k,
+                threshold=threshold,
+                query_labels=query_keywords,
+                max_results=top_k * len(keywords)  # 返回前top_k×len(keywords)个结果，确保有足够的结果
+            )
         except Exception as e:
-            logger.error(f"处理摘要搜索结果时出错: {e}")
+            logger.error(f"{label}搜索出错: {e}")
             return []  # 发生错误时返回空结果
+        
+        for keyword, results in zip(query_keywords, search_result["per_query"]):
+            if results:
+                logger.info(f"关键词 '{keyword}' 找到 {len(results)} 条{label}搜索结果")
+            else:
+                logger.info(f"未找到关键词 '{keyword}' 的{label}搜索结果")
+        
+        merged_results = search_result["merged"]
+        total_results = sum(len(results) for results in search_result["per_query"])
+        logger.info(f"{label}搜索去重: 从 {total_results} 条结果去重为 {len(merged_results)} 条唯一结果")
+        
+        return merged_results
     
     def generate_enhanced_keywords(self, block, abstract_results):
         """
@@ -362,105 +444,23 @@ class OutlineProcessor:
         返回:
             list: 搜索结果列表，每个关键词保留top_k个结果
         """
-        # 确保keywords不为None
-        if not keywords:
-            logger.warning("关键词列表为空，无法进行正文搜索")
-            return []
-        
-        if not os.path.exists(self.fulltext_embeddings_file):
-            logger.warning(f"正文嵌入向量文件不存在: {self.fulltext_embeddings_file}，将返回空结果")
-            return []
-            
-        if not os.path.getsize(self.fulltext_embeddings_file):
-            logger.warning(f"正文嵌入向量文件为空: {self.fulltext_embeddings_file}，将返回空结果")
-            return []
-        
-        all_results = []
-        keyword_results = {}  # 用于存储每个关键词的搜索结果
-        
-        for keyword in keywords:
-            if not keyword:  # 跳过空关键词
-                continue
-            
-            logger.info(f"使用关键词在正文数据库中搜索: {keyword}")
-            try:
-                results = search_by_text(
-                    keyword, 
-                    self.fulltext_embeddings_file,
-                    self.api_client,
-                    top_k=top_k,
-                    threshold=0.2  # 设置较低的阈值以确保返回结果
-                )
-                
-                if results:
-                    # 为每个结果添加来源关键词信息
-                    for result in results:
-                        result["source_keyword"] = keyword
-                        
-                    # 存储该关键词的结果
-                    keyword_results[keyword] = results
-                    
-                    # 同时将结果添加到所有结果列表
-                    all_results.extend(results)
-                    logger.info(f"找到 {len(results)} 条正文搜索结果")
-                else:
-                    logger.info(f"未找到关键词 '{keyword}' 的正文搜索结果")
-                    keyword_results[keyword] = []
-            except Exception as e:
-                logger.error(f"正文搜索出错: {e}")
-                keyword_results[keyword] = []
-                # 继续处理下一个关键词，不中断整个搜索过程
-        
-        # 去重（基于完整文本内容）
-        try:
-            # 首先，对所有结果进行去重，相同text值只保留一个结果
-            unique_results_by_text = {}  # 使用text作为键的字典
-            
-            # 记录每个text来自哪些关键词
-            text_sources = {}  # 记录每个text对应的所有来源关键词
-            
-            for result in all_results:
-                text = result.get("text", "")
-                if not text:
-                    continue
-                    
-                # 记录文本来源的关键词
-                if text not in text_sources:
-                    text_sources[text] = set()
-                text_sources[text].add(result.get("source_keyword", ""))
-                
-                # 保存相似度最高的结果
-                if text not in unique_results_by_text or result.get("similarity", 0) > unique_results_by_text[text].get("similarity", 0):
-                    unique_results_by_text[text] = result.copy()
-            
-            # 更新每个结果的来源关键词列表
-            for text, result in unique_results_by_text.items():
-                if text in text_sources:
-                    result["source_keywords"] = list(text_sources[text])  # 所有来源关键词列表
-            
-            # 转换为列表并按相似度降序排序
-            unique_results_list = list(unique_results_by_text.values())
-            unique_results_list.sort(key=lambda x: x.get("similarity", 0), reverse=True)
-            
-            # 记录去重前后的数量变化
-            logger.info(f"正文搜索去重: 从 {len(all_results)} 条结果去重为 {len(unique_results_list)} 条唯一结果")
-            
-            # 返回前top_k×len(keywords)个结果，确保有足够的结果
-            max_results = min(top_k * len(keywords), len(unique_results_list))
-            return unique_results_list[:max_results]
-            
-        except Exception as e:
-            logger.error(f"处理正文搜索结果时出错: {e}")
-            return []  # 发生错误时返回空结果
+        return self._search_by_keywords(
+            keywords,
+            self.fulltext_embeddings_file,
+            "正文",
+            top_k=top_k,
+            threshold=0.2  # 设置较低的阈值以确保返回结果
+        )
 
 
-    def process_outline_block(self, block, block_index):
+    def process_outline_block(self, block, block_index, save=True):
         """
         处理单个大纲板块
         
         参数:
             block: 板块信息字典
             block_index: 板块索引
+            save: 是否立即保存 block_N.json，并发处理时由 process_outline 按大纲顺序保存
             
         返回:
             dict: 处理结果字典
@@ -508,7 +508,19 @@ class OutlineProcessor:
         # 清理结果，确保可序列化
         result = clean_for_json(result)
         
-        # 保存单个板块的处理结果
+        if save:
+            self.save_block_result(result, block_index)
+        
+        return result
+    
+    def save_block_result(self, result, block_index):
+        """
+        保存单个板块的处理结果到 block_N.json
+        
+        参数:
+            result: process_outline_block 返回的处理结果
+            block_index: 板块索引
+        """
         try:
             block_output_file = os.path.join(self.output_dir, f"block_{block_index+1}.json")
             with open(block_output_file, 'w', encoding='utf-8') as f:
@@ -516,16 +528,53 @@ class OutlineProcessor:
             logger.info(f"板块 {block_index+1} 处理结果已保存到: {block_output_file}")
         except Exception as e:
             logger.error(f"保存板块 {block_index+1} 处理结果时出错: {e}")
+    
+    def process_outline_blocks(self, blocks, workers=None):
+        """
+        处理所有大纲板块
         
-        return result
+        workers 大于1时，板块在线程池中并发处理（搜索和大模型调用都在等待网络），
+        总耗时接近最慢的板块；block_N.json 仍按大纲顺序保存：前面的板块完成后，
+        后面已完成的板块才依次写入。
+        
+        参数:
+            blocks: 板块信息列表
+            workers: 同时处理的板块数，默认使用 self.block_workers
+            
+        返回:
+            list: 按大纲顺序排列的处理结果
+        """
+        workers = min(workers or self.block_workers, len(blocks))
+        if workers <= 1:
+            return [self.process_outline_block(block, i) for i, block in enumerate(blocks)]
+        
+        logger.info(f"使用 {workers} 个线程并发处理 {len(blocks)} 个板块")
+        all_results = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.process_outline_block, block, i, False)
+                       for i, block in enumerate(blocks)]
+            try:
+                # 按大纲顺序等待并保存结果
+                for i, future in enumerate(futures):
+                    result = future.result()
+                    self.save_block_result(result, i)
+                    all_results.append(result)
+            finally:
+                # 出错时取消尚未开始的板块
+                for future in futures:
+                    future.cancel()
+        
+        return all_results
     
-    def process_outline(self, outline_text, auto_generate_review=False):
+    def process_outline(self, outline_text, auto_generate_review=False, workers=None):
         """
         处理整个大纲
         
         参数:
             outline_text: 大纲文本
             auto_generate_review: 是否自动生成综述内容
+            workers: 同时处理的板块数，默认使用 self.block_workers（OUTLINE_WORKERS
+                环境变量），1表示逐个处理
             
         返回:
             str: 最终结果文件路径，或生成的综述文件路径
@@ -544,11 +593,11 @@ class OutlineProcessor:
             json.dump(outline_result, f, ensure_ascii=False, indent=2)
         logger.info(f"大纲分解结果已保存到: {outline_file}")
         
-        # 3. 逐个处理板块
-        all_results = []
-        for i, block in enumerate(blocks):
-            block_result = self.process_outline_block(block, i)
-            all_results.append(block_result)
+        # 3. 处理所有板块，结果按大纲顺序排列
+        all_results = self.process_outline_blocks(blocks, workers)
+        
+        cache_stats = get_index_cache_stats()
+        logger.info(f"嵌入向量索引缓存: 命中 {cache_stats['hits']} 次，加载 {cache_stats['misses']} 次")
         
         # 4. 整合所有板块结果
         final_result = {
@@ -573,14 +622,22 @@ class OutlineProcessor:
         
         return final_file
     
-    def generate_review(self, json_dir=None, output_dir=None, merge_output=True):
+    def generate_review(self, json_dir=None, output_dir=None, merge_output=True,
+                        workers=None, timeout=None, retries=None):
         """
         使用大模型API为每个block生成内容，并合并为完整综述
         
+        各block的请求在线程池中并发发送，每个 block_N_review.txt 在对应请求完成时
+        立即写入；全部结束后按block顺序合并为完整综述。失败的block在下一轮重试，
+        已成功的block不会重新生成。
+        
         参数:
             json_dir: 包含block_*.json文件的目录，默认为self.output_dir
             output_dir: 生成结果的输出目录，默认为self.output_dir下的reviews子目录
             merge_output: 是否将所有生成结果合并为一个文件
+            workers: 同时发送的请求数，默认使用 self.review_workers（REVIEW_WORKERS环境变量）
+            timeout: 单个请求的超时时间（秒），默认使用 self.review_timeout（REVIEW_TIMEOUT环境变量）
+            retries: 失败block的重试轮数，默认使用 self.review_retries（REVIEW_RETRIES环境变量）
         
         返回:
             str: 最终生成的综述文件路径
@@ -592,6 +649,10 @@ class OutlineProcessor:
         if output_dir is None:
             output_dir = os.path.join(self.output_dir, "reviews")
         
+        workers = workers or self.review_workers
+        timeout = timeout or self.review_timeout
+        retries = self.review_retries if retries is None else retries
+        
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
         
@@ -605,87 +666,38 @@ class OutlineProcessor:
         
         logger.info(f"找到 {len(block_files)} 个block文件，准备生成内容")
         
-        # 逐个处理block文件
-        all_contents = []
-        
+        # 读取block文件并构建提示词，block编号到 (标题, 提示词) 的映射
+        prompts = {}
         for i, block_file in enumerate(block_files):
             block_num = i + 1
-            logger.info(f"处理 block {block_num}/{len(block_files)}: {os.path.basename(block_file)}")
-            
             try:
-                # 读取block文件
                 with open(block_file, 'r', encoding='utf-8') as f:
                     block_data = json.load(f)
-                
-                # 提取信息
-                block_info = block_data.get("block_info", {})
-                title = block_info.get("title", f"Section {block_num}")
-                content = block_info.get("content", "")
-                
-                # 收集相关文献内容
-                abstract_results = block_data.get("abstract_results", [])
-                fulltext_results = block_data.get("fulltext_results", [])
-                
-                # 构建提示词
-                references = []
-                for j, result in enumerate(abstract_results + fulltext_results):
-                    text = result.get("text", "")
-                    if text:
-                        similarity = result.get("similarity", 0)
-                        references.append(f"参考文献 {j+1} [相似度: {similarity:.2f}]:\n{text}\n")
-                
-                references_text = "\n".join(references[:15])  # 最多包含15条参考文献
-                
-                prompt = f"""
-请你根据以下大纲和参考文献内容，撰写一篇学术综述的一部分。
-
-【大纲部分】：
-标题：{title}
-内容：{content}
-
-【相关参考文献】：
-{references_text}
-
-请根据以上内容写一段关于"{title}"的综述文章内容。要求：
-1. 使用学术论文风格，语言严谨、客观
-2. 内容应当完整、连贯，与给定大纲主题紧密相关
-3. 适当引用参考文献中的观点和发现，但不要直接复制
-4. 生成内容应当在800-1500字之间
-5. 不需要包含引用标记，直接融入文本中
-6. 不需要引言和结论部分，直接开始正文内容
-
-请直接给出这部分综述的文本内容，无需其他解释。
-"""
-                
-                # 调用大模型API
-                logger.info(f"为 block {block_num} 生成内容...")
-                
-                completion = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "user", "content": prompt},
-                    ]
-                )
-                
-                generated_content = completion.choices[0].message.content
-                
-                # 保存单个block的内容
-                block_output_file = os.path.join(output_dir, f"block_{block_num}_review.txt")
-                with open(block_output_file, 'w', encoding='utf-8') as f:
-                    f.write(f"# {title}\n\n")
-                    f.write(generated_content)
-                
-                logger.info(f"Block {block_num} 内容已保存至: {block_output_file}")
-                
-                # 添加到合并内容中
-                all_contents.append({
-                    "title": title,
-                    "content": generated_content
-                })
-                
+                prompts[block_num] = self.build_review_prompt(block_data, block_num)
             except Exception as e:
                 logger.error(f"处理 block {block_num} 时出错: {str(e)}")
         
+        # 并发生成，失败的block按轮重试
+        generated = {}
+        pending = sorted(prompts)
+        for attempt in range(retries + 1):
+            if not pending:
+                break
+            if attempt:
+                delay = REVIEW_RETRY_DELAY * (2 ** (attempt - 1))
+                logger.info(f"{delay}秒后重试 {len(pending)} 个失败的block（第 {attempt}/{retries} 轮）: "
+                            f"{', '.join(map(str, pending))}")
+                time.sleep(delay)
+            
+            pending = self._generate_reviews(pending, prompts, generated, output_dir, workers, timeout)
+        
+        if pending:
+            logger.error(f"以下block生成失败，未包含在综述中: {', '.join(map(str, pending))}")
+        
+        # 按block顺序整理生成结果
+        all_contents = [{"title": prompts[block_num][0], "content": generated[block_num]}
+                        for block_num in sorted(generated)]
+        
         # 如果需要合并输出
         if merge_output and all_contents:
             # 创建一个完整的综述
@@ -707,6 +719,125 @@ class OutlineProcessor:
             return merged_file
         
         return output_dir
+    
+    def _generate_reviews(self, block_nums, prompts, generated, output_dir, workers, timeout):
+        """
+        并发生成一组block的内容，每个block完成时立即保存
+        
+        参数:
+            block_nums: 要生成的block编号
+            prompts: block编号到 (标题, 提示词) 的映射
+            generated: block编号到生成内容的映射，成功的结果写入其中
+            output_dir: 生成结果的输出目录
+            workers: 同时发送的请求数
+            timeout: 单个请求的超时时间（秒）
+            
+        返回:
+            list: 生成失败的block编号
+        """
+        failed = []
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(block_nums)))) as executor:
+            futures = {}
+            for block_num in block_nums:
+                logger.info(f"为 block {block_num} 生成内容...")
+                futures[executor.submit(self.generate_block_review, prompts[block_num][1], timeout)] = block_num
+            
+            for future in as_completed(futures):
+                block_num = futures[future]
+                title = prompts[block_num][0]
+                try:
+                    generated_content = future.result()
+                    
+                    # 保存单个block的内容
+                    block_output_file = os.path.join(output_dir, f"block_{block_num}_review.txt")
+                    with open(block_output_file, 'w', encoding='utf-8') as f:
+                        f.write(f"# {title}\n\n")
+                        f.write(generated_content)
+                    
+                    logger.info(f"Block {block_num} 内容已保存至: {block_output_file}")
+                    generated[block_num] = generated_content
+                except Exception as e:
+                    logger.error(f"处理 block {block_num} 时出错: {str(e)}")
+                    failed.append(block_num)
+        
+        return sorted(failed)
+    
+    def build_review_prompt(self, block_data, block_num):
+        """
+        根据block文件的内容构建生成综述的提示词
+        
+        参数:
+            block_data: block_*.json 的内容
+            block_num: block编号，没有标题时用于生成默认标题
+            
+        返回:
+            tuple: (标题, 提示词)
+        """
+        # 提取信息
+        block_info = block_data.get("block_info", {})
+        title = block_info.get("title", f"Section {block_num}")
+        content = block_info.get("content", "")
+        
+        # 收集相关文献内容
+        abstract_results = block_data.get("abstract_results", [])
+        fulltext_results = block_data.get("fulltext_results", [])
+        
+        # 构建提示词
+        references = []
+        for j, result in enumerate(abstract_results + fulltext_results):
+            text = result.get("text", "")
+            if text:
+                similarity = result.get("similarity", 0)
+                references.append(f"参考文献 {j+1} [相似度: {similarity:.2f}]:\n{text}\n")
+        
+        references_text = "\n".join(references[:15])  # 最多包含15条参考文献
+        
+        prompt = f"""
+请你根据以下大纲和参考文献内容，撰写一篇学术综述的一部分。
+
+【大纲部分】：
+标题：{title}
+内容：{content}
+
+【相关参考文献】：
+{references_text}
+
+请根据以上内容写一段关于"{title}"的综述文章内容。要求：
+1. 使用学术论文风格，语言严谨、客观
+2. 内容应当完整、连贯，与给定大纲主题紧密相关
+3. 适当引用参考文献中的观点和发现，但不要直接复制
+4. 生成内容应当在800-1500字之间
+5. 不需要包含引用标记，直接融入文本中
+6. 不需要引言和结论部分，直接开始正文内容
+
+请直接给出这部分综述的文本内容，无需其他解释。
+"""
+        
+        return title, prompt
+    
+    def generate_block_review(self, prompt, timeout=None):
+        """
+        调用大模型API生成一个block的内容
+        
+        参数:
+            prompt: 提示词
+            timeout: 请求超时时间（秒）
+            
+        返回:
+            str: 生成的内容
+        """
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "user", "content": prompt},
+            ],
+            timeout=timeout
+        )
+        
+        generated_content = completion.choices[0].message.content
+        if not generated_content:
+            raise ValueError("大模型返回了空内容")
+        return generated_content
 
 
 class OutlineProcessorApp:
@@ -20,7 +20,7 @@ current_dir = Path(__file__).parent.absolute()
 parent_dir = current_dir.parent
 sys.path.append(str(parent_dir))
 
-from grobid_client_python.grobid_processor import GrobidProcessor
+from grobid_client_python.grobid_processor import GrobidProcessor, REFERENCE_TABLE_FILE
 
 # 添加embed目录到路径以便导入相关模块
 embed_dir = os.path.join(parent_dir, "embed")
@@ -29,15 +29,15 @@ if embed_dir not in sys.path:
 
 # 尝试导入嵌入相关模块
 try:
-    from embed.abstract_extractor import extract_and_create_embeddings as extract_abstracts
-    from embed.text_processor import extract_and_create_embeddings as extract_texts
+    from embed.incremental_ingest import update_document_stores
     from embed.text_processor import initialize_api_client
+    from embed.embedding_cache import EmbeddingCache
 except ImportError as e:
     logger.warning(f"无法导入嵌入模块: {e}")
     logger.warning("摘要和正文的嵌入功能将不可用")
-    extract_abstracts = None
-    extract_texts = None
+    update_document_stores = None
     initialize_api_client = None
+    EmbeddingCache = None
 
 def process_pdf(input_path):
     """
@@ -100,7 +100,11 @@ def _run_processor(input_path, output_dir, final_dir):
         concurrency=100,                # 并发数
         include_raw_citations=True,     # 是否保留原始引用
         segment_sentences=True,         # 是否进行句子分割
-        use_ascii_only=True             # 是否只使用ASCII字符
+        use_ascii_only=True,            # 是否只使用ASCII字符
+        xml_workers=os.cpu_count() or 1,# XML后处理的工作进程数
+        records_output_path=final_dir,  # 同时输出JSONL记录，嵌入阶段直接读取
+        # 参考文献去重写入语料级参考文献表，正文中只保留引用键
+        reference_table_path=os.path.join(final_dir, REFERENCE_TABLE_FILE)
     )
     
     if success:
@@ -119,13 +123,18 @@ def create_embeddings(processed_dir):
     """
     为处理好的文件创建摘要和正文的嵌入向量
     
+    嵌入向量直接写入二进制存储，并按清单增量更新：只处理新增或修改过的文件，
+    已删除文件的记录会被标记删除。逐个文档选择来源：有GrobidProcessor输出的
+    JSONL记录时直接读取记录，否则解析处理后的XML，每个文件只读取一次。
+    
     参数:
-        processed_dir: 处理后的XML文件目录
+        processed_dir: 处理后的文件目录
         
     返回:
-        bool: 处理是否成功
+        bool: 处理是否成功；有待处理的文件但某个存储一条记录也没有写入
+            （例如嵌入请求全部失败）时返回False
     """
-    if extract_abstracts is None or extract_texts is None or initialize_api_client is None:
+    if update_document_stores is None or initialize_api_client is None:
         logger.error("嵌入功能不可用，请确保正确安装和导入了embed模块")
         return False
     
@@ -140,46 +149,55 @@ def create_embeddings(processed_dir):
     os.makedirs(embeddings_dir, exist_ok=True)
     
     # 设置摘要和正文的嵌入向量输出文件
-    abstract_embeddings_file = os.path.join(embeddings_dir, "abstract_embeddings.json")
-    fulltext_embeddings_file = os.path.join(embeddings_dir, "fulltext_embeddings.json")
+    abstract_embeddings_file = os.path.join(embeddings_dir, "abstract_embeddings.npy")
+    fulltext_embeddings_file = os.path.join(embeddings_dir, "fulltext_embeddings.npy")
+    
+    # 嵌入向量缓存，重新处理时未变化的文本不再调用API
+    cache = None
+    if EmbeddingCache is not None:
+        try:
+            cache = EmbeddingCache(os.path.join(embeddings_dir, "embedding_cache.sqlite"))
+        except Exception as e:
+            logger.warning(f"无法打开嵌入向量缓存，将直接调用API: {e}")
     
-    logger.info("开始创建摘要嵌入向量...")
-    abstract_success = False
-    fulltext_success = False
+    logger.info("开始创建摘要和正文嵌入向量...")
     
+    success = True
     try:
-        # 创建摘要嵌入向量
-        abstract_success = extract_abstracts(
+        results = update_document_stores(
             processed_dir,
             abstract_embeddings_file,
-            api_client=api_client,
-            file_pattern="*.xml"
-        )
-        
-        if abstract_success:
-            logger.info(f"摘要嵌入向量创建成功，保存到: {abstract_embeddings_file}")
-        else:
-            logger.error("摘要嵌入向量创建失败")
-        
-        # 创建正文嵌入向量
-        logger.info("开始创建正文嵌入向量...")
-        fulltext_success = extract_texts(
-            processed_dir,
             fulltext_embeddings_file,
             api_client=api_client,
-            file_pattern="*.xml"
+            cache=cache
         )
         
-        if fulltext_success:
-            logger.info(f"正文嵌入向量创建成功，保存到: {fulltext_embeddings_file}")
-        else:
-            logger.error("正文嵌入向量创建失败")
+        for name, store_file in (("摘要", abstract_embeddings_file), ("正文", fulltext_embeddings_file)):
+            stats = results[store_file]
+            if stats["records_added"]:
+                logger.info(f"{name}嵌入向量创建成功，新增 {stats['records_added']} 条记录，保存到: {store_file}")
+                if stats["records_failed"]:
+                    logger.warning(f"{name}有 {stats['records_failed']} 条记录未能生成嵌入向量，下次运行时重试")
+            elif stats["records_failed"]:
+                logger.error(f"{name}嵌入向量创建失败: {stats['records_failed']} 条记录均未能生成嵌入向量")
+                success = False
+            else:
+                logger.info(f"{name}嵌入向量无需更新: {store_file}")
         
     except Exception as e:
         logger.error(f"创建嵌入向量时出错: {e}")
         return False
     
-    return abstract_success and fulltext_success
+    finally:
+        if cache is not None:
+            stats = cache.get_stats()
+            logger.info(
+                f"嵌入向量缓存: 命中 {stats['hits']}, 未命中 {stats['misses']}, "
+                f"命中率 {stats['hit_rate']:.1%}, 条目数 {stats['entries']}"
+            )
+            cache.close()
+    
+    return success
 
 def select_and_process_directory():
     """让用户选择目录并处理其中的所有PDF文件"""